@@ -14,21 +14,30 @@ DATABASE_TYPES = {
 }
 
 
+def database_class(dbtype):
+    """Get the class of the database backend by its type"""
+    for key, val in DATABASE_TYPES.items():
+        if not isinstance(val, list):
+            val = [val]
+        if not dbtype.lower() in val:
+            continue
+
+        mod = importlib.import_module(
+            ".database.{}".format(key.lower()), package="medoo"
+        )
+        return getattr(mod, key)
+
+    raise ValueError("Database type not supported: {}.".format(dbtype))
+
+
 class Medoo:
     """Main entrance"""
 
     def __new__(cls, dbtype, *args, **kwargs):
+        return database_class(dbtype)(*args, **kwargs)
 
-        for key, val in DATABASE_TYPES.items():
-            if not isinstance(val, list):
-                val = [val]
-            if not dbtype.lower() in val:
-                continue
-
-            mod = importlib.import_module(
-                ".database.{}".format(key.lower()), package="medoo"
-            )
-            klass = getattr(mod, key)
-            return klass(*args, **kwargs)
 
-        raise ValueError("Database type not supported: {}.".format(dbtype))
+# pylint: disable=wrong-import-position
+from .pool import PooledMedoo  # noqa: E402
+from .aio import AsyncMedoo  # noqa: E402
+from .replica import ReplicatedMedoo  # noqa: E402
@@ -0,0 +1,238 @@
+"""Asyncio API for pymedoo"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from . import database_class
+from .exception import ForwardOnlyRecordsError
+from .record import Records
+
+
+class ExecutorRunner:
+    """Run the blocking calls of a connection in an executor
+
+    By default, a dedicated executor with a single thread is created, so
+    that the calls to the connection run one at a time, in order.
+
+    Other runners can be plugged into `AsyncMedoo`, i.e. to share an
+    executor, as long as they have a coroutine `run(func, *args, **kwargs)`
+    and a method `close()`.
+    """
+
+    def __init__(self, executor=None):
+        self.owned = executor is None
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="medoo"
+        )
+
+    async def run(self, func, *args, **kwargs):
+        """Run the function in the executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(func, *args, **kwargs)
+        )
+
+    def close(self):
+        """Shut down the executor if it is owned by the runner"""
+        if self.owned:
+            self.executor.shutdown(wait=False)
+
+
+class AsyncRecords:
+    """Records fetched in batches in the background
+
+    Iterating by `async for` fetches the next batch of rows while the rows
+    of the current one are being processed. The batches are of `arraysize`
+    rows of the records, or `Records.ARRAYSIZE`.
+    """
+
+    def __init__(self, records, run):
+        self.records = records
+        self._run = run
+
+    @property
+    def meta(self):
+        """The names of the columns"""
+        return self.records.meta
+
+    def __len__(self):
+        return len(self.records)
+
+    def __repr__(self):
+        return "<AsyncRecords: size={}, pending={}>".format(
+            len(self), self.records.pending
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _take(self):
+        """Fetch a batch of rows, made by the row factory"""
+        records = self.records
+        if not records._rows and not records._fetch(
+            records.arraysize or records.ARRAYSIZE
+        ):
+            return []
+        return [next(records) for _ in range(len(records._rows))]
+
+    def __aiter__(self):
+        records = self.records
+        if not records.cache:
+            if records._iterated:
+                raise ForwardOnlyRecordsError(
+                    "Forward-only Records can only be iterated once."
+                )
+            records._iterated = True
+        return self._iterate()
+
+    async def _iterate(self):
+        for row in list(self.records._allrows):
+            yield row
+
+        pending = asyncio.ensure_future(self._run(self._take))
+        try:
+            while True:
+                rows = await pending
+                if not rows:
+                    return
+                pending = asyncio.ensure_future(self._run(self._take))
+                for row in rows:
+                    yield row
+        finally:
+            if not pending.done():
+                pending.cancel()
+
+    async def all(self, asdict=False):
+        """Fetch all the rows, see `Records.all`"""
+        return await self._run(self.records.all, asdict)
+
+    async def first(self, default=None):
+        """Get the first row, see `Records.first`"""
+        return await self._run(self.records.first, default)
+
+    async def close(self):
+        """Stop fetching the rows and close the cursor owned by the records"""
+        await self._run(self.records.close)
+
+
+class AsyncMedoo:
+    """Medoo with coroutines, for asyncio
+
+    The operations run the blocking calls of the database backend by the
+    runner, `ExecutorRunner` by default, with a dedicated thread for the
+    connection. The connection is made when the first operation runs.
+
+    `max_concurrency` limits the number of operations waiting for or
+    running by the runner. Cancelling an operation that is waiting drops
+    it, and cancelling one that is running interrupts the query if the
+    driver supports it.
+    """
+
+    # The operations delegated to the Medoo instance
+    OPERATIONS = (
+        "select",
+        "union",
+        "has",
+        "get",
+        "count",
+        "sum",
+        "avg",
+        "min",
+        "max",
+        "insert",
+        "bulk_insert",
+        "insert_stream",
+        "upsert",
+        "bulk_update",
+        "update",
+        "delete",
+        "query",
+        "commit",
+    )
+
+    def __init__(
+        self, dbtype, *args, runner=None, max_concurrency=None, **kwargs
+    ):
+        klass = dbtype if isinstance(dbtype, type) else database_class(dbtype)
+        self._create = lambda: klass(*args, **kwargs)
+        self.db = None
+        self.runner = runner or ExecutorRunner()
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+        # the call running by the runner, and the lock to switch it
+        self._running = None
+        self._lock = threading.Lock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _connect(self):
+        with self._lock:
+            if self.db is None:
+                self.db = self._create()
+            return self.db
+
+    def _call(self, token, func, args, kwargs):
+        """Run a call by the runner, marking it as running"""
+        with self._lock:
+            self._running = token
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._running = None
+
+    async def _run(self, func, *args, **kwargs):
+        """Run a blocking call by the runner"""
+        if self.max_concurrency and self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        if self._semaphore is not None:
+            async with self._semaphore:
+                return await self._submit(func, args, kwargs)
+        return await self._submit(func, args, kwargs)
+
+    async def _submit(self, func, args, kwargs):
+        token = object()
+        try:
+            return await self.runner.run(self._call, token, func, args, kwargs)
+        except asyncio.CancelledError:
+            with self._lock:
+                if self._running is token and self.db is not None:
+                    self.db.interrupt()
+            raise
+
+    def _operate(self, name, args, kwargs):
+        # forward-only records cannot be fetched in advance, so they are
+        # streamed by a cursor of their own instead
+        if name == "select" and kwargs.get("cache") is False:
+            kwargs = dict(kwargs, stream=True)
+        result = getattr(self._connect(), name)(*args, **kwargs)
+        # the shared cursor may be used by the next operation
+        if isinstance(result, Records) and not result.owncursor:
+            result.all()
+        return result
+
+    def __getattr__(self, name):
+        if name not in self.OPERATIONS:
+            raise AttributeError(name)
+
+        async def operation(*args, **kwargs):
+            result = await self._run(self._operate, name, args, kwargs)
+            if isinstance(result, Records):
+                return AsyncRecords(result, self._run)
+            return result
+
+        operation.__name__ = name
+        return operation
+
+    async def close(self):
+        """Close the connection and the runner"""
+        if self.db is not None:
+            await self._run(self.db.close)
+        self.runner.close()
@@ -1,8 +1,203 @@
 """The base for pymedoo"""
+import re
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from itertools import chain, islice
 
-from .builder import Builder
-from .record import Records
-from .dialect import Dialect
+from .builder import Builder, Raw, WhereTerm
+from .cache import StatementCache, table_name, written_tables
+from .record import Record, Records
+from .dialect import Dialect, Params
+from .util import always_list
+
+
+class BulkResult(namedtuple("BulkResult", "rows chunks elapsed")):
+    """The result of a bulk operation
+
+    `rows` rows were sent in `chunks` statements or `executemany` calls,
+    in `elapsed` seconds.
+    """
+
+    __slots__ = ()
+
+    @property
+    def rate(self):
+        """The rows per second"""
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+def _insert_rows(fields, values):
+    """Get the fields and the rows of values from the arguments of `insert`
+
+    The rows are generated lazily as tuples.
+    """
+    first = ()
+    if isinstance(fields, dict):
+        first = (tuple(fields.values()),)
+        fields = list(fields.keys())
+    elif isinstance(fields, tuple):
+        first = (fields,)
+        fields = None
+    elif fields is not None and not isinstance(fields, list):
+        # assuming fields specified as string
+        fields = always_list(fields)
+
+    rows = (
+        tuple(value)
+        if isinstance(value, (tuple, list))
+        else tuple(value[key] for key in fields)
+        for value in values
+    )
+    return fields, chain(first, rows)
+
+
+def _stream_fields(fields, iterable):
+    """Get the fields and an iterator of the rows
+
+    If `fields` is `None`, it is taken from the `Records` or the keys of the
+    first row if it is a dict or a `Record`.
+    """
+    rows = iter(iterable)
+    if fields is None:
+        if isinstance(iterable, Records):
+            fields = iterable.meta
+        else:
+            first = next(rows, None)
+            if isinstance(first, (dict, Record)):
+                fields = list(first.keys())
+            if first is not None:
+                rows = chain((first,), rows)
+    elif isinstance(fields, (dict, tuple)):
+        raise ValueError("Expect a list or a string for fields.")
+    return _insert_rows(fields, rows)
+
+
+def _chunks(rows, chunksize):
+    """Split the rows into lists of chunksize rows lazily"""
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _keyset(orders, last):
+    """Get the conditions of the rows after the last row of keys
+
+    For keys (a, b, c), it is a > x OR (a = x AND b > y) OR
+    (a = x AND b = y AND c > z), with < for the keys in descending order.
+    """
+    conds = {}
+    for i, (key, desc) in enumerate(orders):
+        cond = {prev: last[j] for j, (prev, _) in enumerate(orders[:i])}
+        cond["{}[{}]".format(key, "<" if desc else ">")] = last[i]
+        if i == 0:
+            conds.update(cond)
+        else:
+            conds["AND #keyset{}".format(i)] = cond
+    return {"OR #keyset": conds}
+
+
+def _oversized_in(dialect, where):
+    """Find the top-level conditions of WHERE with oversized IN lists
+
+    Returns a list of the keys and whether they are IN or NOT IN.
+    """
+    if not where or dialect.IN_LIMIT is None:
+        return []
+    ret = []
+    for key, val in where.items():
+        if (
+            not isinstance(key, str)
+            or not isinstance(val, (tuple, list))
+            or len(val) <= dialect.IN_LIMIT
+        ):
+            continue
+        matching = re.match(WhereTerm.REGEX_KEY, key)
+        if not matching:
+            continue
+        name = dialect._operator_name(matching.group(4))
+        if name in ("eq", "ne"):
+            ret.append((key, bool(matching.group(1)) == (name == "ne")))
+    return ret
+
+
+def _split_in(where, oversized, size):
+    """Split the oversized IN lists into lists of size values, ORed, and
+    the NOT IN lists into ones ANDed, so that no list is over the limit"""
+    if not oversized:
+        return where
+    where = dict(where)
+    for i, (key, isin) in enumerate(oversized):
+        group = {
+            "{}#in{}".format(key, j): chunk
+            for j, chunk in enumerate(
+                _chunks(dict.fromkeys(where.pop(key)), size)
+            )
+        }
+        where["{} #in{}".format("OR" if isin else "AND", i)] = group
+    return where
+
+
+class _ChainedCursor:
+    """The rows of queries executed one after another, as a cursor"""
+
+    def __init__(self, description, rows):
+        self.description = description
+        self._rows = rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._rows)
+
+    def fetchmany(self, size):
+        """Fetch the next size rows"""
+        return list(islice(self._rows, size))
+
+
+class Batch:
+    """Statements grouped into periodic commits by `Base.batch`
+
+    The statements are committed every `commit_every` of them, or once
+    `commit_interval` seconds have passed since the last commit.
+    """
+
+    def __init__(self, commit_every=1000, commit_interval=None):
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        # the number of statements since the last commit
+        self.pending = 0
+        self.statements = 0
+        self.commits = 0
+        self._last = time.monotonic()
+
+    def __repr__(self):
+        return "<Batch: statements={}, commits={}, pending={}>".format(
+            self.statements, self.commits, self.pending
+        )
+
+    def done(self, database):
+        """Count a statement, and commit if it is time to"""
+        self.pending += 1
+        self.statements += 1
+        if (self.commit_every and self.pending >= self.commit_every) or (
+            self.commit_interval is not None
+            and time.monotonic() - self._last >= self.commit_interval
+        ):
+            self.flush(database)
+            database._begin()
+
+    def flush(self, database):
+        """Commit the statements"""
+        database.commit()
+        if self.pending:
+            self.commits += 1
+        self.pending = 0
+        self._last = time.monotonic()
 
 
 class Base:
@@ -15,6 +210,26 @@ class Base:
         else:
             self.logging = False
 
+        # whether to send values as bound parameters instead of literals
+        self.bind = kwargs.pop("bind", False)
+        # the number of rows fetched at a time for the records
+        self.arraysize = kwargs.pop("arraysize", None)
+        # the maximum number of statements cached by their shapes with bind,
+        # or a StatementCache to share with other instances
+        cachesize = kwargs.pop("statement_cache", 256)
+        if isinstance(cachesize, StatementCache):
+            self.statement_cache = cachesize if self.bind else None
+        else:
+            self.statement_cache = (
+                StatementCache(cachesize) if self.bind and cachesize else None
+            )
+
+        # a ResultCache for the results of select, can be shared with other
+        # instances connected to the same database
+        self.result_cache = kwargs.pop("result_cache", None)
+        # the tables written since the last commit
+        self._written = set()
+
         self._dialect = None
         if "dialect" in kwargs:
             self._dialect = kwargs["dialect"]
@@ -28,6 +243,9 @@ class Base:
         self.history = []
         self.errors = []
         self.sql = None
+        # the depth of the nested transactions
+        self._depth = 0
+        self._batch = None
 
     @property
     def builder(self):
@@ -41,15 +259,151 @@ class Base:
     def _connect(self, *args, **kwargs):
         raise NotImplementedError("API not implemented.")
 
+    def _begin(self):
+        """Make sure that a transaction is started
+
+        The DB-API drivers start transactions implicitly. Backends in
+        autocommit mode should start one explicitly.
+        """
+
+    def _autocommit(self):
+        """Commit after a statement, unless it is in a transaction,
+        or in a batch to be committed with others"""
+        if self._depth:
+            return
+        if self._batch is not None:
+            self._batch.done(self)
+            return
+        self.commit()
+
+    def _autorollback(self):
+        """Roll back after a failed statement, unless it is in a transaction
+        or a batch, which is rolled back by the block"""
+        if not self._depth and self._batch is None:
+            self._rollback()
+
+    def _rollback(self):
+        """Roll back the transaction"""
+        self.connection.rollback()
+        self._invalidate_written()
+
+    def _invalidate(self, tables):
+        """Invalidate the cached results of the tables written (all of them
+        if None), now and again when committed or rolled back"""
+        if self.result_cache is None or tables == frozenset():
+            return
+        self.result_cache.invalidate(tables)
+        if tables is None or self._written is None:
+            self._written = None
+        else:
+            self._written.update(tables)
+
+    def _invalidate_written(self):
+        """Invalidate the cached results of the tables written since the
+        last commit, which may be cached by the other connections"""
+        if self.result_cache is not None and self._written != set():
+            self.result_cache.invalidate(self._written)
+        self._written = set()
+
+    def _control(self, sql):
+        """Execute a statement controlling the transaction"""
+        cursor = self.connection.cursor()
+        try:
+            self._execute(cursor, sql, False, None)
+        finally:
+            cursor.close()
+
+    @contextmanager
+    def transaction(self):
+        """Run the statements in the block in a transaction
+
+        The transaction is committed when the block exits, and rolled back
+        if the block raises. Blocks nested in a transaction or a batch use
+        savepoints, so that only their own statements are rolled back.
+        """
+        dialect = self._dialect or Dialect
+        savepoint = None
+        if self._depth or self._batch is not None:
+            savepoint = "medoo_savepoint_{}".format(self._depth)
+            self._control(dialect.savepoint(savepoint))
+        else:
+            self._begin()
+
+        self._depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._depth -= 1
+            if savepoint is None:
+                self._rollback()
+            else:
+                self._control(dialect.rollback_savepoint(savepoint))
+                release = dialect.release_savepoint(savepoint)
+                if release:
+                    self._control(release)
+            raise
+
+        self._depth -= 1
+        if savepoint is not None:
+            release = dialect.release_savepoint(savepoint)
+            if release:
+                self._control(release)
+        self._autocommit()
+
+    @contextmanager
+    def batch(self, commit_every=1000, commit_interval=None):
+        """Group the statements in the block into periodic commits
+
+        Instead of committing every statement, the statements are committed
+        every `commit_every` of them, or once `commit_interval` seconds have
+        passed since the last commit, and when the block exits. If the block
+        raises, the statements since the last commit are rolled back.
+
+        Yields the `Batch`, with the numbers of statements and commits.
+        """
+        batch = Batch(commit_every, commit_interval)
+        if self._depth or self._batch is not None:
+            # committed by the transaction or the outer batch
+            yield batch
+            return
+
+        self._batch = batch
+        self._begin()
+        try:
+            yield batch
+        except BaseException:
+            self._batch = None
+            self._rollback()
+            raise
+        self._batch = None
+        batch.flush(self)
+
     def close(self):
         """Close the connection"""
         self.connection.close()
 
+    def interrupt(self):
+        """Abort the query running by the connection from another thread
+
+        Not all the drivers support it, in which case nothing is done.
+        """
+
+    def ping(self):
+        """Check if the connection is still usable"""
+        try:
+            cursor = self.connection.cursor()
+            try:
+                cursor.execute((self._dialect or Dialect).PING)
+                cursor.fetchall()
+            finally:
+                cursor.close()
+        except Exception:  # pylint: disable=broad-except
+            return False
+        return True
+
     def dialect(self, dial=None):
         """Set the dialect"""
-        dial = dial or Dialect
-        self._dialect = dial
-        Builder.DIALECT = dial
+        self._dialect = dial or Dialect
 
     def __del__(self):
         if self.connection:
@@ -72,8 +426,9 @@ class Base:
         try:
             self.connection.commit()
         except Exception as ex:
-            self.connection.rollback()
+            self._rollback()
             raise ex
+        self._invalidate_written()
 
     # If data is an ordered dict, then datas could be tuples
     # otherwise, datas also should be dicts
@@ -82,14 +437,212 @@ class Base:
         sql = self.builder.insert(table, fields, *values)
         return self.query(sql, kwargs.get("commit", True))
 
+    def bulk_insert(self, table, fields, *values, chunksize=None, commit=True):
+        """INSERT rows with bound parameters by `cursor.executemany`
+
+        The arguments are the same as `insert`. The rows are sent in chunks
+        of `chunksize` rows, which defaults to what the dialect allows for
+        the rows, all in one transaction.
+
+        Returns a `BulkResult`
+        """
+        fields, rows = _insert_rows(fields, values)
+        return self._bulk_insert(table, fields, rows, chunksize, commit)
+
+    def insert_stream(
+        self, table, fields, iterable, batch_size=None, commit=True
+    ):
+        """INSERT rows pulled lazily from an iterable
+
+        The rows could be tuples, or dicts or `Record`s with `fields`, i.e.
+        from a generator, a file reader or another `Records`. If `fields` is
+        `None`, it is taken from the `Records` or the keys of the first row
+        if it is a dict or a `Record`.
+
+        The rows are sent by `cursor.executemany` in batches of `batch_size`
+        rows, which defaults to what the dialect allows for the rows, so
+        that only one batch is kept in memory at a time, all in one
+        transaction.
+
+        Returns a `BulkResult`
+        """
+        fields, rows = _stream_fields(fields, iterable)
+        return self._bulk_insert(table, fields, rows, batch_size, commit)
+
+    def _bulk_insert(self, table, fields, rows, chunksize, commit):
+        start = time.perf_counter()
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is None:
+            return BulkResult(0, 0, 0.0)
+
+        dialect = self._dialect or Dialect
+        params = Params(dialect.PARAMSTYLE)
+        # compile the statement with one row of placeholders
+        placeholders = (None,) * len(first)
+        builder = (
+            Builder(dialect).insert(table, fields, placeholders)
+            if fields
+            else Builder(dialect).insert(table, placeholders)
+        )
+        sql, _ = builder._compile(params)
+        self._log(sql)
+
+        chunksize = chunksize or dialect.chunksize(first)
+        nrows = nchunks = 0
+        # use a separate cursor, in case that the rows are being fetched
+        # by self.cursor
+        cursor = self.connection.cursor()
+        self._begin()
+        try:
+            # the errors of the source of the rows are raised as they are,
+            # only the ones of the driver are recorded with the sql
+            for chunk in _chunks(chain((first,), rows), chunksize):
+                values = [params.row(row) for row in chunk]
+                try:
+                    cursor.executemany(sql, values)
+                except Exception as ex:
+                    raise self._error(ex)
+                nrows += len(chunk)
+                nchunks += 1
+            self._invalidate(frozenset([table_name(table)]))
+            if commit:
+                self._autocommit()
+        except Exception:
+            self._autorollback()
+            raise
+        finally:
+            cursor.close()
+        return BulkResult(nrows, nchunks, time.perf_counter() - start)
+
+    def upsert(
+        self,
+        table,
+        rows,
+        conflict_keys,
+        update_fields=None,
+        fields=None,
+        chunksize=None,
+        commit=True,
+    ):
+        """INSERT rows, or UPDATE them if they conflict on unique keys
+
+        The rows are inserted by multi-row INSERT ... ON CONFLICT DO UPDATE,
+        or the equivalent of the dialect (ON DUPLICATE KEY UPDATE for MySQL,
+        MERGE for SQL Server and Oracle), in chunks of `chunksize` rows,
+        which defaults to what the dialect allows for the rows, all in one
+        transaction.
+        @params:
+            `table`: The table
+            `rows`: An iterable of dicts, or tuples with `fields`
+            `conflict_keys`: The fields of the unique keys
+            `update_fields`: The fields to update for the conflicting rows.
+                Defaults to the fields other than the keys. Nothing is
+                updated for the conflicting rows if empty.
+            `fields`: The fields of the rows. Defaults to the keys of the
+                first row.
+
+        Returns a `BulkResult`
+        """
+        fields, rows = _stream_fields(fields, rows)
+        first = next(rows, None)
+        if first is None:
+            return BulkResult(0, 0, 0.0)
+        dialect = self._dialect or Dialect
+        chunksize = chunksize or dialect.chunksize(first)
+        return self._execute_chunks(
+            _chunks(chain((first,), rows), chunksize),
+            lambda chunk: Builder(dialect).upsert(
+                table, fields, chunk, conflict_keys, update_fields
+            ),
+            commit,
+        )
+
+    def bulk_update(
+        self, table, rows, key="id", fields=None, chunksize=None, commit=True
+    ):
+        """UPDATE many rows with different values
+
+        The rows are matched by `key`, and updated by
+        `UPDATE ... SET field = CASE key WHEN ... THEN ... END WHERE key IN
+        (...)` in chunks of `chunksize` rows, which defaults to what the
+        dialect allows for the rows, all in one transaction.
+        @params:
+            `table`: The table
+            `rows`: An iterable of dicts, or tuples with `fields`, including
+                the values of the key
+            `key`: The field to match the rows
+            `fields`: The fields of the rows. Defaults to the keys of the
+                first row.
+
+        Returns a `BulkResult`
+        """
+        fields, rows = _stream_fields(fields, rows)
+        first = next(rows, None)
+        if first is None:
+            return BulkResult(0, 0, 0.0)
+        dialect = self._dialect or Dialect
+        # the key is bound again for each of the other fields
+        chunksize = chunksize or dialect.chunksize(first * 2)
+        return self._execute_chunks(
+            _chunks(chain((first,), rows), chunksize),
+            lambda chunk: Builder(dialect).bulk_update(
+                table, fields, chunk, key
+            ),
+            commit,
+        )
+
+    def _execute_chunks(self, chunks, build, commit):
+        """Execute the statements built for the chunks of rows with bound
+        parameters, in one transaction"""
+        start = time.perf_counter()
+        nrows = nchunks = 0
+        cursor = self.connection.cursor()
+        self._begin()
+        try:
+            # only the errors of the driver are recorded with the sql
+            for chunk in chunks:
+                builder = build(chunk)
+                sql, params = builder.compile()
+                self._log(sql)
+                try:
+                    if params:
+                        cursor.execute(sql, params)
+                    else:
+                        cursor.execute(sql)
+                except Exception as ex:
+                    raise self._error(ex)
+                nrows += len(chunk)
+                nchunks += 1
+                if nchunks == 1:
+                    self._invalidate(builder.tables())
+            if commit:
+                self._autocommit()
+        except Exception:
+            self._autorollback()
+            raise
+        finally:
+            cursor.close()
+        return BulkResult(nrows, nchunks, time.perf_counter() - start)
+
     def update(self, table, data, where=None, commit=True):
         """UPDATE clause"""
+        if self.statement_cache is not None:
+            sql, params = self.statement_cache.update(
+                self._dialect, table, data, where
+            )
+            return self.query(sql, commit=commit, params=params)
         sql = self.builder.update(table, data, where)
         return self.query(sql, commit=commit)
 
     # where required to avoid all data deletion
     def delete(self, table, where, commit=True):
         """DELETE clause"""
+        if self.statement_cache is not None:
+            sql, params = self.statement_cache.delete(
+                self._dialect, table, where
+            )
+            return self.query(sql, commit=commit, params=params)
         sql = self.builder.delete(table, where)
         return self.query(sql, commit=commit)
 
@@ -104,12 +657,312 @@ class Base:
         sub=None,
         commit=False,
         readonly=True,
+        stream=False,
+        itersize=None,
+        cache=True,
+        row_factory=None,
     ):
-        """SELECT clause"""
-        sql = self.builder.select(
+        """SELECT clause
+
+        IN lists with more values than `IN_LIMIT` of the dialect in the
+        top-level conditions are rewritten by its `IN_STRATEGY`.
+
+        With `stream`, the rows are fetched by a cursor of their own as the
+        `Records` is iterated, `itersize` rows at a time, instead of being
+        buffered by the driver (i.e. a server-side cursor for PostgreSQL).
+        The cursor is closed when the rows are exhausted, or the `Records`
+        is closed or garbage-collected.
+
+        With `cache` False, the `Records` is forward-only, which does not
+        keep the rows once they are iterated over.
+
+        `row_factory` decides how the rows are made (see `Records`). For
+        SQLite, `sqlite3.Row` is also supported, which is made by sqlite3.
+
+        With a `result_cache`, the rows are fetched at once and cached, unless
+        streamed, forward-only, selected into a new table, made by a row
+        factory other than the named ones, or in a transaction or a batch.
+        """
+        dialect = self._dialect or Dialect
+        oversized = _oversized_in(dialect, where)
+        strategy = dialect.IN_STRATEGY
+        if oversized and strategy == "any" and not self.bind:
+            # arrays can only be bound as parameters
+            strategy = "chunk"
+        if oversized and strategy == "temptable":
+            where = self._in_temptable(where, oversized)
+        elif oversized and strategy == "chunk":
+            keys = [key for key, isin in oversized if isin]
+            if (
+                keys
+                and not stream
+                and not distinct
+                and not any(
+                    modifier in where
+                    for modifier in ("ORDER", "LIMIT", "GROUP", "HAVING")
+                )
+            ):
+                # chunk the rows by the first IN list, with the other lists
+                # split in each statement
+                where = _split_in(
+                    where,
+                    [item for item in oversized if item[0] != keys[0]],
+                    dialect.IN_LIMIT,
+                )
+
+                def select_chunk(where):
+                    # executed on the cursor directly, bypassing the result
+                    # cache, as the rows are read from the cursor
+                    sql, params = self._select_sql(
+                        table, columns, where, join, distinct, newtable, sub
+                    )
+                    self._execute(self.cursor, sql, commit, params)
+
+                return self._select_chunks(
+                    keys[0],
+                    where,
+                    dialect.IN_LIMIT,
+                    select_chunk,
+                    readonly,
+                    cache=cache,
+                    row_factory=row_factory,
+                )
+            where = _split_in(where, oversized, dialect.IN_LIMIT)
+
+        sql, params = self._select_sql(
             table, columns, where, join, distinct, newtable, sub
         )
-        return self.query(sql, commit, readonly)
+        if stream:
+            return self._stream(
+                sql,
+                commit,
+                readonly,
+                params,
+                itersize,
+                cache=cache,
+                row_factory=row_factory,
+            )
+        if (
+            self.result_cache is not None
+            and cache
+            and not stream
+            and not oversized
+            and not newtable
+            and not commit
+            and (row_factory is None or isinstance(row_factory, str))
+            and not self._depth
+            and self._batch is None
+        ):
+            return self._cached_select(
+                sql,
+                params,
+                lambda: (
+                    sql
+                    if isinstance(sql, Builder)
+                    else Builder(dialect).select(
+                        table, columns, where and dict(where), join, distinct
+                    )
+                ).tables(),
+                readonly,
+                cache=cache,
+                row_factory=row_factory,
+            )
+        self._execute(self.cursor, sql, commit, params)
+        return self._records(
+            self.cursor,
+            readonly,
+            arraysize=self.arraysize,
+            cache=cache,
+            row_factory=row_factory,
+        )
+
+    def _select_sql(
+        self, table, columns, where, join, distinct, newtable, sub
+    ):
+        """Get the SQL and the parameters of a SELECT query
+
+        Raises ValueError if more parameters are bound than `MAX_PARAMS` of
+        the dialect.
+        """
+        if self.statement_cache is not None:
+            sql, params = self.statement_cache.select(
+                self._dialect,
+                table,
+                columns,
+                where,
+                join,
+                distinct,
+                newtable,
+                sub,
+            )
+        else:
+            sql = self.builder.select(
+                table, columns, where, join, distinct, newtable, sub
+            )
+            params = None
+            if self.bind:
+                sql, params = sql.compile()
+        maxparams = (self._dialect or Dialect).MAX_PARAMS
+        if params and maxparams and len(params) > maxparams:
+            raise ValueError(
+                "Too many parameters bound: {}, while the database accepts "
+                "{} at most.".format(len(params), maxparams)
+            )
+        return sql, params
+
+    def _cached_select(self, sql, params, tables, readonly, **kwargs):
+        """Get the rows of a query from the result cache, or fetch and
+        cache them, with `tables` telling the tables of the query"""
+        if isinstance(sql, Builder):
+            sql, params = sql.compile() if self.bind else (str(sql), None)
+        key = (
+            sql,
+            tuple(sorted(params.items()))
+            if isinstance(params, dict)
+            else tuple(params or ()),
+        )
+        result = self.result_cache.get(key)
+        if result is None:
+            self._execute(self.cursor, sql, False, params)
+            # the rows as tuples
+            self._row_factory(self.cursor, None)
+            result = (
+                tuple((desc[0],) for desc in self.cursor.description),
+                tuple(tuple(row) for row in self.cursor.fetchall()),
+            )
+            self.result_cache.set(key, *result, tables())
+        return self._records(
+            _ChainedCursor(result[0], iter(result[1])), readonly, **kwargs
+        )
+
+    def _row_factory(self, cursor, row_factory):
+        """Get the row factory of the Records for the cursor"""
+        return row_factory
+
+    def _records(self, cursor, readonly, row_factory=None, **kwargs):
+        """Make the Records of the cursor"""
+        return Records(
+            cursor,
+            readonly,
+            row_factory=self._row_factory(cursor, row_factory),
+            **kwargs,
+        )
+
+    def _stream_cursor(self, itersize):
+        """Get a new cursor to stream the rows of a query"""
+        cursor = self.connection.cursor()
+        if itersize:
+            cursor.arraysize = itersize
+        return cursor
+
+    def _stream(self, sql, commit, readonly, params, itersize, **kwargs):
+        """Execute the query by a streaming cursor owned by the Records"""
+        cursor = self._stream_cursor(itersize)
+        try:
+            self._execute(cursor, sql, commit, params)
+        except Exception:
+            cursor.close()
+            raise
+        return self._records(
+            cursor, readonly, owncursor=True, arraysize=itersize, **kwargs
+        )
+
+    def _in_temptable(self, where, oversized):
+        """Load the values of the IN lists into the temporary table,
+        and replace them with subqueries of it"""
+        dialect = self._dialect or Dialect
+        table = dialect.IN_TABLE
+        self.query(dialect.temptable(table), commit=False)
+        self.query(Builder(dialect).delete(table, None), commit=False)
+        params = Params(dialect.PARAMSTYLE)
+        builder = Builder(dialect).insert(table, ["n", "k"], (None, None))
+        sql, _ = builder._compile(params)
+        self._log(sql)
+        where = dict(where)
+        try:
+            for i, (key, _) in enumerate(oversized):
+                self.cursor.executemany(
+                    sql, [params.row((i, val)) for val in where[key]]
+                )
+                where[key] = Builder(dialect).select(table, "k", {"n": i})
+        except Exception as ex:
+            raise self._error(ex)
+        return where
+
+    def _select_chunks(self, key, where, chunksize, select, readonly, **kwargs):
+        """Select the rows by chunks of the values of the IN list of key,
+        one query after another, as the rows are fetched"""
+        # keep the values distinct, as IN does
+        chunks = list(_chunks(dict.fromkeys(where[key]), chunksize))
+        select(dict(where, **{key: chunks[0]}))
+        cursor = self.cursor
+
+        def rows():
+            yield from cursor
+            for chunk in chunks[1:]:
+                select(dict(where, **{key: chunk}))
+                yield from cursor
+
+        return self._records(
+            _ChainedCursor(cursor.description, rows()), readonly, **kwargs
+        )
+
+    def paginate(
+        self,
+        table,
+        columns="*",
+        where=None,
+        order_key="id",
+        page_size=1000,
+        desc=False,
+        join=None,
+        pages=False,
+    ):
+        """Iterate over the rows page by page, by keyset pagination
+
+        Instead of `LIMIT ... OFFSET ...`, each page is selected by the
+        keys of the last row of the previous page (i.e. `WHERE id > 1000
+        ORDER BY id LIMIT 1000`), so that the cost of a page does not grow
+        with the offset.
+        @params:
+            `table`: The table
+            `columns`: The columns to select, which must include the keys
+            `where`: The conditions. `ORDER` and `LIMIT` are decided by
+                the keys and `page_size`.
+            `order_key`: The key, or keys for a composite key, to order the
+                rows by, which should be unique and not null. Could be a
+                dict like `ORDER` to specify the direction of each key.
+            `page_size`: The number of rows of each page
+            `desc`: Whether to order the keys descendingly, if the
+                directions are not specified by `order_key`
+            `join`: The joins
+            `pages`: Yield the pages as `Records` instead of rows
+        """
+        if isinstance(order_key, dict):
+            orders = [
+                (key, val is False or str(val).lower() == "desc")
+                for key, val in order_key.items()
+            ]
+        else:
+            orders = [(key, desc) for key in always_list(order_key)]
+        names = [key.split(".")[-1] for key, _ in orders]
+        where = dict(where or {})
+        where["ORDER"] = {
+            key: "desc" if keydesc else "asc" for key, keydesc in orders
+        }
+        where["LIMIT"] = page_size
+        conds = {}
+        while True:
+            page = self.select(table, columns, dict(where, **conds), join)
+            rows = page.all()
+            if rows:
+                if pages:
+                    yield page
+                else:
+                    yield from rows
+            if len(rows) < page_size:
+                return
+            conds = _keyset(orders, [rows[-1][name] for name in names])
 
     def union(self, *queries, **kwargs):
         """Union statement"""
@@ -117,39 +970,114 @@ class Base:
         return self.query(sql, commit=kwargs.get("commit", False))
 
     def has(self, table, where=None, join=None):
-        """Has statement"""
+        """Has statement
+
+        Selects `1` for at most one row, instead of the rows.
+        """
+        where = dict(where or {})
+        where.pop("ORDER", None)
+        where["LIMIT"] = 1
         # pylint: disable=invalid-name
-        rs = self.select(table, "*", where, join)
-        return bool(rs.first())
+        rs = self.select(table, Raw("1"), where, join)
+        return rs.first() is not None
 
     def get(self, table, columns="*", where=None, join=None):
-        """Get a single value"""
+        """Get a single value
+
+        Selects at most one row, unless `LIMIT` is specified.
+        """
+        where = dict(where or {})
+        where.setdefault("LIMIT", 1)
         # pylint: disable=invalid-name
         rs = self.select(table, columns, where, join)
         return rs.first()[0]
 
-    def query(self, sql, commit=True, readonly=True):
-        """Send query to the connection"""
-        self.sql = ("%s" % sql).strip()
+    def count(self, table, column="*", where=None, join=None):
+        """Count the rows, or the non-null values of the column"""
+        return self._aggregate("count", table, column, where, join)
+
+    def sum(self, table, column, where=None, join=None):
+        """Get the sum of the values of the column"""
+        return self._aggregate("sum", table, column, where, join)
+
+    def avg(self, table, column, where=None, join=None):
+        """Get the average of the values of the column"""
+        return self._aggregate("avg", table, column, where, join)
+
+    def min(self, table, column, where=None, join=None):
+        """Get the minimum of the values of the column"""
+        return self._aggregate("min", table, column, where, join)
+
+    def max(self, table, column, where=None, join=None):
+        """Get the maximum of the values of the column"""
+        return self._aggregate("max", table, column, where, join)
+
+    def _aggregate(self, func, table, column, where, join):
+        """Get the value of the aggregate function on the column"""
+        where = dict(where or {})
+        where.pop("ORDER", None)
+        where.pop("LIMIT", None)
+        rs = self.select(table, "{}|{}".format(column, func), where, join)
+        return rs.first()[0]
+
+    def query(self, sql, commit=True, readonly=True, params=None):
+        """Send query to the connection
+
+        A `Builder` is compiled with bound parameters if `bind` is enabled,
+        otherwise `params` are passed to `cursor.execute` with the sql.
+        """
+        self._execute(self.cursor, sql, commit, params)
+        if self.sql.upper().startswith("SELECT"):
+            return self._records(
+                self.cursor, readonly, arraysize=self.arraysize
+            )
+        return True
+
+    def _execute(self, cursor, sql, commit, params):
+        """Execute the query by the cursor"""
+        if params is None and self.bind and isinstance(sql, Builder):
+            sql, params = sql.compile()
+        self._log(("%s" % sql).strip())
+        try:
+            if params:
+                cursor.execute(self.sql, params)
+            else:
+                cursor.execute(self.sql)
+            if self.result_cache is not None:
+                tables = written_tables(self.sql)
+                if tables != frozenset() and isinstance(sql, Builder):
+                    # including the tables of the subqueries
+                    tables = sql.tables()
+                self._invalidate(tables)
+            if commit:
+                self._autocommit()
+        except Exception as ex:
+            raise self._error(ex)
+
+    def _log(self, sql):
+        """Keep the sql as the last query"""
+        self.sql = sql
         if self.logging:
             self.history.append(self.sql)
         else:
             self.history = [self.sql]
+
+    def _error(self, ex):
+        """Record the error and attach the sql to it"""
+        self.errors.append(str(ex))
+        if self.sql is None:
+            return ex
+        if len(self.sql) <= 256:
+            message = f"{ex}:\n{'-' * 32}\n{self.sql}"
+        else:
+            message = (
+                f"{ex}:\n{'-' * 32}\n"
+                f"{self.sql[:256]} ...\n"
+                f"{'-' * 32}\n"
+                f"The above sql is slimed, full length: {len(self.sql)}"
+            )
         try:
-            self.cursor.execute(self.sql)
-            if commit:
-                self.commit()
-            if self.sql.upper().startswith("SELECT"):
-                return Records(self.cursor, readonly)
-            return True
-        except Exception as ex:
-            self.errors.append(str(ex))
-            if len(self.sql) <= 256:
-                raise type(ex)(f"{ex}:\n{'-' * 32}\n{self.sql}")
-            else:
-                raise type(ex)(
-                    f"{ex}:\n{'-' * 32}\n"
-                    f"{self.sql[:256]} ...\n"
-                    f"{'-' * 32}\n"
-                    f"The above sql is slimed, full length: {len(self.sql)}"
-                )
+            return type(ex)(message)
+        except Exception:  # pylint: disable=broad-except
+            # not to be made from a message only
+            return ex
@@ -1,5 +1,7 @@
 """SQL Builder"""
 import re
+from contextlib import contextmanager
+from contextvars import ContextVar
 from .util import always_list
 from .exception import (
     FieldParseError,
@@ -9,8 +11,31 @@ from .exception import (
     JoinParseError,
     LimitParseError,
     InsertParseError,
+    UpsertParseError,
 )
-from .dialect import Dialect
+from .dialect import Dialect, Params, _PARAMS
+
+# The dialect of the statement being rendered
+_DIALECT = ContextVar("medoo_dialect", default=None)
+
+
+def current_dialect():
+    """Get the dialect to render the terms
+
+    This is the dialect of the builder being rendered, or `Builder.DIALECT`
+    for terms rendered on their own.
+    """
+    return _DIALECT.get() or Builder.DIALECT
+
+
+@contextmanager
+def dialect_context(dialect):
+    """Render the terms with the dialect in the context"""
+    token = _DIALECT.set(dialect)
+    try:
+        yield
+    finally:
+        _DIALECT.reset(token)
 
 
 class Term:
@@ -46,6 +71,19 @@ class Raw(Term):
         return self.s
 
 
+class TermList(Term):
+    """
+    Terms joined by a separator, rendered lazily
+    """
+
+    def __init__(self, terms, sep=","):
+        self.terms = terms
+        self.sep = sep
+
+    def __str__(self):
+        return self.sep.join([str(term) for term in self.terms])
+
+
 class Table(Term):
     """
     Only table or schema.table
@@ -75,8 +113,8 @@ class Table(Term):
     def __str__(self):
         parts = []
         if self.schema:
-            parts.append(Builder.DIALECT.quote(self.schema))
-        parts.append(Builder.DIALECT.quote(self.table))
+            parts.append(current_dialect().quote(self.schema))
+        parts.append(current_dialect().quote(self.table))
         return ".".join(parts)
 
     @staticmethod
@@ -108,7 +146,7 @@ class TableFrom(Term):
 
     def __str__(self):
         return str(self.table) + (
-            " AS " + Builder.DIALECT.quote(self.alias) if self.alias else ""
+            " AS " + current_dialect().quote(self.alias) if self.alias else ""
         )
 
 
@@ -156,26 +194,28 @@ class Field(Term):
     def __str__(self):
         parts = []
         if self.schema:
-            parts.append(Builder.DIALECT.quote(self.schema))
+            parts.append(current_dialect().quote(self.schema))
         if self.table:
-            parts.append(Builder.DIALECT.quote(self.table))
-        parts.append(Builder.DIALECT.quote(self.field))
+            parts.append(current_dialect().quote(self.table))
+        parts.append(current_dialect().quote(self.field))
         return ".".join(parts)
 
     def __add__(self, value):
-        return Raw(str(self) + "+" + Builder.DIALECT.value(value))
+        return Arithmetic(self, "+", value)
 
     def __sub__(self, value):
-        return Raw(str(self) + "-" + Builder.DIALECT.value(value))
+        return Arithmetic(self, "-", value)
 
     def __mul__(self, value):
-        return Raw(str(self) + "*" + Builder.DIALECT.value(value))
+        return Arithmetic(self, "*", value)
+
+    def __truediv__(self, value):
+        return Arithmetic(self, "/", value)
 
-    def __div__(self, value):
-        return Raw(str(self) + "/" + Builder.DIALECT.value(value))
+    __div__ = __truediv__
 
     def __mod__(self, value):
-        return Raw(str(self) + "%" + Builder.DIALECT.value(value))
+        return Arithmetic(self, "%", value)
 
     @staticmethod
     def parse(fieldstr, context=None):
@@ -200,6 +240,21 @@ class Field(Term):
         raise FieldParseError("Unknown field context: {}".format(context))
 
 
+class Arithmetic(Term):
+    """A field with an operator and a value, like `Field("a") + 1`,
+    rendered by the dialect of the builder"""
+
+    def __init__(self, field, operator, value):
+        self.field = field
+        self.operator = operator
+        self.value = value
+
+    def __str__(self):
+        return (
+            str(self.field) + self.operator + current_dialect().bind(self.value)
+        )
+
+
 class FieldSelect(Term):
     """Terms in SELECT"""
 
@@ -216,10 +271,11 @@ class FieldSelect(Term):
         self.func = func[1:] if func and func.startswith(".") else func
 
     def __str__(self):
+        dialect = current_dialect()
         ret = str(self.field)
         if self.func:
-            if hasattr(Builder.DIALECT, self.func.lower()):
-                ret = getattr(Builder.DIALECT, self.func.lower())(
+            if hasattr(dialect, self.func.lower()):
+                ret = getattr(dialect, self.func.lower())(
                     ret, distinct=self.distinct
                 )
             else:
@@ -229,7 +285,7 @@ class FieldSelect(Term):
                     ret,
                 )
         if self.alias:
-            ret += " AS " + Builder.DIALECT.quote(self.alias)
+            ret += " AS " + dialect.quote(self.alias)
         return ret
 
 
@@ -320,7 +376,7 @@ class WhereTerm(Term):
         field = FieldSelect(matching.group(2), func=matching.group(3))
         oprt = matching.group(4)
 
-        return ret + Builder.DIALECT._operator(oprt, field, self.val)
+        return ret + current_dialect()._operator(oprt, field, self.val)
 
 
 class Order(Term):
@@ -363,7 +419,7 @@ class OrderTerm(Term):
 class Limit(Term):
     """Terms in Limit"""
 
-    def __init__(self, limoff):
+    def __init__(self, limoff, dialect=None):
         if len(limoff) == 1:
             limit = limoff[0]
             offset = None
@@ -372,15 +428,27 @@ class Limit(Term):
         else:
             raise LimitParseError("LIMIT requires a two integer tuple/list.")
 
-        lim = Builder.DIALECT.limit(limit, offset)
-        if isinstance(lim, tuple):
-            self.s, self.pos = lim  # pylint: disable=invalid-name
-        else:
-            self.s = lim  # pylint: disable=invalid-name
-            self.pos = -1
+        self.limit = limit
+        self.offset = offset
+        self.dialect = dialect
+
+    def render(self):
+        """Render the LIMIT by the dialect when the statement is rendered
+
+        Returns the sql and where it is placed by the dialect
+        """
+        lim = (self.dialect or current_dialect()).limit(
+            self.limit, self.offset
+        )
+        return lim if isinstance(lim, tuple) else (lim, -1)
+
+    @property
+    def pos(self):
+        """Where the LIMIT is placed"""
+        return self.render()[1]
 
     def __str__(self):
-        return self.s
+        return self.render()[0]
 
 
 class Set(Term):
@@ -412,7 +480,7 @@ class SetTerm(Term):
         self.val = val
 
     def __str__(self):
-        return Builder.DIALECT._update(self.oprt, self.field, self.val)
+        return current_dialect()._update(self.oprt, self.field, self.val)
 
 
 class Join(Term):
@@ -517,7 +585,7 @@ class JoinTerm(Term):
 
     def __str__(self):
         return "{} {} ON {}".format(
-            Builder.DIALECT._join(self.jointype),
+            current_dialect()._join(self.jointype),
             self.table,
             " AND ".join(
                 "{}={}".format(key, val) for key, val in self.onfields
@@ -525,13 +593,147 @@ class JoinTerm(Term):
         )
 
 
+class Values(Term):
+    """Rows of VALUES in INSERT"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __str__(self):
+        bind = current_dialect().bind
+        return ",".join(
+            ["(%s)" % ",".join([bind(val) for val in row]) for row in self.rows]
+        )
+
+
+class Upsert(Term):
+    """INSERT ... ON CONFLICT, or the equivalent of the dialect"""
+
+    def __init__(self, table, fields, rows, keys, updates):
+        self.table = table
+        self.fields = fields
+        self.rows = rows
+        self.keys = keys
+        self.updates = updates
+
+    def __str__(self):
+        dialect = current_dialect()
+        return dialect.upsert(
+            str(self.table),
+            [str(field) for field in self.fields],
+            [[dialect.bind(val) for val in row] for row in self.rows],
+            [str(key) for key in self.keys],
+            [str(field) for field in self.updates],
+        )
+
+
+class BulkUpdate(Term):
+    """UPDATE of many rows with different values, matched by a key"""
+
+    def __init__(self, table, key, fields, rows):
+        self.table = table
+        self.key = key
+        self.fields = fields
+        self.rows = rows
+
+    def __str__(self):
+        dialect = current_dialect()
+        return dialect.bulk_update(
+            str(self.table),
+            str(self.key),
+            [str(field) for field in self.fields],
+            [[dialect.bind(val) for val in row] for row in self.rows],
+        )
+
+
+class UnionTerm(Term):
+    """Queries in UNION, without brackets"""
+
+    def __init__(self, query):
+        self.query = query
+
+    def __str__(self):
+        return self.query.sql(brackets=False)
+
+
+# The keywords followed by the tables in the statements
+_TABLE_KEYWORDS = ("FROM", "INTO", "INSERT INTO", "UPDATE", "DELETE FROM")
+
+
+def _value_tables(value, tables):
+    """Collect the tables of the subqueries in the values"""
+    if isinstance(value, Builder):
+        return _term_tables(value, tables)
+    if isinstance(value, dict):
+        value = value.values()
+    elif not isinstance(value, (tuple, list)):
+        return True
+    known = True
+    for val in value:
+        known = _value_tables(val, tables) and known
+    return known
+
+
+def _term_tables(term, tables):
+    """Collect the names of the tables in the term
+
+    Returns False if some of the tables cannot be told, i.e. Raw tables.
+    """
+    if isinstance(term, Builder):
+        known = True
+        intables = False
+        for item in term.terms:
+            if not intables:
+                known = _term_tables(item, tables) and known
+            else:
+                items = item.terms if isinstance(item, TermList) else [item]
+                for table in items:
+                    if isinstance(table, TableFrom):
+                        table = table.table
+                    if isinstance(table, Table):
+                        tables.add(table.table.lower())
+                    elif isinstance(table, Builder):
+                        known = _term_tables(table, tables) and known
+                    else:
+                        known = False
+            intables = isinstance(item, str) and item in _TABLE_KEYWORDS
+        return known
+    if isinstance(term, TermList):
+        known = True
+        for item in term.terms:
+            known = _term_tables(item, tables) and known
+        return known
+    elif isinstance(term, Join):
+        for key in term.joins:
+            matching = re.match(JoinTerm.REGEX_KEY, str(key))
+            if not matching:
+                return False
+            tables.add(matching.group(2).split(".")[-1].lower())
+    elif isinstance(term, Where):
+        return _value_tables(term.conditions, tables)
+    elif isinstance(term, Set):
+        return _value_tables(term.sets, tables)
+    elif isinstance(term, Values):
+        return _value_tables(term.rows, tables)
+    elif isinstance(term, (Upsert, BulkUpdate)):
+        tables.add(term.table.table.lower())
+    elif isinstance(term, UnionTerm):
+        return _term_tables(term.query, tables)
+    return True
+
+
 class Builder(Term):
-    """SQL builder"""
+    """SQL builder
+
+    The terms are rendered with the dialect of the builder. Without a
+    dialect, a subquery is rendered with the dialect of the query it is in,
+    and a query on its own with the default `Builder.DIALECT`.
+    """
 
     DIALECT = Dialect
 
     def __init__(self, dialect=None):
-        Builder.DIALECT = dialect or Dialect
+        self.dialect = dialect
 
         # for join
         self.table = None
@@ -545,7 +747,7 @@ class Builder(Term):
         self.terms.append("SELECT DISTINCT" if distinct else "SELECT")
 
         fieldterms = [Field.parse(field or "*", "select") for field in fields]
-        self.terms.append(",".join([str(field) for field in fieldterms]))
+        self.terms.append(TermList(fieldterms))
         return self
 
     def _sub(self, alias=None):
@@ -564,7 +766,7 @@ class Builder(Term):
             if isinstance(tableterms[0], Builder)
             else tableterms[0]
         )
-        self.terms.append(",".join([str(table) for table in tableterms]))
+        self.terms.append(TermList(tableterms))
         return self
 
     def _where(self, conditions):
@@ -583,31 +785,42 @@ class Builder(Term):
     def _limit(self, limoff):
         if not isinstance(limoff, (tuple, list)):
             limoff = [limoff]
-        lim = Limit(limoff)
-        if lim.pos == -1:
-            self.terms.append(lim)
-        elif isinstance(lim.pos, int):
-            self.terms.insert(lim.pos, str(lim))
-        else:  # oracle, add where condition
-            # check if where is there:
-            if "WHERE" not in self.terms:
-                self.terms.append("WHERE")
-                self.terms.append(lim)
-            else:
-                whereindex = self.terms.index("WHERE")
-                # TODO: ' AND ' and ' OR ' could also be in subquery or values
-                # it's still OK to have brackets, keep it for now
-                if " AND " in str(self.terms[whereindex + 1]) or " OR " in str(
-                    self.terms[whereindex + 1]
-                ):
-                    self.terms[whereindex + 1] = "({}) AND ({})".format(
-                        self.terms[whereindex + 1], lim
-                    )
-                else:
-                    self.terms.insert(whereindex + 2, "AND ({})".format(lim))
-
+        # placed when rendered, by the dialect of the statement
+        self.terms.append(Limit(limoff))
         return self
 
+    def _placed_terms(self):
+        """Get the terms with the LIMIT placed where the dialect puts it"""
+        terms = list(self.terms)
+        index = next(
+            (i for i, term in enumerate(terms) if isinstance(term, Limit)),
+            None,
+        )
+        if index is None:
+            return terms
+        lim, pos = terms[index].render()
+        if pos == -1:
+            return terms
+        del terms[index]
+        if isinstance(pos, int):
+            terms.insert(pos, lim)
+        # oracle, add where condition
+        # check if where is there:
+        elif "WHERE" not in terms:
+            terms[index:index] = ["WHERE", lim]
+        else:
+            whereindex = terms.index("WHERE")
+            # TODO: ' AND ' and ' OR ' could also be in subquery or values
+            # it's still OK to have brackets, keep it for now
+            whereterm = str(terms[whereindex + 1])
+            if " AND " in whereterm or " OR " in whereterm:
+                terms[whereindex + 1] = TermList(
+                    ["(", terms[whereindex + 1], ") AND (", lim, ")"], ""
+                )
+            else:
+                terms.insert(whereindex + 2, TermList(["AND (", lim, ")"], ""))
+        return terms
+
     def _union(self, other, all_=False):
         self.terms.append("UNION")
         if all_:
@@ -627,7 +840,7 @@ class Builder(Term):
         else:
             fields = always_list(fields)
         fieldterms = [Field.parse(field, "group") for field in fields]
-        self.terms.append(",".join([str(field) for field in fieldterms]))
+        self.terms.append(TermList(fieldterms))
         return self
 
     def _having(self, conditions):
@@ -659,9 +872,7 @@ class Builder(Term):
             fieldterms = [
                 Table.parse(field, "insert") for field in always_list(fields)
             ]
-            self.terms.append(
-                "({})".format(",".join([str(field) for field in fieldterms]))
-            )
+            self.terms.append(TermList(["(", TermList(fieldterms), ")"], ""))
 
         # support INSERT INTO SELECT ...
         if isinstance(values[0], Builder):
@@ -701,13 +912,7 @@ class Builder(Term):
                         "in INSERT: {}".format(type(value))
                     )
             self.terms.append("VALUES")
-            valterms = []
-            for inval in insertvals:
-                valterms.append(
-                    "(%s)"
-                    % (",".join([Builder.DIALECT.value(iv) for iv in inval]))
-                )
-            self.terms.append(",".join(valterms))
+            self.terms.append(Values(insertvals))
         return self
 
     def _update(self, table):
@@ -784,6 +989,38 @@ class Builder(Term):
         self._update(table)._set(data)._where(where)
         return self
 
+    def bulk_update(self, table, fields, rows, key="id"):
+        """Build UPDATE statement for many rows with different values
+
+        @params:
+            `table`: The table
+            `fields`: The fields of the rows, including the key
+            `rows`: The rows of values, as tuples in the order of fields
+            `key`: The field to match the rows
+        """
+        fields = always_list(fields or [])
+        if key not in fields:
+            raise UpdateParseError(
+                "Key {} is not in the fields for bulk UPDATE.".format(key)
+            )
+        index = fields.index(key)
+        updates = [field for field in fields if field != key]
+        if not updates:
+            raise UpdateParseError("No fields to update for bulk UPDATE.")
+        self.terms.append(
+            BulkUpdate(
+                Table(table),
+                Field(key),
+                [Field(field) for field in updates],
+                [
+                    [row[index]]
+                    + [val for i, val in enumerate(row) if i != index]
+                    for row in rows
+                ],
+            )
+        )
+        return self
+
     def delete(self, table, where):
         """Build DELETE statement"""
         self._delete(table)._where(where)
@@ -817,39 +1054,108 @@ class Builder(Term):
         self._insert(table, values2, fields)
         return self
 
+    def upsert(self, table, fields, rows, keys, updates=None):
+        """Build INSERT ... ON CONFLICT DO UPDATE statement
+
+        The statement is interpreted by the dialect, i.e. ON DUPLICATE KEY
+        UPDATE for MySQL and MERGE for SQL Server and Oracle.
+        @params:
+            `table`: The table
+            `fields`: The fields of the rows
+            `rows`: The rows of values, as tuples in the order of fields
+            `keys`: The fields of the unique keys to tell the conflicts
+            `updates`: The fields to update on conflicts. Defaults to
+                the fields other than the keys.
+        """
+        fields = always_list(fields)
+        keys = always_list(keys)
+        updates = (
+            [field for field in fields if field not in keys]
+            if updates is None
+            else always_list(updates)
+        )
+        if not keys:
+            raise UpsertParseError("Conflict keys are required for UPSERT.")
+        for field in keys + updates:
+            if field not in fields:
+                raise UpsertParseError(
+                    "Unknown field for UPSERT: {}".format(field)
+                )
+        self.terms.append(
+            Upsert(
+                Table(table),
+                [Field(field) for field in fields],
+                rows,
+                [Field(key) for key in keys],
+                [Field(field) for field in updates],
+            )
+        )
+        return self
+
     def union(self, *queries):
         """Add UNION"""
         queries = list(queries)
         if not self.terms:
-            query = queries.pop(0)
-            subas = query._subas
-            query._subas = None  # remove brackets
-            self.terms.append(str(query))
-            query._subas = subas
+            self.terms.append(UnionTerm(queries.pop(0)))
         for query in queries:
             if query._subas:
-                subas = query._subas
-                query._subas = None
                 self.terms.append("UNION ALL")
-                self.terms.append(str(query))
-                query._subas = subas
+                self.terms.append(UnionTerm(query))
             else:
                 self.terms.append("UNION")
                 self.terms.append(query)
         return self
 
-    def sql(self):
+    def tables(self):
+        """Get the names of the tables in the statement
+
+        The tables in the subqueries, the joins and the unions are included.
+        The names are in lower case, without the schemas. Returns None if
+        some of the tables cannot be told, i.e. Raw tables.
+        """
+        tables = set()
+        if not _term_tables(self, tables):
+            return None
+        return frozenset(tables)
+
+    def sql(self, brackets=True):
         """Get the SQL"""
         if self._sql:
             return self._sql
 
-        ret = " ".join(["%s" % t for t in self.terms])
+        dialect = self.dialect or current_dialect()
+        with dialect_context(dialect):
+            ret = " ".join(["%s" % t for t in self._placed_terms()])
+        if not brackets:
+            return ret
         if self._subas is True:
             ret = "({})".format(ret)
         elif self._subas:
-            ret = "({}) AS {}".format(ret, Builder.DIALECT.quote(self._subas))
+            ret = "({}) AS {}".format(ret, dialect.quote(self._subas))
 
         return ret
 
+    def compile(self, paramstyle=None):
+        """Compile the statement with the values bound as parameters
+
+        Returns the sql with placeholders of `paramstyle` (defaults to the
+        paramstyle of the dialect) and the parameters for `cursor.execute`,
+        which is `None` if no values are bound.
+        """
+        return self._compile(
+            Params(
+                paramstyle or (self.dialect or current_dialect()).PARAMSTYLE
+            )
+        )
+
+    def _compile(self, params):
+        """Compile the statement, collecting the bound values in params"""
+        token = _PARAMS.set(params)
+        try:
+            sql = self.sql()
+        finally:
+            _PARAMS.reset(token)
+        return params.bind(sql)
+
     def __str__(self):
         return self.sql()
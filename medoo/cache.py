@@ -0,0 +1,485 @@
+"""Caches for pymedoo"""
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from .builder import Builder, Term, WhereTerm, SetTerm, dialect_context
+from .dialect import Dialect, Params
+
+# The methods of Dialect binding the values as they are
+VERBATIM_METHODS = (
+    "eq",
+    "ne",
+    "between",
+    "_default",
+    "up_eq",
+    "_up_default",
+)
+# The methods of Dialect binding no values
+VALUELESS_METHODS = ("is_",)
+
+
+# The statements that write no tables
+REGEX_NOWRITE = re.compile(
+    r"^\s*(?:SELECT|BEGIN|START|COMMIT|ROLLBACK|SAVEPOINT|RELEASE|SAVE|SET|"
+    r"SHOW|EXPLAIN|PRAGMA|VALUES)\b",
+    re.I,
+)
+# The statements that write a table, with the table
+REGEX_WRITE = re.compile(
+    r"^\s*(?:INSERT\s+(?:OR\s+\w+\s+)?INTO|REPLACE\s+INTO|"
+    r"UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM|MERGE\s+INTO|"
+    r"(?:CREATE|DROP|ALTER|TRUNCATE)\s+(?:(?:TEMP|TEMPORARY)\s+)?TABLE"
+    r"(?:\s+IF\s+(?:NOT\s+)?EXISTS)?)\s+([^\s(]+)",
+    re.I,
+)
+
+_MISSING = object()
+# Cached for the shapes whose values are not bound as they are
+_UNCACHEABLE = object()
+
+
+class _Uncacheable(Exception):
+    """Raised when the shape of a query cannot be cached"""
+
+
+def _freeze(obj):
+    """Get a hashable representation of values that are not bound"""
+    if isinstance(obj, Builder):
+        raise _Uncacheable()
+    if isinstance(obj, Term):
+        return (type(obj), str(obj))
+    if isinstance(obj, dict):
+        return ("{}", tuple((key, _freeze(val)) for key, val in obj.items()))
+    if isinstance(obj, (tuple, list)):
+        return ("[]", tuple(_freeze(val) for val in obj))
+    return obj
+
+
+def _value_shape(value, leaves):
+    """Get the shape of a value, collecting the values to bind in leaves"""
+    if isinstance(value, Term):
+        return _freeze(value)
+    if isinstance(value, (tuple, list)):
+        for val in value:
+            if isinstance(val, Term):
+                raise _Uncacheable()
+        leaves.extend(value)
+        return len(value)
+    leaves.append(value)
+    return "null" if value is None else "?"
+
+
+def _where_shape(conditions, leaves, keys):
+    """Get the shape of WHERE conditions
+
+    The values to bind are collected in `leaves`, and the keys with the
+    number of their values in `keys`, in the order they are rendered.
+    """
+    shape = []
+    for key, val in conditions:
+        if isinstance(key, Term):
+            shape.append(_freeze(key))
+            continue
+        connector = key.split("#")[0].strip().upper()
+        if connector in ("AND", "OR"):
+            if isinstance(val, dict):
+                val = val.items()
+            elif isinstance(val, (tuple, list)):
+                val = [v if isinstance(v, tuple) else (v, None) for v in val]
+            else:
+                raise _Uncacheable()
+            shape.append((key, tuple(_where_shape(val, leaves, keys))))
+            continue
+        nleaves = len(leaves)
+        shape.append((key, _value_shape(val, leaves)))
+        keys.append((key, len(leaves) - nleaves, False))
+    return shape
+
+
+def table_name(table):
+    """Get the name of a table to tell the results to invalidate
+
+    The name is in lower case, without the quotes and the schema.
+    """
+    return re.sub(r'[`"\[\]]', "", str(table)).split(".")[-1].lower()
+
+
+def written_tables(sql):
+    """Get the tables written by a statement
+
+    Returns an empty set for statements writing nothing, or None if the
+    tables cannot be told.
+    """
+    if REGEX_NOWRITE.match(sql):
+        return frozenset()
+    matching = REGEX_WRITE.match(sql)
+    if not matching:
+        return None
+    return frozenset([table_name(matching.group(1))])
+
+
+def _sizeof(rows):
+    """Estimate the memory used by the rows"""
+    return sys.getsizeof(rows) + sum(
+        sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+        for row in rows
+    )
+
+
+def _is_dialect_method(dialect, name, methods):
+    """Check if the method of the dialect is one of the methods of Dialect
+    that is not overridden"""
+    if name not in methods:
+        return False
+    method = getattr(dialect, name, None)
+    return getattr(method, "__func__", None) is getattr(Dialect, name).__func__
+
+
+class StatementCache:
+    """Compiled statements cached by the shapes of the queries
+
+    The shape of a query consists of everything but the values to bind:
+    the tables, the columns, the keys of the conditions, the number of
+    values for each key, the joins, ORDER, LIMIT and GROUP and the dialect.
+    For a query whose shape is cached, the values are bound to the compiled
+    statement directly, without parsing and rendering the query.
+
+    Only queries whose values are bound as they are can be cached. Queries
+    with subqueries or operators that rewrite the values (i.e. LIKE) are
+    compiled every time.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._cache)
+
+    def stats(self):
+        """Get the statistics of the cache"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._cache),
+            "maxsize": self.maxsize,
+        }
+
+    def clear(self):
+        """Clear the cache and the statistics"""
+        with self._lock:
+            self._cache.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def select(
+        self,
+        dialect,
+        table,
+        columns="*",
+        where=None,
+        join=None,
+        distinct=False,
+        newtable=None,
+        sub=None,
+    ):
+        """Compile a SELECT statement"""
+        where = dict(where) if where else {}
+        order = where.pop("ORDER", None)
+        limit = where.pop("LIMIT", None)
+        group = where.pop("GROUP", None)
+        having = where.pop("HAVING", None)
+        exists = where.pop("EXISTS", None)
+
+        def build():
+            if order:
+                where["ORDER"] = order
+            if limit:
+                where["LIMIT"] = limit
+            if group:
+                where["GROUP"] = group
+            if having:
+                where["HAVING"] = having
+            if exists:
+                where["EXISTS"] = exists
+            return Builder(dialect).select(
+                table, columns, where, join, distinct, newtable, sub
+            )
+
+        def shape(leaves, keys):
+            if exists:
+                raise _Uncacheable()
+            return (
+                _freeze(table),
+                _freeze(columns),
+                tuple(_where_shape(where.items(), leaves, keys)),
+                _freeze(join),
+                distinct,
+                _freeze(newtable),
+                _freeze(sub),
+                _freeze(order),
+                _freeze(limit),
+                _freeze(group),
+                tuple(_where_shape(having.items(), leaves, keys))
+                if having
+                else None,
+            )
+
+        return self._compile(dialect, "select", shape, build)
+
+    def update(self, dialect, table, data, where=None):
+        """Compile an UPDATE statement"""
+
+        def build():
+            return Builder(dialect).update(table, data, where)
+
+        def shape(leaves, keys):
+            sets = []
+            for key, val in data.items():
+                nleaves = len(leaves)
+                sets.append((key, _value_shape(val, leaves)))
+                keys.append((key, len(leaves) - nleaves, True))
+            return (
+                _freeze(table),
+                tuple(sets),
+                tuple(_where_shape(where.items(), leaves, keys))
+                if where
+                else None,
+            )
+
+        return self._compile(dialect, "update", shape, build)
+
+    def delete(self, dialect, table, where):
+        """Compile a DELETE statement"""
+
+        def build():
+            return Builder(dialect).delete(table, where)
+
+        def shape(leaves, keys):
+            return (
+                _freeze(table),
+                tuple(_where_shape(where.items(), leaves, keys))
+                if where
+                else None,
+            )
+
+        return self._compile(dialect, "delete", shape, build)
+
+    @staticmethod
+    def _mask(dialect, keys):
+        """Tell which values are bound for the keys
+
+        Returns None if some of the keys rewrite their values.
+        """
+        mask = []
+        for key, nleaves, isset in keys:
+            if isset:
+                matching = re.match(SetTerm.REGEX_KEY, key)
+                if not matching:
+                    return None
+                name = dialect._update_name(matching.group(2))
+                if not hasattr(dialect, name):
+                    name = "_up_default"
+            else:
+                matching = re.match(WhereTerm.REGEX_KEY, key)
+                if not matching:
+                    return None
+                oprt = matching.group(4)
+                name = dialect._operator_name(oprt)
+                if not hasattr(dialect, name):
+                    name = "_default"
+                    if re.search(r"(?:any|all|some)$", oprt, re.I):
+                        return None
+
+            if _is_dialect_method(dialect, name, VERBATIM_METHODS):
+                mask.extend([True] * nleaves)
+            elif _is_dialect_method(dialect, name, VALUELESS_METHODS):
+                mask.extend([False] * nleaves)
+            else:
+                return None
+        return mask
+
+    def _compile(self, dialect, method, shape, build):
+        dialect = dialect or Dialect
+        leaves = []
+        keys = []
+        try:
+            # terms in the shape are rendered with the dialect
+            with dialect_context(dialect):
+                key = (dialect, method, shape(leaves, keys))
+            hash(key)
+        except (_Uncacheable, TypeError):
+            key = None
+
+        with self._lock:
+            entry = self._cache.get(key, _MISSING)
+            if entry is not _MISSING:
+                self._cache.move_to_end(key)
+            if entry is _MISSING or entry is _UNCACHEABLE:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if entry is not _MISSING and entry is not _UNCACHEABLE:
+            sql, order, mask, row = entry
+            if mask is not None:
+                leaves = [leaf for leaf, bnd in zip(leaves, mask) if bnd]
+            return sql, row([leaves[i] for i in order]) or None
+
+        params = Params(dialect.PARAMSTYLE)
+        sql, values = build()._compile(params)
+        if key is None or entry is _UNCACHEABLE:
+            return sql, values
+
+        # make sure that the values are bound as they are
+        mask = self._mask(dialect, keys)
+        if mask is not None:
+            leaves = [leaf for leaf, bnd in zip(leaves, mask) if bnd]
+            if len(leaves) != len(params.values) or any(
+                leaf is not value for leaf, value in zip(leaves, params.values)
+            ):
+                mask = None
+
+        with self._lock:
+            self._cache[key] = (
+                _UNCACHEABLE
+                if mask is None
+                else (
+                    sql,
+                    params.order,
+                    None if all(mask) else mask,
+                    params.row,
+                )
+            )
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+        return sql, values
+
+
+class ResultCache:
+    """Results of SELECT cached by their statements and parameters
+
+    The rows are kept as tuples for `ttl` seconds (forever if None), and the
+    least recently used results are evicted when there are more than
+    `maxsize` of them, or their rows take more than `maxbytes` bytes
+    (estimated). The results are invalidated when the tables they select
+    from are written.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60, maxbytes=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        # key => (expiry, description, rows, tables, nbytes)
+        self._cache = OrderedDict()
+        # table => keys of the results selecting from it
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._cache)
+
+    def stats(self):
+        """Get the statistics of the cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "size": len(self._cache),
+                "maxsize": self.maxsize,
+                "nbytes": self.nbytes,
+                "maxbytes": self.maxbytes,
+            }
+
+    def clear(self):
+        """Clear the cache and the statistics"""
+        with self._lock:
+            self._cache.clear()
+            self._tables.clear()
+            self.nbytes = 0
+            self.hits = self.misses = self.evictions = 0
+            self.expirations = self.invalidations = 0
+
+    def _drop(self, key):
+        entry = self._cache.pop(key)
+        self.nbytes -= entry[4]
+        for table in entry[3]:
+            keys = self._tables[table]
+            keys.discard(key)
+            if not keys:
+                del self._tables[table]
+
+    def get(self, key):
+        """Get the description and the rows of a result, or None"""
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and (
+                entry[0] is not None and entry[0] <= time.monotonic()
+            ):
+                self._drop(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def set(self, key, description, rows, tables):
+        """Cache the description and the rows of a result
+
+        The result is not cached if the tables cannot be told (None).
+        """
+        if tables is None:
+            return
+        nbytes = _sizeof(rows)
+        if self.maxbytes and nbytes > self.maxbytes:
+            return
+        expiry = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            if key in self._cache:
+                self._drop(key)
+            self._cache[key] = (expiry, description, rows, tables, nbytes)
+            self.nbytes += nbytes
+            for table in tables:
+                self._tables.setdefault(table, set()).add(key)
+            while len(self._cache) > self.maxsize or (
+                self.maxbytes and self.nbytes > self.maxbytes
+            ):
+                self._drop(next(iter(self._cache)))
+                self.evictions += 1
+
+    def invalidate(self, tables=None):
+        """Drop the results selecting from the tables
+
+        All the results are dropped if `tables` is None.
+        """
+        with self._lock:
+            if tables is None:
+                keys = list(self._cache)
+            else:
+                keys = set()
+                for table in tables:
+                    keys.update(self._tables.get(table, ()))
+            for key in keys:
+                self._drop(key)
+            self.invalidations += len(keys)
@@ -7,6 +7,9 @@ from ..dialect import Dialect
 class DialectMssql(Dialect):
     """Mssql dialect"""
 
+    PARAMSTYLE = "pyformat"
+    MAX_PARAMS = 2099
+
     @classmethod
     def limit(cls, limit, offset=None):
         """
@@ -19,6 +22,40 @@ class DialectMssql(Dialect):
             )
         return "TOP {}".format(limit), 1
 
+    @classmethod
+    def savepoint(cls, name):
+        return "SAVE TRANSACTION {}".format(name)
+
+    @classmethod
+    def rollback_savepoint(cls, name):
+        return "ROLLBACK TRANSACTION {}".format(name)
+
+    @classmethod
+    def release_savepoint(cls, name):
+        return None
+
+    @classmethod
+    def upsert(cls, table, fields, rows, keys, updates):
+        sql = (
+            "MERGE INTO {} AS target USING (VALUES {}) AS source ({}) "
+            "ON {} ".format(
+                table,
+                ",".join("({})".format(",".join(row)) for row in rows),
+                ",".join(fields),
+                " AND ".join(
+                    "target.{0}=source.{0}".format(key) for key in keys
+                ),
+            )
+        )
+        if updates:
+            sql += "WHEN MATCHED THEN UPDATE SET {} ".format(
+                ",".join("{0}=source.{0}".format(field) for field in updates)
+            )
+        return sql + "WHEN NOT MATCHED THEN INSERT ({}) VALUES ({});".format(
+            ",".join(fields),
+            ",".join("source.{}".format(field) for field in fields),
+        )
+
 
 class Mssql(Base):
     """Mssql medoo wrapper"""
@@ -26,9 +26,26 @@ class _MysqlConnectorCursor:
         return self
 
 
+class _MysqlUnbufferedCursor(_MysqlConnectorCursor):
+    """Wrap up an unbuffered mysql.connector.cursor object
+    The unread rows have to be consumed before the connection is used again.
+    """
+
+    def close(self):
+        """Consume the unread rows and close the cursor"""
+        while self._mccursor.fetchone() is not None:
+            pass
+        return self._mccursor.close()
+
+
 class DialectMysql(Dialect):
     """Mysql dialect"""
 
+    PARAMSTYLE = "pyformat"
+    # executemany of INSERT is sent as one statement by mysql.connector,
+    # keep it under the default max_allowed_packet
+    MAX_PACKET = 4 * 1024 * 1024
+
     @staticmethod
     def quote(item):
         if isinstance(item, str):
@@ -54,6 +71,22 @@ class DialectMysql(Dialect):
             return "'%s'" % item.translate(_escape_table)
         return str(item)
 
+    @classmethod
+    def upsert(cls, table, fields, rows, keys, updates):
+        """MySQL resolves the conflicts on any unique keys"""
+        return (
+            "INSERT INTO {} ({}) VALUES {} ON DUPLICATE KEY UPDATE {}"
+        ).format(
+            table,
+            ",".join(fields),
+            ",".join("({})".format(",".join(row)) for row in rows),
+            ",".join(
+                "{0}=VALUES({0})".format(field) for field in updates
+            )
+            # nothing to update, keep the row as it is
+            or "{0}={0}".format(keys[0]),
+        )
+
 
 class Mysql(Base):
     """Mysql medoo wrapper"""
@@ -65,6 +98,10 @@ class Mysql(Base):
         )
         self.dialect(DialectMysql)
 
+    def _stream_cursor(self, itersize):
+        # rows are read from the connection one by one when iterated
+        return _MysqlUnbufferedCursor(self.connection.cursor(buffered=False))
+
     def _connect(self, *args, **kwargs):
         arguments = {"host": "localhost", "port": 3306}
         arguments.update(kwargs)
@@ -7,6 +7,51 @@ from ..dialect import Dialect
 class DialectOracle(Dialect):
     """Oracle dialect"""
 
+    PARAMSTYLE = "named"
+    MAX_PARAMS = 65535
+    PING = "SELECT 1 FROM dual"
+
+    @classmethod
+    def limit(cls, limit, offset=None):
+        """
+        Require Oracle >= 12c
+        """
+        if offset:
+            return "OFFSET {} ROWS FETCH NEXT {} ROWS ONLY".format(
+                offset, limit
+            )
+        return "FETCH FIRST {} ROWS ONLY".format(limit)
+
+    @classmethod
+    def release_savepoint(cls, name):
+        return None
+
+    @classmethod
+    def upsert(cls, table, fields, rows, keys, updates):
+        sql = "MERGE INTO {} target USING ({}) source ON ({}) ".format(
+            table,
+            " UNION ALL ".join(
+                "SELECT {} FROM dual".format(
+                    ",".join(
+                        "{} {}".format(value, field)
+                        for value, field in zip(row, fields)
+                    )
+                )
+                for row in rows
+            ),
+            " AND ".join("target.{0}=source.{0}".format(key) for key in keys),
+        )
+        if updates:
+            sql += "WHEN MATCHED THEN UPDATE SET {} ".format(
+                ",".join(
+                    "target.{0}=source.{0}".format(field) for field in updates
+                )
+            )
+        return sql + "WHEN NOT MATCHED THEN INSERT ({}) VALUES ({})".format(
+            ",".join(fields),
+            ",".join("source.{}".format(field) for field in fields),
+        )
+
 
 class Oracle(Base):
     """Oracle medoo wrapper"""
@@ -16,6 +61,9 @@ class Oracle(Base):
         self.cursor = self.connection.cursor()
         self.dialect(DialectOracle)
 
+    def interrupt(self):
+        self.connection.cancel()
+
     def _connect(self, *args, **kwargs):
         arguments = {
             # some default settings
@@ -1,12 +1,59 @@
 """Mysql database"""
+from itertools import count
 import psycopg2
 from ..base import Base
 from ..dialect import Dialect
 
+_CURSOR_IDS = count()
+
+
+class _PgsqlNamedCursor:
+    """Wrap up a named (server-side) cursor of psycopg2
+    The description of a named cursor is not available until rows are
+    fetched, so the first row is fetched in advance when it is asked for.
+    """
+
+    def __init__(self, pgcursor):
+        self._pgcursor = pgcursor
+        self._first = []
+
+    def __getattr__(self, name):
+        return getattr(self._pgcursor, name)
+
+    @property
+    def description(self):
+        """Get the description, fetching the first row if necessary"""
+        if self._pgcursor.description is None and not self._first:
+            row = self._pgcursor.fetchone()
+            if row is not None:
+                self._first.append(row)
+        return self._pgcursor.description
+
+    def __next__(self):
+        if self._first:
+            return self._first.pop()
+        return next(self._pgcursor)
+
+    def fetchmany(self, size):
+        """Fetch the next size rows, with the first row fetched in advance"""
+        rows, self._first = self._first, []
+        # FETCH FORWARD 0 fetches the current row again
+        if size > len(rows):
+            rows += self._pgcursor.fetchmany(size - len(rows))
+        return rows
+
+    def __iter__(self):
+        return self
+
 
 class DialectPgsql(Dialect):
     """Mysql dialect"""
 
+    PARAMSTYLE = "pyformat"
+    MAX_PARAMS = 65535
+    # lists are adapted to arrays by psycopg2
+    IN_STRATEGY = "any"
+
 
 class Pgsql(Base):
     """Mysql medoo wrapper"""
@@ -16,6 +63,19 @@ class Pgsql(Base):
         self.cursor = self.connection.cursor()
         self.dialect(DialectPgsql)
 
+    def interrupt(self):
+        self.connection.cancel()
+
+    def _stream_cursor(self, itersize):
+        # a named cursor is declared on the server, and fetched by itersize
+        # rows at a time when iterated
+        cursor = self.connection.cursor(
+            name="medoo_cursor_{}".format(next(_CURSOR_IDS))
+        )
+        if itersize:
+            cursor.itersize = itersize
+        return _PgsqlNamedCursor(cursor)
+
     def _connect(self, *args, **kwargs):
         arguments = {"port": 5432}
         arguments.update(kwargs)
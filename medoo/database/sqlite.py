@@ -1,4 +1,5 @@
 """Sqlite3 adapter"""
+import re
 import sqlite3
 from ..base import Base
 from ..dialect import Dialect
@@ -7,6 +8,11 @@ from ..dialect import Dialect
 class DialectSqlite(Dialect):
     """Sqlite dialect"""
 
+    PARAMSTYLE = "qmark"
+    # SQLITE_MAX_VARIABLE_NUMBER
+    MAX_PARAMS = 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999
+    IN_STRATEGY = "temptable"
+
     @staticmethod
     def value(item):
         """Get the value"""
@@ -19,19 +25,138 @@ class DialectSqlite(Dialect):
             return "NULL"
         return str(item)
 
+    @classmethod
+    def temptable(cls, table):
+        # the column without a type takes the values of any type
+        return "CREATE TEMP TABLE IF NOT EXISTS {} (n INTEGER, k)".format(
+            cls.quote(table)
+        )
+
 
 class Sqlite(Base):
-    """Sqlite medoo wrapper"""
+    """Sqlite medoo wrapper
+
+    The pragmas are set when connected, by a profile of `PROFILES` and
+    the keyword arguments of the pragmas in `PRAGMAS`, or others by a dict
+    `pragmas`. `PRAGMA optimize` runs when the connection is closed, unless
+    `optimize` is False.
+    """
+
+    # The pragmas that can be set by keyword arguments
+    PRAGMAS = (
+        "journal_mode",
+        "synchronous",
+        "mmap_size",
+        "cache_size",
+        "temp_store",
+        "busy_timeout",
+    )
+
+    # The pragmas of the performance profiles
+    PROFILES = {
+        # fast writes, at the cost of losing the last transactions
+        # (not corrupting the database) on power loss
+        "bulk_load": {
+            "journal_mode": "WAL",
+            "synchronous": "OFF",
+            "cache_size": -262144,
+            "temp_store": "MEMORY",
+        },
+        # readers not blocked by the writer, with the database mapped
+        # into memory
+        "read_heavy": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "mmap_size": 268435456,
+            "cache_size": -65536,
+            "temp_store": "MEMORY",
+        },
+        # every transaction synced to the disk when committed
+        "durable": {
+            "journal_mode": "WAL",
+            "synchronous": "FULL",
+        },
+    }
 
     def __init__(self, *args, **kwargs):
+        # in case of errors before connecting
+        self.connection = None
+        self._pragmas = []
         database = kwargs.pop("database", kwargs.pop("database_file", None))
         if database is not None and database.startswith("file://"):
             database = database.replace("file://", "")
         if database is not None:
             kwargs["database"] = database
+
+        profile = kwargs.pop("profile", None)
+        if profile is not None and profile not in self.PROFILES:
+            raise ValueError("Unknown sqlite profile: {}.".format(profile))
+        pragmas = dict(self.PROFILES[profile]) if profile else {}
+        for name in self.PRAGMAS:
+            if name in kwargs:
+                pragmas[name] = kwargs.pop(name)
+        pragmas.update(kwargs.pop("pragmas", None) or {})
+        self.optimize = kwargs.pop("optimize", True)
+
         super(Sqlite, self).__init__(*args, **kwargs)
         self.cursor = self.connection.cursor()
         self.dialect(DialectSqlite)
+        for name, value in pragmas.items():
+            self._pragma(name, value)
+
+    def _pragma(self, name, value):
+        """Set a pragma"""
+        if not re.match(r"^\w+$", name) or not re.match(
+            r"^-?\w+$", str(value)
+        ):
+            raise ValueError(
+                "Invalid pragma: {} = {!r}.".format(name, value)
+            )
+        self.connection.execute(
+            "PRAGMA {} = {}".format(name, value)
+        ).fetchall()
+        if name not in self._pragmas:
+            self._pragmas.append(name)
+
+    def pragmas(self):
+        """Get the effective values of the pragmas that have been set
+
+        The values may differ from the ones set, i.e. the journal_mode of
+        an in-memory database is always "memory".
+        """
+        ret = {}
+        for name in self._pragmas:
+            row = self.connection.execute(
+                "PRAGMA {}".format(name)
+            ).fetchone()
+            ret[name] = row[0] if row else None
+        return ret
+
+    def close(self):
+        if self.optimize:
+            try:
+                self.connection.execute("PRAGMA optimize")
+            except sqlite3.Error:
+                # i.e. closed already
+                pass
+        super(Sqlite, self).close()
+
+    def _row_factory(self, cursor, row_factory):
+        # let sqlite3 make the rows
+        if row_factory is sqlite3.Row:
+            cursor.row_factory = sqlite3.Row
+            return "raw"
+        cursor.row_factory = None
+        # the rows of sqlite3 are tuples already
+        return "raw" if row_factory == "tuple" else row_factory
+
+    def interrupt(self):
+        self.connection.interrupt()
+
+    def _begin(self):
+        # sqlite3 does not start transactions in autocommit mode
+        if not self.connection.in_transaction:
+            self.connection.execute("BEGIN")
 
     def _connect(self, *args, **kwargs):
         arguments = {
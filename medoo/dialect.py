@@ -1,8 +1,76 @@
 """Dialect for different databases"""
+import re
+from contextvars import ContextVar
 from .exception import WhereParseError, AnyAllSomeParseError
 
 # import builder
 
+# Placeholders of the DB-API paramstyles
+PLACEHOLDERS = {
+    "qmark": "?",
+    "numeric": ":{num}",
+    "named": ":p{idx}",
+    "format": "%s",
+    "pyformat": "%(p{idx})s",
+}
+
+# The parameters being collected by the statement under compilation
+_PARAMS = ContextVar("medoo_params", default=None)
+
+
+class Params:
+    """Parameters collected while compiling a statement
+
+    Bound values are rendered as markers, which are replaced by the
+    placeholders of the paramstyle when the statement is finalized by `bind`.
+    """
+
+    REGEX_MARKER = re.compile("\x00(\\d+)\x00")
+
+    def __init__(self, paramstyle="qmark"):
+        if paramstyle not in PLACEHOLDERS:
+            raise ValueError("Unknown paramstyle: {}".format(paramstyle))
+        self.paramstyle = paramstyle
+        self.values = []
+        # the indexes of the values in the order of the placeholders
+        self.order = []
+
+    def add(self, value):
+        """Add a value and get its marker"""
+        self.values.append(value)
+        return "\x00{}\x00".format(len(self.values) - 1)
+
+    def placeholder(self, index):
+        """Get the placeholder for the index-th parameter in the sql"""
+        return PLACEHOLDERS[self.paramstyle].format(idx=index, num=index + 1)
+
+    def row(self, values):
+        """Arrange the values in the order of placeholders as the
+        parameters for the paramstyle"""
+        if self.paramstyle in ("named", "pyformat"):
+            return {"p%d" % i: value for i, value in enumerate(values)}
+        return tuple(values)
+
+    def bind(self, sql):
+        """Replace the markers in sql with placeholders
+
+        Returns the sql and the parameters
+        """
+        if not self.values:
+            return sql, None
+
+        if self.paramstyle in ("format", "pyformat"):
+            sql = sql.replace("%", "%%")
+
+        self.order = []
+
+        def replace(matching):
+            self.order.append(int(matching.group(1)))
+            return self.placeholder(len(self.order) - 1)
+
+        sql = Params.REGEX_MARKER.sub(replace, sql)
+        return sql, self.row(self.values[i] for i in self.order)
+
 
 class Dialect:
     """Dialect class"""
@@ -19,6 +87,28 @@ class Dialect:
 
     UPDATE_MAP = {"=": "up_eq"}
 
+    # The DB-API paramstyle of the driver
+    PARAMSTYLE = "qmark"
+    # The number of rows sent at once by bulk operations
+    BULK_ROWS = 1000
+    # The maximum number of parameters in a statement
+    MAX_PARAMS = None
+    # The maximum size in bytes of a statement with its parameters
+    MAX_PACKET = None
+    # The number of values of IN, above which the IN list is rewritten
+    # by IN_STRATEGY when selecting
+    IN_LIMIT = 1000
+    # How to rewrite an oversized IN list:
+    # - "chunk": select the rows by chunks of the values
+    # - "temptable": load the values into a temporary table and select
+    #   the rows by a subquery of it
+    # - "any": bind the values as an array, with `= ANY(...)`
+    IN_STRATEGY = "chunk"
+    # The temporary table for the "temptable" strategy
+    IN_TABLE = "_medoo_in"
+    # The statement to check if a connection is usable
+    PING = "SELECT 1"
+
     JOIN_MAP = {
         ">": "LEFT JOIN",
         "<": "RIGHT JOIN",
@@ -44,6 +134,69 @@ class Dialect:
         # TODO: possible injection
         return str(item)
 
+    @classmethod
+    def bind(cls, item):
+        """How is VALUE being bound when compiling with parameters"""
+        from . import builder
+
+        params = _PARAMS.get()
+        if params is None or isinstance(item, builder.Term):
+            return cls.value(item)
+        return params.add(item)
+
+    @classmethod
+    def chunksize(cls, row):
+        """How many rows like `row` can be sent in one statement or one
+        `executemany` call"""
+        size = cls.BULK_ROWS
+        if cls.MAX_PARAMS and row:
+            size = min(size, cls.MAX_PARAMS // len(row))
+        if cls.MAX_PACKET:
+            # estimate the size of a row by its string representation
+            rowsize = sum(len(str(value)) + 4 for value in row) + 4
+            size = min(size, cls.MAX_PACKET // rowsize)
+        return max(size, 1)
+
+    @classmethod
+    def temptable(cls, table):
+        """How to create the temporary table of the values of IN lists
+
+        The values of the n-th IN list are saved in column `k` with `n`.
+        Only supported by the dialects with such a table, i.e. SQLite.
+        """
+        raise ValueError(
+            "{} has no temporary table for the IN lists, "
+            'use IN_STRATEGY "chunk" instead.'.format(cls.__name__)
+        )
+
+    @classmethod
+    def savepoint(cls, name):
+        """How to set a savepoint in a transaction"""
+        return "SAVEPOINT {}".format(name)
+
+    @classmethod
+    def rollback_savepoint(cls, name):
+        """How to roll back to a savepoint"""
+        return "ROLLBACK TO SAVEPOINT {}".format(name)
+
+    @classmethod
+    def release_savepoint(cls, name):
+        """How to release a savepoint
+
+        None if savepoints cannot be released.
+        """
+        return "RELEASE SAVEPOINT {}".format(name)
+
+    @classmethod
+    def _in_array(cls, value):
+        """Whether the values of IN should be bound as an array"""
+        return (
+            cls.IN_STRATEGY == "any"
+            and cls.IN_LIMIT is not None
+            and len(value) > cls.IN_LIMIT
+            and _PARAMS.get() is not None
+        )
+
     @classmethod
     def limit(cls, limit, offset=None):
         """How is LIMIT being interpreted"""
@@ -52,10 +205,53 @@ class Dialect:
             fmt += " OFFSET {offset}"
         return fmt.format(limit=limit, offset=offset)
 
+    @classmethod
+    def upsert(cls, table, fields, rows, keys, updates):
+        """How is UPSERT being interpreted
+
+        `table`, `fields`, the conflict `keys` and the fields to `updates`
+        are quoted, and `rows` are lists of the bound values.
+        """
+        sql = "INSERT INTO {} ({}) VALUES {} ON CONFLICT ({}) ".format(
+            table,
+            ",".join(fields),
+            ",".join("({})".format(",".join(row)) for row in rows),
+            ",".join(keys),
+        )
+        if not updates:
+            return sql + "DO NOTHING"
+        return sql + "DO UPDATE SET " + ",".join(
+            "{0}=excluded.{0}".format(field) for field in updates
+        )
+
+    @classmethod
+    def bulk_update(cls, table, key, fields, rows):
+        """How is UPDATE of many rows with different values being interpreted
+
+        `table`, the `key` and the `fields` to update are quoted, and `rows`
+        are lists of the bound values, with the value of the key first.
+        """
+        sets = []
+        for i, field in enumerate(fields, 1):
+            sets.append(
+                "{}=CASE {} {} ELSE {} END".format(
+                    field,
+                    key,
+                    " ".join(
+                        "WHEN {} THEN {}".format(row[0], row[i])
+                        for row in rows
+                    ),
+                    field,
+                )
+            )
+        return "UPDATE {} SET {} WHERE {} IN ({})".format(
+            table, ",".join(sets), key, ",".join(row[0] for row in rows)
+        )
+
     @classmethod
     def up_eq(cls, field, value):
         """Equal (assignment) in UPDATE clause"""
-        return "{}={}".format(field, cls.value(value))
+        return "{}={}".format(field, cls.bind(value))
 
     @classmethod
     def is_(cls, field, value):
@@ -72,13 +268,15 @@ class Dialect:
         if isinstance(value, (tuple, list)) and len(value) == 1:
             value = value[0]
 
+        if isinstance(value, (tuple, list)) and cls._in_array(value):
+            return "{} = ANY({})".format(field, cls.bind(list(value)))
         if isinstance(value, (tuple, list)):
             return "{} IN ({})".format(
-                field, ",".join([cls.value(v) for v in value])
+                field, ",".join([cls.bind(v) for v in value])
             )
         if isinstance(value, builder.Builder):  # subquery
             return "{} IN ({})".format(field, cls.value(value))
-        return "{} = {}".format(field, cls.value(value))
+        return "{} = {}".format(field, cls.bind(value))
 
     @classmethod
     def like(cls, field, value, addperct=True):
@@ -97,7 +295,7 @@ class Dialect:
                 ]
             return "({})".format(
                 " OR ".join(
-                    ["{} LIKE {}".format(field, cls.value(v)) for v in value]
+                    ["{} LIKE {}".format(field, cls.bind(v)) for v in value]
                 )
             )
 
@@ -108,7 +306,7 @@ class Dialect:
             and not value.endswith("%")
         ):
             value = "%{}%".format(value)
-        return "{} LIKE {}".format(field, cls.value(value))
+        return "{} LIKE {}".format(field, cls.bind(value))
 
     @classmethod
     def ne(cls, field, value):  # pylint:disable=invalid-name
@@ -118,13 +316,15 @@ class Dialect:
         if isinstance(value, (tuple, list)) and len(value) == 1:
             value = value[0]
 
+        if isinstance(value, (tuple, list)) and cls._in_array(value):
+            return "{} <> ALL({})".format(field, cls.bind(list(value)))
         if isinstance(value, (tuple, list)):
             return "{} NOT IN ({})".format(
-                field, ",".join([cls.value(v) for v in value])
+                field, ",".join([cls.bind(v) for v in value])
             )
         if isinstance(value, builder.Builder):
             return "{} NOT IN ({})".format(field, cls.value(value))
-        return "{} <> {}".format(field, cls.value(value))
+        return "{} <> {}".format(field, cls.bind(value))
 
     @classmethod
     def between(cls, field, value):
@@ -134,7 +334,7 @@ class Dialect:
                 "BETWEEN value should a tuple or " "list with 2 elements."
             )
         return "{} BETWEEN {} AND {}".format(
-            field, cls.value(value[0]), cls.value(value[1])
+            field, cls.bind(value[0]), cls.bind(value[1])
         )
 
     @classmethod
@@ -153,12 +353,12 @@ class Dialect:
                 )
             value = "({})".format(value)
         else:
-            value = cls.value(value)
+            value = cls.bind(value)
         return "{} {} {}".format(field, oprt, value)
 
     @classmethod
     def _up_default(cls, oprt, field, value):
-        value = cls.value(value)
+        value = cls.bind(value)
         return "{0}={0}{1}{2}".format(field, oprt, value)
 
     @classmethod
@@ -166,31 +366,39 @@ class Dialect:
         return jointype
 
     @classmethod
-    def _operator(cls, oprt, field, value):
+    def _operator_name(cls, oprt):
+        """Map the operator in WHERE to the name of the method"""
         oprt = oprt or "="
         oprtmap = cls.OPERATOR_MAP
         if oprt in oprtmap:
-            oprt = oprtmap[oprt]
-        else:
-            sup = super(cls, cls)
-            if hasattr(sup, "OPERATOR_MAP"):
-                oprt = sup.OPERATOR_MAP.get(oprt, oprt)
+            return oprtmap[oprt]
+        sup = super(cls, cls)
+        if hasattr(sup, "OPERATOR_MAP"):
+            return sup.OPERATOR_MAP.get(oprt, oprt)
+        return oprt
+
+    @classmethod
+    def _update_name(cls, oprt):
+        """Map the operator in UPDATE SET to the name of the method"""
+        oprt = oprt or "="
+        upmap = cls.UPDATE_MAP
+        if oprt in upmap:
+            return upmap[oprt]
+        sup = super(cls, cls)
+        if hasattr(sup, "UPDATE_MAP"):
+            return sup.UPDATE_MAP.get(oprt, oprt)
+        return oprt
 
+    @classmethod
+    def _operator(cls, oprt, field, value):
+        oprt = cls._operator_name(oprt)
         if hasattr(cls, oprt):
             return getattr(cls, oprt)(field, value)
         return cls._default(oprt, field, value)
 
     @classmethod
     def _update(cls, oprt, field, value):
-        oprt = oprt or "="
-        upmap = cls.UPDATE_MAP
-        if oprt in upmap:
-            oprt = upmap[oprt]
-        else:
-            sup = super(cls, cls)
-            if hasattr(sup, "UPDATE_MAP"):
-                oprt = sup.UPDATE_MAP.get(oprt, oprt)
-
+        oprt = cls._update_name(oprt)
         if hasattr(cls, oprt):
             return getattr(cls, oprt)(field, value)
         return cls._up_default(oprt, field, value)
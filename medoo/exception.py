@@ -33,6 +33,10 @@ class InsertParseError(Exception):
     """Failed to parse insert clause"""
 
 
+class UpsertParseError(Exception):
+    """Failed to parse upsert clause"""
+
+
 class RecordKeyError(KeyError):
     """KeyError for Record"""
 
@@ -43,3 +47,11 @@ class RecordAttributeError(AttributeError):
 
 class GetFromEmptyRecordError(Exception):
     """Try to get from empty record"""
+
+
+class ForwardOnlyRecordsError(Exception):
+    """Random access or iterating again on forward-only records"""
+
+
+class PoolTimeoutError(Exception):
+    """No connection available in the pool in time"""
@@ -0,0 +1,292 @@
+"""Connection pool for pymedoo"""
+import threading
+import time
+from contextlib import contextmanager
+from . import database_class
+from .cache import StatementCache
+from .exception import PoolTimeoutError
+from .record import Records
+
+
+class Pool:
+    """A bounded pool of Medoo instances, each with its own connection
+
+    Instances are created on demand by `create` up to `size`, validated by
+    `ping` when checked out and recycled when older than `max_age` seconds.
+    Checking out from an exhausted pool waits for an instance to be
+    checked in, up to `timeout` seconds if given.
+    """
+
+    def __init__(self, create, size=5, max_age=None, timeout=None, ping=True):
+        self.create = create
+        self.size = size
+        self.max_age = max_age
+        self.timeout = timeout
+        self.ping = ping
+        self.waits = 0
+        self.wait_time = 0.0
+        self.connects = 0
+        self.recycled = 0
+        self.invalidated = 0
+        self.closed = False
+        # the idle instances, with the times they are created
+        self._idle = []
+        self._in_use = {}
+        # the slots reserved for the instances being checked out
+        self._reserved = 0
+        self._cond = threading.Condition()
+
+    def stats(self):
+        """Get the statistics of the pool"""
+        with self._cond:
+            return {
+                "size": self.size,
+                "in_use": len(self._in_use) + self._reserved,
+                "idle": len(self._idle),
+                "waits": self.waits,
+                "wait_time": self.wait_time,
+                "connects": self.connects,
+                "recycled": self.recycled,
+                "invalidated": self.invalidated,
+            }
+
+    def _reserve(self):
+        """Reserve a slot in the pool, with an idle instance if any"""
+        start = time.monotonic()
+        waited = False
+        with self._cond:
+            while (
+                not self._idle
+                and len(self._in_use) + self._reserved >= self.size
+            ):
+                if self.closed:
+                    break
+                waited = True
+                remaining = None
+                if self.timeout is not None:
+                    remaining = self.timeout - (time.monotonic() - start)
+                    if remaining <= 0:
+                        self.waits += 1
+                        self.wait_time += time.monotonic() - start
+                        raise PoolTimeoutError(
+                            "No connection available in {} seconds.".format(
+                                self.timeout
+                            )
+                        )
+                self._cond.wait(remaining)
+            if self.closed:
+                raise PoolTimeoutError("The pool is closed.")
+            if waited:
+                self.waits += 1
+                self.wait_time += time.monotonic() - start
+            self._reserved += 1
+            return self._idle.pop() if self._idle else None
+
+    def acquire(self):
+        """Check out an instance from the pool"""
+        item = self._reserve()
+        try:
+            if item is not None:
+                db, created = item
+                if (
+                    self.max_age is not None
+                    and time.monotonic() - created >= self.max_age
+                ):
+                    db.close()
+                    item = None
+                    with self._cond:
+                        self.recycled += 1
+                elif self.ping and not db.ping():
+                    self._close(db)
+                    item = None
+                    with self._cond:
+                        self.invalidated += 1
+            if item is None:
+                item = (self.create(), time.monotonic())
+                with self._cond:
+                    self.connects += 1
+        except Exception:
+            with self._cond:
+                self._reserved -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._reserved -= 1
+            self._in_use[id(item[0])] = item
+        return item[0]
+
+    @staticmethod
+    def _close(db):
+        """Close an instance whose connection may be broken"""
+        try:
+            db.close()
+        except Exception:  # pylint: disable=broad-except
+            pass
+
+    def release(self, db, discard=False):
+        """Check in an instance, rolling back what is not committed"""
+        if not discard:
+            try:
+                db.connection.rollback()
+            except Exception:  # pylint: disable=broad-except
+                discard = True
+        with self._cond:
+            item = self._in_use.pop(id(db))
+            if discard or self.closed:
+                self._close(db)
+            else:
+                self._idle.append(item)
+            self._cond.notify()
+
+    def close(self):
+        """Close the idle instances, and the others when checked in"""
+        with self._cond:
+            self.closed = True
+            for db, _ in self._idle:
+                db.close()
+            self._idle = []
+            self._cond.notify_all()
+
+
+class PooledMedoo:
+    """Medoo with a pool of connections, to be shared by threads
+
+    Each operation checks out a connection for its own, unless it runs in a
+    `with pooled.connection() as db:` block, where the thread holds the
+    connection for all the operations in the block.
+    """
+
+    # The operations delegated to the Medoo instances of the pool
+    OPERATIONS = (
+        "select",
+        "union",
+        "has",
+        "get",
+        "count",
+        "sum",
+        "avg",
+        "min",
+        "max",
+        "paginate",
+        "insert",
+        "bulk_insert",
+        "insert_stream",
+        "upsert",
+        "bulk_update",
+        "update",
+        "delete",
+        "query",
+    )
+    # The operations returning generators
+    GENERATORS = ("paginate",)
+
+    def __init__(
+        self,
+        dbtype,
+        *args,
+        pool_size=5,
+        max_age=None,
+        timeout=None,
+        ping=True,
+        **kwargs
+    ):
+        klass = dbtype if isinstance(dbtype, type) else database_class(dbtype)
+        # share the compiled statements between the connections
+        cachesize = kwargs.pop("statement_cache", 256)
+        if kwargs.get("bind") and cachesize:
+            kwargs["statement_cache"] = (
+                cachesize
+                if isinstance(cachesize, StatementCache)
+                else StatementCache(cachesize)
+            )
+        else:
+            kwargs["statement_cache"] = 0
+        self.pool = Pool(
+            lambda: klass(*args, **kwargs), pool_size, max_age, timeout, ping
+        )
+        self._local = threading.local()
+
+    def stats(self):
+        """Get the statistics of the pool"""
+        return self.pool.stats()
+
+    def close(self):
+        """Close the connections of the pool"""
+        self.pool.close()
+
+    @contextmanager
+    def connection(self):
+        """Hold a connection for the block
+
+        Nested blocks in the same thread get the same connection.
+        """
+        held = getattr(self._local, "db", None)
+        if held is not None:
+            yield held
+            return
+
+        db = self.pool.acquire()
+        self._local.db = db
+        try:
+            yield db
+        finally:
+            self._local.db = None
+            self.pool.release(db)
+
+    @contextmanager
+    def transaction(self):
+        """Hold a connection for a transaction, see `Base.transaction`"""
+        with self.connection() as db, db.transaction():
+            yield db
+
+    @contextmanager
+    def batch(self, commit_every=1000, commit_interval=None):
+        """Hold a connection for a batch, see `Base.batch`"""
+        with self.connection() as db, db.batch(
+            commit_every, commit_interval
+        ) as batch:
+            yield batch
+
+    def __getattr__(self, name):
+        if name not in self.OPERATIONS:
+            raise AttributeError(name)
+
+        def operation(*args, **kwargs):
+            return self._run(name, args, kwargs)
+
+        operation.__name__ = name
+        return operation
+
+    def _run(self, name, args, kwargs):
+        held = getattr(self._local, "db", None)
+        if held is not None:
+            return getattr(held, name)(*args, **kwargs)
+
+        if kwargs.get("stream") or kwargs.get("cache") is False:
+            raise ValueError(
+                "Streaming records need a connection held by "
+                "`with pooled.connection() as db:`."
+            )
+
+        if name in self.GENERATORS:
+            return self._iterate(name, args, kwargs)
+
+        db = self.pool.acquire()
+        try:
+            result = getattr(db, name)(*args, **kwargs)
+            # fetch the rows before the connection is checked in
+            if isinstance(result, Records):
+                result.all()
+        finally:
+            self.pool.release(db)
+        return result
+
+    def _iterate(self, name, args, kwargs):
+        """Check out a connection when the generator starts, and hold it
+        until the generator is exhausted or closed"""
+        db = self.pool.acquire()
+        try:
+            yield from getattr(db, name)(*args, **kwargs)
+        finally:
+            self.pool.release(db)
@@ -1,38 +1,73 @@
 """Record fetched from database"""
-from collections import OrderedDict
+import csv
+import dataclasses
+import gzip
+import io
+import json
+import os
+from collections import OrderedDict, deque, namedtuple
+from contextlib import contextmanager
+from itertools import chain, islice
+from operator import itemgetter
 from .exception import (
     RecordKeyError,
     RecordAttributeError,
     GetFromEmptyRecordError,
+    ForwardOnlyRecordsError,
 )
 from .util import reduce_datetimes
 
 
+def _key_index(keys):
+    """Map the keys to their indexes, with None for the duplicate keys"""
+    index = {}
+    for i, key in enumerate(keys):
+        index[key] = None if key in index else i
+    return index
+
+
 class Record:
     """
     A row, from a query, from a database.
     The idea is borrowed from https://github.com/kennethreitz/records
+
+    The keys and the map of the keys to the indexes are shared by the
+    readonly records from the same query.
     """
 
-    def __init__(self, keys, values, readonly=True):
+    __slots__ = ("_keys", "_values", "_readonly", "_index")
+
+    def __init__(self, keys, values, readonly=True, index=None):
         # sacrifice some efficiency but support setitem, setattr operation
-        self.__dict__["_keys"] = keys if readonly else keys[:]
-        self.__dict__["_values"] = values if readonly else values[:]
-        self.__dict__["_readonly"] = readonly
+        # for the records that are not readonly
+        setattr_ = object.__setattr__
+        setattr_(self, "_keys", keys if readonly else list(keys))
+        setattr_(self, "_values", values if readonly else list(values))
+        setattr_(self, "_readonly", readonly)
+        setattr_(self, "_index", index if readonly else None)
         # Ensure that lengths match properly.
-        assert len(self.keys()) == len(self.values())
+        assert len(self._keys) == len(self._values)
+
+    def __reduce__(self):
+        return (Record, (self._keys, self._values, self._readonly))
 
     def keys(self):
         """
         Returns the list of column names from the query.
         """
-        return self.__dict__["_keys"]
+        return self._keys
 
     def values(self):
         """
         Returns the list of values from the query.
         """
-        return self.__dict__["_values"]
+        return self._values
+
+    def _keyindex(self):
+        """Get the map of the keys to the indexes"""
+        if self._index is None:
+            object.__setattr__(self, "_index", _key_index(self._keys))
+        return self._index
 
     def __repr__(self):
         return "<Record {}>".format(self.as_dict())
@@ -41,71 +76,78 @@ class Record:
         # Support for index-based lookup.
         if isinstance(key, int):
             try:
-                return self.values()[key]
+                return self._values[key]
             except IndexError:
                 raise GetFromEmptyRecordError("No records returned.")
 
         # Support for string-based lookup.
-        keys = list(self.keys())
-        if key in keys:
-            if keys.count(key) > 1:
+        index = self._keyindex()
+        if key in index:
+            i = index[key]
+            if i is None:
                 raise RecordKeyError(
                     "Record contains multiple " "'{}' fields.".format(key)
                 )
-            return self.values()[keys.index(key)]
+            return self._values[i]
 
         raise RecordKeyError("Record contains no '{}' field.".format(key))
 
     def __setitem__(self, key, val):
-        if self.__dict__["_readonly"]:
+        if self._readonly:
             raise RecordKeyError(
                 "Readonly Record does not support " "setitem operation."
             )
 
         if isinstance(key, int):
-            self.values()[key] = val
+            self._values[key] = val
             return
 
-        keycount = self.keys().count(key)
-        if keycount > 1:
-            raise RecordKeyError(
-                "Record contains multiple " "'{}' fields.".format(key)
-            )
-        if keycount == 1:
-            i = self.keys().index(key)
-            self.values()[i] = val
-        else:  # 0
-            self.keys().append(key)
-            self.values().append(val)
+        index = self._keyindex()
+        if key in index:
+            i = index[key]
+            if i is None:
+                raise RecordKeyError(
+                    "Record contains multiple " "'{}' fields.".format(key)
+                )
+            self._values[i] = val
+        else:
+            self._keys.append(key)
+            self._values.append(val)
+            index[key] = len(self._keys) - 1
 
     def __delitem__(self, key):
-        if self.__dict__["_readonly"]:
+        if self._readonly:
             raise RecordKeyError(
                 "Readonly Record does not support " "delitem operation."
             )
 
         # Support for index-based lookup.
         if isinstance(key, int):
-            del self.keys()[key]
-            del self.values()[key]
+            del self._keys[key]
+            del self._values[key]
+            object.__setattr__(self, "_index", None)
             return
 
         # Support for string-based lookup.
-        indexes = [i for i, k in enumerate(self.keys()) if k == key]
-        for index in indexes:
-            del self.keys()[index]
-            del self.values()[index]
+        indexes = [i for i, k in enumerate(self._keys) if k == key]
+        for index in reversed(indexes):
+            del self._keys[index]
+            del self._values[index]
         if not indexes:
             raise RecordKeyError("Record contains no '{}' field.".format(key))
+        object.__setattr__(self, "_index", None)
 
     def __getattr__(self, key):
+        if key in Record.__slots__:
+            # not initialized yet
+            raise AttributeError(key)
         try:
             return self[key]
         except RecordKeyError as exc:
             raise RecordAttributeError(exc) from exc
 
     def __setattr__(self, key, val):
-        if self.__dict__["_readonly"]:
+        if self._readonly:
             raise RecordAttributeError(
                 "Readonly Record does not " "support setattr operation."
             )
@@ -131,11 +173,12 @@ class Record:
         return not self.__eq__(other)
 
     def __contains__(self, key):
-        return key in self.keys()
+        return key in self._keyindex()
 
     def index(self, key):
         """Get the index of the key"""
-        return self.keys().index(key)
+        i = self._keyindex().get(key)
+        return self._keys.index(key) if i is None else i
 
     def get(self, key, default=None):
         """
@@ -148,8 +191,7 @@ class Record:
 
     def items(self):
         """Get the items of the record"""
-        for i, k in enumerate(self.keys()):
-            yield k, self.values()[i]
+        return zip(self._keys, self._values)
 
     def as_dict(self, ordered=False):
         """
@@ -162,17 +204,202 @@ class Record:
     asDict = as_dict
 
 
+def _row_maker(row_factory, meta, readonly, index):
+    """Get the function to make the rows for the row factory"""
+    if row_factory is None or row_factory == "record":
+        return lambda row: Record(meta, row, readonly, index)
+    if row_factory == "raw":
+        return None
+    if row_factory == "tuple":
+        return tuple
+    if row_factory == "dict":
+        return lambda row: dict(zip(meta, row))
+    if row_factory == "namedtuple":
+        return namedtuple("Row", meta, rename=True)._make
+    if callable(row_factory):
+        if not dataclasses.is_dataclass(row_factory):
+            return lambda row: row_factory(*row)
+        # map the fields of the dataclass to the columns once
+        names = [
+            field.name
+            for field in dataclasses.fields(row_factory)
+            if field.init
+        ]
+        if names == list(meta):
+            return lambda row: row_factory(*row)
+        index = _key_index(meta)
+        missing = [name for name in names if index.get(name) is None]
+        if missing:
+            raise ValueError(
+                "Fields of {} not found or not unique in the columns: "
+                "{}".format(row_factory.__name__, missing)
+            )
+        getter = itemgetter(*[index[name] for name in names])
+        if len(names) == 1:
+            return lambda row: row_factory(getter(row))
+        return lambda row: row_factory(*getter(row))
+    raise ValueError("Unknown row factory: {}".format(row_factory))
+
+
+def _fill_value(values):
+    """Get the value to fill the NULLs of a column, by its other values"""
+    for value in values:
+        if isinstance(value, (bool, int, float)):
+            return type(value)()
+        if isinstance(value, (str, bytes)):
+            return value[:0]
+        if value is not None:
+            break
+    return None
+
+
+@contextmanager
+def _textfile(file, compression=None):
+    """Open a path or wrap a file object to write text, gzipped or not
+
+    A path ending with `.gz` is gzipped if `compression` is not given.
+    """
+    if isinstance(file, (str, os.PathLike)):
+        if compression is None and str(file).endswith(".gz"):
+            compression = "gzip"
+        opener = gzip.open if compression == "gzip" else open
+        with opener(file, "wt", encoding="utf-8", newline="") as fout:
+            yield fout
+        return
+
+    text = isinstance(file, io.TextIOBase)
+    if compression == "gzip":
+        if text:
+            raise ValueError(
+                "Gzipped rows cannot be written to a text file object, "
+                "pass a binary one or a path instead."
+            )
+        file = gzip.GzipFile(fileobj=file, mode="wb")
+    elif text:
+        yield file
+        return
+    fout = io.TextIOWrapper(file, encoding="utf-8", newline="")
+    try:
+        yield fout
+    finally:
+        # leave the file object open
+        fout.flush()
+        fout.detach()
+        if compression == "gzip":
+            file.close()
+
+
+def _json_default(value):
+    """Convert the values that are not JSON serializable"""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).decode("utf-8", errors="replace")
+    return str(value)
+
+
 class Records:
     """
     A set of excellent Records from a query.
+    The rows are fetched from the cursor by `fetchmany` in batches of
+    `arraysize` rows. If `arraysize` is not given, the batches start with
+    one row and double up to `ARRAYSIZE` rows.
+
+    With `cache` False, the records are forward-only: the rows are not kept
+    once they are iterated over, so they can only be iterated once, and
+    cannot be accessed by indexes.
+
+    The rows are made by `row_factory`:
+        - `None` or `"record"`: `Record`
+        - `"tuple"`: tuples
+        - `"dict"`: dicts
+        - `"namedtuple"`: namedtuples of a class made from `meta`
+        - `"raw"`: the rows as they are fetched from the cursor
+        - a callable: called with the values of the columns as positional
+          arguments. For a dataclass, the values are passed in the order of
+          its fields, which are mapped to the columns by name.
     """
 
-    def __init__(self, cursor, readonly=True):
+    ARRAYSIZE = 1000
+
+    def __init__(
+        self,
+        cursor,
+        readonly=True,
+        owncursor=False,
+        arraysize=None,
+        cache=True,
+        row_factory=None,
+    ):
         self.meta = [desc[0] for desc in cursor.description]
+        # the map of the keys to the indexes, shared by the records
+        self._index = _key_index(self.meta)
         self._cursor = cursor
         self._allrows = []
+        # the rows fetched but not converted to Record yet
+        self._rows = deque()
         self.pending = True
         self.readonly = readonly
+        # whether the cursor is closed with the records
+        self.owncursor = owncursor
+        self.arraysize = arraysize
+        self._batchsize = 1
+        self.cache = cache
+        # None to keep the rows as they are
+        self._make = _row_maker(row_factory, self.meta, readonly, self._index)
+        # the number of rows iterated over for forward-only records
+        self._nrows = 0
+        self._iterated = False
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:  # pylint: disable=broad-except
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        Stop fetching the rows, and close the cursor if it is owned by
+        the records (i.e. a streaming one)
+        """
+        self.pending = False
+        self._rows.clear()
+        cursor, self._cursor = self._cursor, None
+        if self.owncursor and cursor is not None:
+            cursor.close()
+
+    def _fetch(self, size=None):
+        """Fetch a batch of rows from the cursor
+
+        Returns False if there are no more rows.
+        """
+        if self._cursor is None:
+            return False
+        if not size and self.arraysize:
+            size = self.arraysize
+        elif not size:
+            size = self._batchsize
+            self._batchsize = min(size * 2, self.ARRAYSIZE)
+        rows = self._cursor.fetchmany(size)
+        if not rows:
+            self.close()
+            return False
+        self._rows.extend(rows)
+        return True
+
+    def _consume(self):
+        """Convert all the fetched rows to Records"""
+        make = self._make
+        self._allrows.extend(
+            self._rows if make is None else map(make, self._rows)
+        )
+        self._rows.clear()
 
     def __repr__(self):
         return "<Records: size={}, pending={}>".format(len(self), self.pending)
@@ -182,39 +409,61 @@ class Records:
         Iterate over all rows, consuming the underlying generator
         only when necessary.
         """
+        if not self.cache:
+            if self._iterated:
+                raise ForwardOnlyRecordsError(
+                    "Forward-only Records can only be iterated once."
+                )
+            self._iterated = True
+            return self._forward()
+        return self._cached()
+
+    def _forward(self):
+        """Iterate over the rows without keeping them"""
+        rows = self._rows
+        make = self._make
+        while rows or self._fetch():
+            while rows:
+                self._nrows += 1
+                row = rows.popleft()
+                yield row if make is None else make(row)
+
+    def _cached(self):
+        """Iterate over the rows, keeping them"""
         i = 0
+        allrows = self._allrows
         while True:
             # Other code may have iterated between yields,
             # so always check the cache.
-            if i < len(self):
-                yield self[i]
-            else:
-                # Throws StopIteration when done.
-                # Prevent StopIteration bubbling from generator,
-                # following https://www.python.org/dev/peps/pep-0479/
-                try:
-                    yield next(self)
-                except StopIteration:
-                    return
-            i += 1
+            while i < len(allrows):
+                yield allrows[i]
+                i += 1
+            if not self._rows and not self._fetch():
+                return
+            self._consume()
 
     def __nonzero__(self):
         return self.first() is not None
 
     def __next__(self):
-        try:
-            nextrow = Record(
-                self.meta, list(next(self._cursor)), readonly=self.readonly
-            )
-            self._allrows.append(nextrow)
-            return nextrow
-        except StopIteration:
-            self.pending = False
+        if not self._rows and not self._fetch():
             raise StopIteration("Records contains no more rows.")
+        nextrow = self._rows.popleft()
+        if self._make is not None:
+            nextrow = self._make(nextrow)
+        if self.cache:
+            self._allrows.append(nextrow)
+        else:
+            self._nrows += 1
+        return nextrow
 
     next = __next__
 
     def __getitem__(self, key):
+        if not self.cache:
+            raise ForwardOnlyRecordsError(
+                "Forward-only Records does not support random access."
+            )
         is_int = isinstance(key, int)
 
         # Convert RecordCollection[1] into slice.
@@ -222,16 +471,15 @@ class Records:
             key = slice(key, key + 1)
 
         while (key.stop is None) or (len(self) < key.stop):
-            try:
-                next(self)
-            except StopIteration:
+            if not self._rows and not self._fetch():
                 break
+            self._consume()
 
         ret = self._allrows[key]
         return ret[0] if is_int else ret
 
     def __len__(self):
-        return len(self._allrows)
+        return len(self._allrows) if self.cache else self._nrows
 
     def export(self, format, **kwargs):  # pylint: disable=redefined-builtin
         """
@@ -279,6 +527,285 @@ class Records:
             return [r.as_dict() for r in self]
         return [r.as_dict(True) for r in self]
 
+    def _row_values(self, row):
+        """Get the values of a row made by the row factory"""
+        if isinstance(row, (Record, dict)):
+            return list(row.values())
+        if isinstance(row, (tuple, list)):
+            return row
+        if hasattr(row, "__iter__"):
+            # i.e. sqlite3.Row
+            return tuple(row)
+        return [getattr(row, key) for key in self.meta]
+
+    def _batches(self, size=None):
+        """Iterate over the rows in batches of values, without making them
+
+        The rows that have been fetched come first. The rest of the rows are
+        fetched `size` rows at a time, defaulting to `arraysize` or
+        `ARRAYSIZE`, and kept as the rows are iterated over, unless the
+        records are forward-only.
+        """
+        if not self.cache:
+            if self._iterated:
+                raise ForwardOnlyRecordsError(
+                    "Forward-only Records can only be iterated once."
+                )
+            self._iterated = True
+        elif self._allrows:
+            yield [self._row_values(row) for row in self._allrows]
+        size = size or self.arraysize or self.ARRAYSIZE
+        make = self._make
+        while self._rows or self._fetch(size):
+            rows = list(self._rows)
+            self._rows.clear()
+            if self.cache:
+                self._allrows.extend(rows if make is None else map(make, rows))
+            else:
+                self._nrows += len(rows)
+            yield rows
+
+    def to_columns(self):
+        """
+        Returns the values of the rows by columns, as a dict of lists.
+        The rows are fetched in batches, and not kept by the forward-only
+        records.
+        """
+        if len(self._index) < len(self.meta):
+            raise RecordKeyError("Records contains duplicate columns.")
+        return dict(zip(self.meta, self._columns(self._batches())))
+
+    def _columns(self, batches):
+        """Collect the values of the batches of rows by columns"""
+        columns = [[] for _ in self.meta]
+        for rows in batches:
+            for column, values in zip(columns, zip(*rows)):
+                column.extend(values)
+        return columns
+
+    def write_csv(self, file, header=True, compression=None, **kwargs):
+        """
+        Write the rows to a CSV file, batch by batch. The rows are not kept
+        by the forward-only records.
+        @params:
+            `file`: The path or the file object (text or binary) to write to
+            `header`: Whether to write the columns as the header
+            `compression`: `"gzip"` to compress the file. Paths ending with
+                `.gz` are compressed by default.
+            `kwargs`: Other arguments for `csv.writer`
+
+        Returns the number of rows written
+        """
+        nrows = 0
+        with _textfile(file, compression) as fout:
+            writer = csv.writer(fout, **kwargs)
+            if header:
+                writer.writerow(self.meta)
+            for rows in self._batches():
+                writer.writerows(rows)
+                nrows += len(rows)
+        return nrows
+
+    def write_tsv(self, file, header=True, compression=None, **kwargs):
+        """
+        Write the rows to a TSV file, batch by batch.
+        See `write_csv` for the arguments.
+        """
+        kwargs.setdefault("delimiter", "\t")
+        return self.write_csv(file, header, compression, **kwargs)
+
+    def write_jsonl(self, file, compression=None, **kwargs):
+        """
+        Write the rows to a JSON Lines file, batch by batch, one object for
+        each row. The rows are not kept by the forward-only records.
+        @params:
+            `file`: The path or the file object (text or binary) to write to
+            `compression`: `"gzip"` to compress the file. Paths ending with
+                `.gz` are compressed by default.
+            `kwargs`: Other arguments for `json.dumps`. Datetimes are
+                written in ISO format by default.
+
+        Returns the number of rows written
+        """
+        kwargs.setdefault("default", _json_default)
+        meta = self.meta
+        nrows = 0
+        with _textfile(file, compression) as fout:
+            for rows in self._batches():
+                fout.writelines(
+                    json.dumps(dict(zip(meta, row)), **kwargs) + "\n"
+                    for row in rows
+                )
+                nrows += len(rows)
+        return nrows
+
+    def to_dataframe(self, chunksize=None):
+        """
+        Returns the rows as a pandas DataFrame, built column by column, with
+        the values as they are (i.e. datetimes kept). The rows are not kept
+        by the forward-only records.
+        @params:
+            `chunksize`: Yield DataFrames of `chunksize` rows instead.
+        """
+        import pandas
+
+        def frame(batches):
+            data = pandas.DataFrame(
+                dict(enumerate(self._columns(batches))),
+                columns=range(len(self.meta)),
+            )
+            data.columns = self.meta
+            return data
+
+        if not chunksize:
+            return frame(self._batches())
+        return (frame([rows]) for rows in self._chunks(chunksize))
+
+    def _chunks(self, size):
+        """Iterate over the rows in batches of values of exactly size rows,
+        except the last one"""
+        rows = chain.from_iterable(self._batches(size))
+        while True:
+            chunk = list(islice(rows, size))
+            if not chunk:
+                return
+            yield chunk
+
+    def to_arrow_batches(self, batch_size=None, schema=None):
+        """
+        Yield the rows as `pyarrow.RecordBatch`es of `batch_size` rows,
+        converted from the batches fetched from the cursor. The rows are not
+        kept by the forward-only records.
+        @params:
+            `batch_size`: The number of rows of each batch, defaulting to
+                `arraysize` or `ARRAYSIZE`
+            `schema`: The schema of the batches. If not given, it is
+                inferred from the first batch, so it should be given if
+                a column could have only NULLs in the first batch.
+        """
+        import pyarrow
+
+        batch_size = batch_size or self.arraysize or self.ARRAYSIZE
+        for rows in self._chunks(batch_size):
+            columns = list(zip(*rows))
+            if schema is None:
+                arrays = [pyarrow.array(column) for column in columns]
+                schema = pyarrow.schema(
+                    [
+                        pyarrow.field(name, array.type)
+                        for name, array in zip(self.meta, arrays)
+                    ]
+                )
+            else:
+                arrays = [
+                    pyarrow.array(column, type=field.type)
+                    for column, field in zip(columns, schema)
+                ]
+            yield pyarrow.RecordBatch.from_arrays(arrays, schema=schema)
+
+    def to_arrow_table(self, schema=None):
+        """
+        Returns the rows as a `pyarrow.Table`, from the record batches by
+        `to_arrow_batches`. Columns without values are of null type if
+        `schema` is not given.
+        """
+        import pyarrow
+
+        batches = list(self.to_arrow_batches(schema=schema))
+        if batches:
+            return pyarrow.Table.from_batches(batches)
+        if schema is None:
+            schema = pyarrow.schema(
+                [pyarrow.field(name, pyarrow.null()) for name in self.meta]
+            )
+        return schema.empty_table()
+
+    def to_numpy(self, dtypes=None, structured=False):
+        """
+        Returns the values of the rows by columns, as a dict of numpy arrays,
+        or a structured array. The rows are converted to arrays batch by
+        batch, and not kept by the forward-only records.
+        @params:
+            `dtypes`: The dtypes of the columns (dict). The dtypes of the
+                other columns are inferred from the values.
+            `structured`: Return a structured array instead.
+
+        NULLs (None) are masked, with the columns as
+        `numpy.ma.MaskedArray`s.
+        """
+        import numpy
+
+        def nulls(size, dtype):
+            """The values standing for size NULLs of a column of dtype"""
+            if numpy.dtype(dtype) == object:
+                return numpy.full(size, None, dtype=object)
+            return numpy.zeros(size, dtype=dtype)
+
+        if len(self._index) < len(self.meta):
+            raise RecordKeyError("Records contains duplicate columns.")
+        dtypes = dtypes or {}
+        chunks = [[] for _ in self.meta]
+        masks = [[] for _ in self.meta]
+        fills = [None] * len(self.meta)
+        for rows in self._batches():
+            for i, values in enumerate(zip(*rows)):
+                mask = numpy.fromiter(
+                    (value is None for value in values),
+                    dtype=bool,
+                    count=len(values),
+                )
+                masks[i].append(mask)
+                if mask.all():
+                    # NULLs only, filled once the dtype of the column is known
+                    chunks[i].append(len(values))
+                    continue
+                if mask.any():
+                    if fills[i] is None:
+                        fills[i] = _fill_value(values)
+                    values = [
+                        fills[i] if value is None else value
+                        for value in values
+                    ]
+                chunks[i].append(
+                    numpy.asarray(values, dtype=dtypes.get(self.meta[i]))
+                )
+
+        columns = {}
+        for name, chunk, mask in zip(self.meta, chunks, masks):
+            arrays = [array for array in chunk if not isinstance(array, int)]
+            dtype = dtypes.get(name) or (
+                numpy.result_type(*arrays) if arrays else object
+            )
+            chunk = [
+                nulls(array, dtype) if isinstance(array, int) else array
+                for array in chunk
+            ]
+            if not chunk:
+                data = numpy.array([], dtype=dtype)
+                mask = numpy.array([], dtype=bool)
+            else:
+                data = numpy.concatenate(chunk)
+                mask = numpy.concatenate(mask)
+            columns[name] = (
+                numpy.ma.MaskedArray(data, mask=mask) if mask.any() else data
+            )
+        if not structured:
+            return columns
+
+        dtype = [(name, column.dtype) for name, column in columns.items()]
+        nrows = len(columns[self.meta[0]]) if self.meta else 0
+        data = numpy.empty(nrows, dtype=dtype)
+        masked = False
+        mask = numpy.zeros(nrows, dtype=[(name, bool) for name in columns])
+        for name, column in columns.items():
+            if isinstance(column, numpy.ma.MaskedArray):
+                data[name] = column.data
+                mask[name] = column.mask
+                masked = True
+            else:
+                data[name] = column
+        return numpy.ma.MaskedArray(data, mask=mask) if masked else data
+
     def first(self, default=None):
         """
         Returns a single record for the RecordCollection, or `default`. If
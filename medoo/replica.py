@@ -0,0 +1,197 @@
+"""Read/write splitting for pymedoo"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+class ReplicatedMedoo:
+    """Medoo with a primary database and its replicas
+
+    The reads (`select`, `get`, `has`, `union`, the aggregates and
+    `paginate`) are routed to the replicas, by `strategy`:
+        - `"round_robin"`: the replicas one after another
+        - `"least_busy"`: the replica with the fewest reads running
+    The writes, and the reads in a transaction or a batch, go to the
+    primary. With `sticky` seconds, the reads of a thread go to the primary
+    for that long after its last write, so that it reads its own writes.
+
+    The primary and the replicas are Medoo instances, or `PooledMedoo` to be
+    shared by threads.
+    """
+
+    # The operations routed to the replicas
+    READS = (
+        "select",
+        "union",
+        "has",
+        "get",
+        "count",
+        "sum",
+        "avg",
+        "min",
+        "max",
+        "paginate",
+    )
+    # The operations writing to the primary
+    WRITES = (
+        "insert",
+        "bulk_insert",
+        "insert_stream",
+        "upsert",
+        "bulk_update",
+        "update",
+        "delete",
+        "query",
+        "commit",
+    )
+    # The reads returning generators
+    GENERATORS = ("paginate",)
+    STRATEGIES = ("round_robin", "least_busy")
+
+    def __init__(self, primary, replicas, strategy="round_robin", sticky=None):
+        if strategy not in self.STRATEGIES:
+            raise ValueError("Unknown strategy: {}.".format(strategy))
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.strategy = strategy
+        self.sticky = sticky
+        self.writes = 0
+        self.primary_reads = 0
+        self.reads = [0] * len(self.replicas)
+        # the numbers of reads running by the replicas
+        self._running = [0] * len(self.replicas)
+        self._next = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def stats(self):
+        """Get the numbers of the operations routed to the databases"""
+        with self._lock:
+            return {
+                "writes": self.writes,
+                "primary_reads": self.primary_reads,
+                "replica_reads": list(self.reads),
+                "running": list(self._running),
+            }
+
+    def close(self):
+        """Close the primary and the replicas"""
+        self.primary.close()
+        for replica in self.replicas:
+            replica.close()
+
+    def _pinned(self):
+        """Tell if the reads of the thread should go to the primary"""
+        if getattr(self._local, "depth", 0):
+            return True
+        # transactions or batches started on the primary directly
+        if getattr(self.primary, "_depth", 0) or (
+            getattr(self.primary, "_batch", None) is not None
+        ):
+            return True
+        last = getattr(self._local, "last_write", None)
+        return (
+            self.sticky is not None
+            and last is not None
+            and time.monotonic() - last < self.sticky
+        )
+
+    def _choose(self):
+        """Choose a replica to read from, and count the read as running"""
+        with self._lock:
+            if self.strategy == "least_busy":
+                index = min(
+                    range(len(self.replicas)),
+                    key=lambda i: (self._running[i], self.reads[i]),
+                )
+            else:
+                index = self._next
+                self._next = (self._next + 1) % len(self.replicas)
+            self._running[index] += 1
+            self.reads[index] += 1
+        return index
+
+    def _done(self, index):
+        with self._lock:
+            self._running[index] -= 1
+
+    @contextmanager
+    def _pin(self):
+        """Route all the operations of the thread in the block to the
+        primary"""
+        self._local.depth = getattr(self._local, "depth", 0) + 1
+        try:
+            yield
+        finally:
+            self._local.depth -= 1
+            self._local.last_write = time.monotonic()
+
+    @contextmanager
+    def transaction(self):
+        """Run the statements in the block in a transaction of the primary,
+        see `Base.transaction`"""
+        with self._pin(), self.primary.transaction():
+            yield self
+
+    @contextmanager
+    def batch(self, commit_every=1000, commit_interval=None):
+        """Group the statements in the block into periodic commits of the
+        primary, see `Base.batch`"""
+        with self._pin(), self.primary.batch(
+            commit_every, commit_interval
+        ) as batch:
+            yield batch
+
+    def __getattr__(self, name):
+        if name in self.READS:
+
+            def operation(*args, **kwargs):
+                return self._read(name, args, kwargs)
+
+        elif name in self.WRITES:
+
+            def operation(*args, **kwargs):
+                return self._write(name, args, kwargs)
+
+        else:
+            raise AttributeError(name)
+
+        operation.__name__ = name
+        return operation
+
+    def _write(self, name, args, kwargs):
+        with self._lock:
+            self.writes += 1
+        try:
+            return getattr(self.primary, name)(*args, **kwargs)
+        finally:
+            self._local.last_write = time.monotonic()
+
+    def _read(self, name, args, kwargs):
+        if name in self.GENERATORS:
+            return self._iterate(name, args, kwargs)
+        if not self.replicas or self._pinned():
+            with self._lock:
+                self.primary_reads += 1
+            return getattr(self.primary, name)(*args, **kwargs)
+
+        index = self._choose()
+        try:
+            return getattr(self.replicas[index], name)(*args, **kwargs)
+        finally:
+            self._done(index)
+
+    def _iterate(self, name, args, kwargs):
+        """Route the read when the generator starts, and count it as running
+        until the generator is exhausted or closed"""
+        if not self.replicas or self._pinned():
+            with self._lock:
+                self.primary_reads += 1
+            yield from getattr(self.primary, name)(*args, **kwargs)
+            return
+
+        index = self._choose()
+        try:
+            yield from getattr(self.replicas[index], name)(*args, **kwargs)
+        finally:
+            self._done(index)
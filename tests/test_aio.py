@@ -0,0 +1,158 @@
+import pytest
+from . import moduleInstalled
+pytestmark = pytest.mark.skipif(not moduleInstalled('sqlite3'), reason = 'sqlite3 is not installed.')
+
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from medoo import AsyncMedoo
+from medoo.aio import AsyncRecords, ExecutorRunner
+from medoo.database.sqlite import Sqlite
+from medoo.exception import ForwardOnlyRecordsError
+
+SLOW = ('WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) '
+	'SELECT COUNT(*) FROM c')
+
+@pytest.fixture
+def dbfile(tmp_path):
+	"""Create a database file for test"""
+	dbfile = str(tmp_path / 'test.sqlite')
+	db = Sqlite(database = dbfile)
+	db.query('CREATE TABLE t (id INTEGER PRIMARY KEY, cont TEXT)')
+	db.insert('t', ['id', 'cont'], *[(i, chr(96 + i)) for i in range(1, 11)])
+	db.close()
+	return dbfile
+
+def run(coro):
+	return asyncio.run(coro)
+
+class TestAsyncMedoo(object):
+
+	def testOperations(self, dbfile):
+		async def main():
+			async with AsyncMedoo('sqlite', database = dbfile) as db:
+				assert db.db is None
+				rs = await db.select('t', where = {'id[<]': 4})
+				assert isinstance(rs, AsyncRecords)
+				assert rs.meta == ['id', 'cont']
+				assert len(rs) == 3
+				assert [r.cont async for r in rs] == ['a', 'b', 'c']
+				assert (await rs.first()).id == 1
+				assert await db.get('t', 'cont', where = {'id': 2}) == 'b'
+				assert await db.has('t', where = {'id': 10})
+				assert await db.count('t') == 10
+				await db.insert('t', ['id', 'cont'], (11, 'k'))
+				await db.update('t', {'cont': 'K'}, where = {'id': 11})
+				assert (await (await db.query('SELECT cont FROM t WHERE id = 11')).all())[0].cont == 'K'
+				await db.delete('t', {'id': 11})
+				assert await db.count('t') == 10
+				with pytest.raises(AttributeError):
+					db.nosuchmethod
+				return db
+		db = run(main())
+		assert db.runner.executor._shutdown
+
+	def testDedicatedThread(self, dbfile):
+		async def main():
+			db = AsyncMedoo(Sqlite, database = dbfile)
+			threads = set()
+			def record(*args):
+				threads.add(threading.current_thread().name)
+				return True
+			await asyncio.gather(*[db._run(record) for _ in range(10)])
+			await db.close()
+			return threads
+		threads = run(main())
+		assert len(threads) == 1
+		assert threads.pop().startswith('medoo')
+
+	def testStream(self, dbfile):
+		async def main():
+			async with AsyncMedoo('sqlite', database = dbfile) as db:
+				rs = await db.select('t', stream = True, itersize = 3)
+				# nothing fetched until iterated
+				assert len(rs) == 0
+				ids = [r.id async for r in rs]
+				assert ids == list(range(1, 11))
+				assert not rs.records.pending
+
+				rs = await db.select('t', stream = True, cache = False, itersize = 4)
+				async for r in rs:
+					# the next batch is being fetched in the background
+					break
+				with pytest.raises(ForwardOnlyRecordsError):
+					rs.__aiter__()
+				await rs.close()
+				assert not rs.records.pending
+
+				async with await db.select('t', stream = True) as rs:
+					assert (await rs.all())[-1].id == 10
+
+				# forward-only records are streamed
+				rs = await db.select('t', cache = False)
+				assert rs.records.owncursor
+				assert [r.id async for r in rs] == list(range(1, 11))
+				with pytest.raises(ForwardOnlyRecordsError):
+					rs.__aiter__()
+		run(main())
+
+	def testRunner(self, dbfile):
+		executor = ThreadPoolExecutor(1)
+		async def main():
+			runner = ExecutorRunner(executor)
+			async with AsyncMedoo('sqlite', database = dbfile, runner = runner) as db:
+				assert await db.count('t') == 10
+		run(main())
+		# a shared executor is not shut down
+		assert executor.submit(lambda: 1).result() == 1
+		executor.shutdown()
+
+	def testMaxConcurrency(self, dbfile):
+		class CountingRunner(ExecutorRunner):
+			pending = maxpending = 0
+			async def run(self, func, *args, **kwargs):
+				self.pending += 1
+				self.maxpending = max(self.maxpending, self.pending)
+				try:
+					return await super().run(func, *args, **kwargs)
+				finally:
+					self.pending -= 1
+
+		async def main(runner, limit):
+			async with AsyncMedoo('sqlite', database = dbfile, runner = runner, max_concurrency = limit) as db:
+				def slow():
+					time.sleep(.01)
+					return True
+				assert all(await asyncio.gather(*[db._run(slow) for _ in range(6)]))
+				assert await db.count('t') == 10
+
+		runner = CountingRunner()
+		run(main(runner, 2))
+		assert runner.maxpending == 2
+		runner = CountingRunner()
+		run(main(runner, None))
+		assert runner.maxpending == 6
+
+	def testCancel(self, dbfile):
+		async def main():
+			async with AsyncMedoo('sqlite', database = dbfile) as db:
+				await db.count('t')
+				task = asyncio.ensure_future(db.query(SLOW))
+				await asyncio.sleep(.1)
+				start = time.time()
+				task.cancel()
+				with pytest.raises(asyncio.CancelledError):
+					await task
+				# the query is interrupted instead of running forever
+				assert await db.count('t') == 10
+				assert time.time() - start < 5
+
+				# cancelled before running
+				blocker = asyncio.ensure_future(db._run(time.sleep, .1))
+				task = asyncio.ensure_future(db.delete('t', {'id': 1}))
+				await asyncio.sleep(0)
+				task.cancel()
+				await blocker
+				assert await db.count('t') == 10
+		run(main())
@@ -3,6 +3,7 @@ from medoo.exception import FieldParseError, TableParseError, WhereParseError, U
 from medoo.builder import Term, Raw, Table, Field, TableFrom, Where, WhereTerm, Builder, Order, Limit, Set, Join, JoinTerm
 from medoo.dialect import Dialect
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 class DialectTest(Dialect):
 
@@ -14,6 +15,12 @@ class DialectTest(Dialect):
 	def limit(lim, offset):
 		return 'TOP {}'.format(lim), 1
 
+class DialectBacktick(Dialect):
+
+	@staticmethod
+	def quote(item):
+		return '`%s`' % item
+
 class DialectOracle(Dialect):
 
 	@staticmethod
@@ -139,6 +146,16 @@ class TestField(object):
 	def testOprt(self, field, oprt, value, out):
 		assert str(getattr(field, oprt)(value)) == out
 
+	def testOprtDialect(self):
+		# rendered by the dialect of the builder, not when created
+		term = Field('CustomerID') + 1
+		builder = Builder(DialectBacktick).select('Customers', term)
+		assert str(builder) == 'SELECT `CustomerID`+1 FROM `Customers`'
+		assert str(term) == '"CustomerID"+1'
+		builder = Builder(DialectBacktick).update('t', {'n': Field('n') * 'x'})
+		assert builder.compile() == ('UPDATE `t` SET `n`=`n`*?', ('x', ))
+		assert str(Field('a') - Field('b')) == '"a"-"b"'
+
 	@pytest.mark.parametrize('fieldstr,context,outfield,exception', [
 		(Raw('s.t.f'), None, 's.t.f', None),
 		('s.t.f', None, '"s"."t"."f"', None),
@@ -362,10 +379,9 @@ class TestBuilder(object):
 	])
 	def testInit(self, dialect):
 		builder = Builder(dialect)
-		if not dialect:
-			assert Builder.DIALECT is Dialect
-		else:
-			assert Builder.DIALECT is dialect
+		assert builder.dialect is dialect
+		# the default dialect is not touched
+		assert Builder.DIALECT is Dialect
 		assert builder.table is None
 		assert builder.terms == []
 		assert builder._sql is None
@@ -630,3 +646,63 @@ class TestBuilder(object):
 	def testInsert(self, table, fields, values, out):
 		assert str(Builder().insert(table, fields, *values)) == out
 
+
+	@pytest.mark.parametrize('builder,paramstyle,sql,params', [
+		(Builder().select('t', where = {'a': 1, 'b[~]': 'x', 'c[<>]': (2, 3)}), None,
+			'SELECT * FROM "t" WHERE "a" = ? AND "b" LIKE ? AND "c" BETWEEN ? AND ?', (1, '%x%', 2, 3)),
+		(Builder().select('t', where = {'a': [1, 2], 'b': Field('c'), 'd[is]': None}), 'pyformat',
+			'SELECT * FROM "t" WHERE "a" IN (%(p0)s,%(p1)s) AND "b" = "c" AND "d" IS NULL', {'p0': 1, 'p1': 2}),
+		(Builder().select('t', where = {'a': Builder().select('t2', 'a', where = {'b': 1}), 'c': 2}), 'numeric',
+			'SELECT * FROM "t" WHERE "a" IN (SELECT "a" FROM "t2" WHERE "b" = :1) AND "c" = :2', (1, 2)),
+		(Builder().update('t', {'a': 'x', 'b[+]': 1}, {'c': 2}), 'named',
+			'UPDATE "t" SET "a"=:p0,"b"="b"+:p1 WHERE "c" = :p2', {'p0': 'x', 'p1': 1, 'p2': 2}),
+		(Builder().insert('t', ['a', 'b'], (1, 'x'), (2, None)), None,
+			'INSERT INTO "t" ("a","b") VALUES (?,?),(?,?)', (1, 'x', 2, None)),
+		(Builder().select('t'), None, 'SELECT * FROM "t"', None),
+	])
+	def testCompile(self, builder, paramstyle, sql, params):
+		assert builder.compile(paramstyle) == (sql, params)
+		# rendering without compiling still inlines the values
+		assert '?' not in str(builder)
+
+	def testDialectSubquery(self):
+		builder = Builder(DialectTest).select('t', where = {
+			'a': Builder().select('t2', 'a', where = {'LIMIT': 1})
+		})
+		assert str(builder) == 'SELECT * FROM t WHERE a IN (SELECT TOP 1 a FROM t2)'
+		# rendered on its own
+		assert str(Builder().select('t2', 'a')) == 'SELECT "a" FROM "t2"'
+
+	def testDialectThreads(self):
+		def build(i):
+			dialect = DialectTest if i % 2 else Dialect
+			builder = Builder(dialect).select('t', 'a|count(c)', where = {'b': i}, join = {'[>]t2': 'a'})
+			return str(builder), builder.compile()[0]
+
+		with ThreadPoolExecutor(8) as executor:
+			results = list(executor.map(build, range(200)))
+		for i, (sql, compiled) in enumerate(results):
+			if i % 2:
+				assert sql == 'SELECT COUNT(a) AS c FROM t LEFT JOIN t2 ON t2.a=t.a WHERE b = %s' % i
+				assert compiled == 'SELECT COUNT(a) AS c FROM t LEFT JOIN t2 ON t2.a=t.a WHERE b = ?'
+			else:
+				assert sql == 'SELECT COUNT("a") AS "c" FROM "t" LEFT JOIN "t2" ON "t2"."a"="t"."a" WHERE "b" = %s' % i
+
+	@pytest.mark.parametrize('builder, tables', [
+		(Builder().select('s.a(x)', 'b.c', where = {
+			'id': Builder().select('B', 'id', where = {'x[>]': 1}, sub = True),
+			'OR': {'y': [1, Builder().select('C', 'id')]}
+		}, join = {'[>]D(d)': 'id', 'e.E': {'id': 'id'}}), {'a', 'b', 'c', 'd', 'e'}),
+		(Builder().select([Builder().select('inner', sub = 'x')], 'a'), {'inner'}),
+		(Builder().select('t', Raw('COUNT(*)'), where = {'EXISTS': Builder().select('z')}), {'t', 'z'}),
+		(Builder().select('t', 'a', newtable = 'nt'), {'t', 'nt'}),
+		(Builder().union(Builder().select('a'), Builder().select('b', sub = True)), {'a', 'b'}),
+		(Builder().insert('t', ['a', 'b'], (1, 2)), {'t'}),
+		(Builder().update('t', {'a': Builder().select('u', 'a')}, where = {'id': 1}), {'t', 'u'}),
+		(Builder().delete('T', {'id': 1}), {'t'}),
+		(Builder().upsert('t', ['id', 'a'], [(1, 2)], 'id'), {'t'}),
+		(Builder().bulk_update('t', ['id', 'a'], [(1, 2)]), {'t'}),
+		(Builder().select([Raw('t1, t2')], 'a'), None),
+	])
+	def testTables(self, builder, tables):
+		assert builder.tables() == (tables if tables is None else frozenset(tables))
@@ -0,0 +1,276 @@
+import pytest
+import time
+from medoo.builder import Builder, Field, Raw
+from medoo.cache import StatementCache, ResultCache, written_tables
+from medoo.database.sqlite import Sqlite, DialectSqlite
+from medoo.dialect import Dialect
+
+class DialectNamed(Dialect):
+	PARAMSTYLE = 'named'
+
+class DialectInChunk(DialectSqlite):
+	IN_LIMIT = 3
+	IN_STRATEGY = 'chunk'
+
+class DialectLike(Dialect):
+
+	@classmethod
+	def eq(cls, field, value):
+		return Dialect.like(field, value)
+
+class TestStatementCache(object):
+
+	def testSelect(self):
+		cache = StatementCache()
+		where = {'a': 1, 'b': [2, 3], 'ORDER': {'a': 'desc'}, 'LIMIT': 2}
+		sql, params = cache.select(Dialect, 't', 'a,b', where)
+		assert sql == 'SELECT "a","b" FROM "t" WHERE "a" = ? AND "b" IN (?,?) ORDER BY "a" DESC LIMIT 2'
+		assert params == (1, 2, 3)
+		# where is not touched
+		assert 'ORDER' in where
+		assert cache.stats() == {'hits': 0, 'misses': 1, 'evictions': 0, 'size': 1, 'maxsize': 256}
+
+		sql2, params = cache.select(Dialect, 't', 'a,b', {'a': 4, 'b': [5, 6], 'ORDER': {'a': 'desc'}, 'LIMIT': 2})
+		assert sql2 == sql
+		assert params == (4, 5, 6)
+		assert cache.hits == 1
+
+		# different shapes
+		cache.select(Dialect, 't', 'a,b', {'a': 4, 'b': [5, 6, 7], 'ORDER': {'a': 'desc'}, 'LIMIT': 2})
+		cache.select(Dialect, 't', 'a,b', {'a': 4, 'b': [5, 6], 'ORDER': {'a': 'desc'}, 'LIMIT': 3})
+		cache.select(DialectNamed, 't', 'a,b', {'a': 4, 'b': [5, 6], 'ORDER': {'a': 'desc'}, 'LIMIT': 2})
+		assert cache.misses == 4
+		assert len(cache) == 4
+
+	@pytest.mark.parametrize('dialect,where,sql,params', [
+		(Dialect, {'OR': {'a[>]': 1, 'b[is]': None}, 'c[<>]': (2, 3)},
+			'SELECT * FROM "t" WHERE ("a" > ? OR "b" IS NULL) AND "c" BETWEEN ? AND ?', (1, 2, 3)),
+		(DialectNamed, {'a': Field('b'), Raw('c = 1'): None, 'd[!]': 2, 'HAVING': {'e': 3}},
+			'SELECT * FROM "t" WHERE "a" = "b" AND c = 1 AND "d" <> :p0 HAVING "e" = :p1', {'p0': 2, 'p1': 3}),
+	])
+	def testBind(self, dialect, where, sql, params):
+		cache = StatementCache()
+		assert cache.select(dialect, 't', where = where) == (sql, params)
+		assert cache.select(dialect, 't', where = where) == (sql, params)
+		assert cache.hits == 1
+
+	@pytest.mark.parametrize('dialect,where', [
+		(Dialect, {'a[~]': '%a'}),
+		(DialectLike, {'a': '%a'}),
+		(Dialect, {'a': Builder().select('t2', 'a', where = {'b': 1})}),
+		(Dialect, {'a[= any]': Builder().select('t2', 'a')}),
+	])
+	def testUncacheable(self, dialect, where):
+		cache = StatementCache()
+		sql, params = cache.select(dialect, 't', where = where)
+		assert cache.select(dialect, 't', where = where) == (sql, params)
+		assert cache.hits == 0
+		assert cache.misses == 2
+
+	def testUncacheableLike(self):
+		cache = StatementCache()
+		assert cache.select(Dialect, 't', where = {'a[~]': '%a'})[1] == ('%a', )
+		assert cache.select(Dialect, 't', where = {'a[~]': 'a'})[1] == ('%a%', )
+
+	def testUpdateDelete(self):
+		cache = StatementCache()
+		assert cache.update(DialectNamed, 't', {'a': 1, 'b[+]': 2}, {'c': 3}) == (
+			'UPDATE "t" SET "a"=:p0,"b"="b"+:p1 WHERE "c" = :p2', {'p0': 1, 'p1': 2, 'p2': 3}
+		)
+		assert cache.update(DialectNamed, 't', {'a': 4, 'b[+]': 5}, {'c': 6})[1] == {'p0': 4, 'p1': 5, 'p2': 6}
+		assert cache.delete(Dialect, 't', {'c': 3}) == ('DELETE FROM "t" WHERE "c" = ?', (3, ))
+		assert cache.delete(Dialect, 't', {'c': 4}) == ('DELETE FROM "t" WHERE "c" = ?', (4, ))
+		assert cache.delete(Dialect, 't', None) == ('DELETE FROM "t"', None)
+		assert cache.hits == 2
+
+	def testEviction(self):
+		cache = StatementCache(2)
+		cache.select(Dialect, 't1')
+		cache.select(Dialect, 't2')
+		cache.select(Dialect, 't1')
+		cache.select(Dialect, 't3')
+		assert cache.evictions == 1
+		cache.select(Dialect, 't1')
+		assert cache.hits == 2
+		cache.select(Dialect, 't2')
+		assert cache.misses == 4
+		cache.clear()
+		assert cache.stats() == {'hits': 0, 'misses': 0, 'evictions': 0, 'size': 0, 'maxsize': 2}
+
+@pytest.mark.parametrize('sql, tables', [
+	('SELECT * FROM t', set()),
+	('  begin', set()),
+	('SAVEPOINT medoo_savepoint_1', set()),
+	('INSERT INTO "t" VALUES (1)', {'t'}),
+	('insert or replace into main.T (a) values (1)', {'t'}),
+	('UPDATE `t` SET a = 1', {'t'}),
+	('DELETE FROM [dbo].[t] WHERE a = 1', {'t'}),
+	('MERGE INTO t target USING ...', {'t'}),
+	('CREATE TEMP TABLE IF NOT EXISTS "_medoo_in" (n INTEGER, k)', {'_medoo_in'}),
+	('DROP TABLE t', {'t'}),
+	('VACUUM', None),
+	('WITH x AS (SELECT 1) DELETE FROM t', None),
+])
+def testWrittenTables(sql, tables):
+	assert written_tables(sql) == (tables if tables is None else frozenset(tables))
+
+class TestResultCache(object):
+
+	def testGetSet(self):
+		cache = ResultCache(maxsize = 2)
+		assert cache.get('a') is None
+		cache.set('a', (('x', ), ), ((1, ), ), frozenset(['t']))
+		assert cache.get('a') == ((('x', ), ), ((1, ), ))
+		# tables not known
+		cache.set('b', (('x', ), ), ((1, ), ), None)
+		assert cache.get('b') is None
+		stats = cache.stats()
+		assert stats['hits'] == 1
+		assert stats['misses'] == 2
+		assert stats['hit_ratio'] == 1 / 3
+		assert stats['size'] == 1
+		assert stats['nbytes'] > 0
+
+		cache.set('b', (), ((2, ), ), frozenset(['t']))
+		cache.get('a')
+		cache.set('c', (), ((3, ), ), frozenset(['u']))
+		# b is the least recently used
+		assert cache.get('b') is None
+		assert len(cache) == 2
+		assert cache.evictions == 1
+
+		cache.clear()
+		assert len(cache) == 0
+		assert cache.stats()['nbytes'] == 0
+		assert cache.hits == 0
+
+	def testMaxbytes(self):
+		cache = ResultCache(maxbytes = 1000)
+		cache.set('big', (), tuple((i, ) for i in range(100)), frozenset(['t']))
+		assert len(cache) == 0
+		for i in range(10):
+			cache.set(i, (), ((i, 'x' * 50), ), frozenset(['t']))
+		assert 0 < cache.nbytes <= 1000
+		assert cache.evictions > 0
+		assert cache.get(9) is not None
+		assert cache.get(0) is None
+
+	def testTtl(self):
+		cache = ResultCache(ttl = .01)
+		cache.set('a', (), ((1, ), ), frozenset(['t']))
+		assert cache.get('a') is not None
+		time.sleep(.02)
+		assert cache.get('a') is None
+		assert cache.expirations == 1
+		assert len(cache) == 0
+
+		cache = ResultCache(ttl = None)
+		cache.set('a', (), ((1, ), ), frozenset(['t']))
+		assert cache._cache['a'][0] is None
+
+	def testInvalidate(self):
+		cache = ResultCache()
+		cache.set('a', (), (), frozenset(['t', 'u']))
+		cache.set('b', (), (), frozenset(['u']))
+		cache.set('c', (), (), frozenset(['v']))
+		cache.invalidate(frozenset(['t']))
+		assert set(cache._cache) == {'b', 'c'}
+		assert set(cache._tables) == {'u', 'v'}
+		cache.invalidate(['w'])
+		assert len(cache) == 2
+		cache.invalidate()
+		assert len(cache) == 0
+		assert cache.invalidations == 3
+		assert cache._tables == {}
+
+@pytest.fixture(params = [False, True], ids = ['inline', 'bind'])
+def cached(request):
+	"""Create a database with a result cache"""
+	db = Sqlite(bind = request.param, result_cache = ResultCache())
+	db.query('CREATE TABLE t (id INTEGER PRIMARY KEY, cont TEXT)')
+	db.query('CREATE TABLE u (id INTEGER PRIMARY KEY, tid INTEGER)')
+	db.insert('t', ['id', 'cont'], (1, 'a'), (2, 'b'), (3, 'c'))
+	db.insert('u', ['id', 'tid'], (1, 1), (2, 3))
+	db.result_cache.clear()
+	return db
+
+class TestSelectCache(object):
+
+	def testHit(self, cached):
+		rs = cached.select('t', where = {'id[<]': 3})
+		assert [r.cont for r in rs] == ['a', 'b']
+		cached.query('CREATE TABLE v (id INTEGER)')
+		rs = cached.select('t', where = {'id[<]': 3})
+		# not queried again
+		assert cached.last() == 'CREATE TABLE v (id INTEGER)'
+		assert [r.cont for r in rs] == ['a', 'b']
+		assert rs.meta == ['id', 'cont']
+		assert cached.select('t', where = {'id[<]': 3}, row_factory = 'tuple').all() == [(1, 'a'), (2, 'b')]
+		assert cached.get('t', 'cont', where = {'id': 3}) == 'c'
+		assert cached.get('t', 'cont', where = {'id': 3}) == 'c'
+		assert cached.count('t') == 3
+		stats = cached.result_cache.stats()
+		assert stats['hits'] == 3
+		assert stats['misses'] == 3
+		# the different values are different results
+		assert cached.get('t', 'cont', where = {'id': 2}) == 'b'
+
+	def testInvalidate(self, cached):
+		assert cached.count('t') == 3
+		assert cached.count('u', where = {'tid': cached.builder.select('t', 'id', where = {'id': 1})}) == 1
+		assert cached.count('u') == 2
+		assert len(cached.result_cache) == 3
+
+		cached.insert('t', ['id', 'cont'], (4, 'd'))
+		# the results selecting from t are invalidated
+		assert len(cached.result_cache) == 1
+		assert cached.count('t') == 4
+		cached.update('t', {'cont': 'D'}, where = {'id': 4})
+		cached.delete('t', {'id': 4})
+		cached.bulk_insert('t', ['id', 'cont'], (5, 'e'))
+		cached.upsert('t', [(5, 'E')], 'id', fields = ['id', 'cont'])
+		cached.bulk_update('t', [(5, 'e')], fields = ['id', 'cont'])
+		assert cached.result_cache.invalidations == 3
+		assert cached.get('t', 'cont', where = {'id': 5}) == 'e'
+		cached.query('VACUUM')
+		assert len(cached.result_cache) == 0
+
+	def testChunks(self, cached):
+		cached.dialect(DialectInChunk)
+		cached.insert('t', ['id', 'cont'], *[(i, chr(96 + i)) for i in range(4, 9)])
+		rs = cached.select('t', '*', {'id': list(range(8))})
+		assert [r.id for r in rs] == list(range(1, 8))
+		assert rs.meta == ['id', 'cont']
+		# the chunks are not cached
+		assert len(cached.result_cache) == 0
+		assert cached.select('t', 'cont', {'id': list(range(8))}).all()[-1].cont == 'g'
+
+	def testBypass(self, cached):
+		cached.select('t', stream = True).all()
+		# forward-only records are not kept
+		assert [r.id for r in cached.select('t', cache = False)] == [1, 2, 3]
+		cached.select('t', row_factory = lambda *row: row).all()
+		with cached.transaction():
+			cached.select('t').all()
+		with cached.batch():
+			cached.select('t').all()
+		assert len(cached.result_cache) == 0
+		assert cached.result_cache.misses == 0
+
+	def testUncommitted(self, cached):
+		assert cached.count('t') == 3
+		with cached.transaction():
+			cached.insert('t', ['id', 'cont'], (4, 'd'))
+			# cached by another connection sharing the cache
+			cached.result_cache.set('other', (), (), frozenset(['t']))
+		# invalidated again when committed
+		assert len(cached.result_cache) == 0
+
+		cached.result_cache.set('other', (), (), frozenset(['t']))
+		with pytest.raises(ZeroDivisionError):
+			with cached.transaction():
+				cached.delete('t', {'id': 4})
+				cached.result_cache.set('other', (), (), frozenset(['t']))
+				1/0
+		assert len(cached.result_cache) == 0
+		assert cached.count('t') == 4
@@ -1,7 +1,10 @@
+import sys
+import types
+import importlib
 import pytest
-from medoo.dialect import Dialect
-from medoo.builder import Builder
-from medoo.exception import WhereParseError, AnyAllSomeParseError
+from medoo.dialect import Dialect, Params
+from medoo.builder import Builder, Raw
+from medoo.exception import WhereParseError, AnyAllSomeParseError, UpsertParseError, UpdateParseError
 
 class TestDialect(object):
 
@@ -143,3 +146,157 @@ class TestDialect(object):
 	])
 	def testJoin(self, jointype, out):
 		assert Dialect._join(jointype) == out
+
+class DialectLimited(Dialect):
+	MAX_PARAMS = 10
+	MAX_PACKET = 100
+
+class TestChunksize(object):
+
+	@pytest.mark.parametrize('dialect,row,out', [
+		(Dialect, (1, 2), 1000),
+		(DialectLimited, (1, 2, 3), 3),
+		(DialectLimited, ('a' * 10, ), 5),
+		(DialectLimited, ('a' * 200, ), 1),
+	])
+	def testChunksize(self, dialect, row, out):
+		assert dialect.chunksize(row) == out
+
+class TestParams(object):
+
+	@pytest.mark.parametrize('paramstyle,sql,params', [
+		('qmark', "f = ? AND g LIKE '%a'", (1,)),
+		('numeric', "f = :1 AND g LIKE '%a'", (1,)),
+		('named', "f = :p0 AND g LIKE '%a'", {'p0': 1}),
+		('format', "f = %s AND g LIKE '%%a'", (1,)),
+		('pyformat', "f = %(p0)s AND g LIKE '%%a'", {'p0': 1}),
+	])
+	def testBind(self, paramstyle, sql, params):
+		prms = Params(paramstyle)
+		assert prms.bind('f = {} AND g LIKE \'%a\''.format(prms.add(1))) == (sql, params)
+
+	def testBindOrder(self):
+		prms = Params()
+		m1 = prms.add(1)
+		m2 = prms.add(2)
+		assert prms.bind('{} {}'.format(m2, m1)) == ('? ?', (2, 1))
+		assert prms.order == [1, 0]
+
+	def testNoValues(self):
+		assert Params('pyformat').bind("f LIKE '%a'") == ("f LIKE '%a'", None)
+
+	def testUnknown(self):
+		with pytest.raises(ValueError):
+			Params('unknown')
+
+class TestUpsert(object):
+
+	@pytest.mark.parametrize('keys,updates,out', [
+		('id', None, 'INSERT INTO "t" ("id","a","b") VALUES (1,\'x\',2),(2,\'y\',3) ON CONFLICT ("id") DO UPDATE SET "a"=excluded."a","b"=excluded."b"'),
+		('id', 'b', 'INSERT INTO "t" ("id","a","b") VALUES (1,\'x\',2),(2,\'y\',3) ON CONFLICT ("id") DO UPDATE SET "b"=excluded."b"'),
+		('id, a', [], 'INSERT INTO "t" ("id","a","b") VALUES (1,\'x\',2),(2,\'y\',3) ON CONFLICT ("id","a") DO NOTHING'),
+	])
+	def testUpsert(self, keys, updates, out):
+		builder = Builder(Dialect).upsert('t', 'id, a, b', [(1, 'x', 2), (2, 'y', 3)], keys, updates)
+		assert builder.sql() == out
+
+	def testUpsertBind(self):
+		builder = Builder(Dialect).upsert('t', 'id, a', [(1, 'x')], 'id')
+		assert builder.compile() == ('INSERT INTO "t" ("id","a") VALUES (?,?) ON CONFLICT ("id") DO UPDATE SET "a"=excluded."a"', (1, 'x'))
+
+	@pytest.mark.parametrize('keys,updates', [
+		([], None),
+		('c', None),
+		('id', 'c'),
+	])
+	def testUpsertError(self, keys, updates):
+		with pytest.raises(UpsertParseError):
+			Builder(Dialect).upsert('t', 'id, a', [(1, 'x')], keys, updates)
+
+class TestBulkUpdate(object):
+
+	@pytest.mark.parametrize('fields,key,out', [
+		('a, id', 'id', 'UPDATE "t" SET "a"=CASE "id" WHEN 2 THEN 1 WHEN 4 THEN 3 ELSE "a" END WHERE "id" IN (2,4)'),
+		('id, a', 'a', 'UPDATE "t" SET "id"=CASE "a" WHEN 2 THEN 1 WHEN 4 THEN 3 ELSE "id" END WHERE "a" IN (2,4)'),
+	])
+	def testBulkUpdate(self, fields, key, out):
+		assert Builder(Dialect).bulk_update('t', fields, [(1, 2), (3, 4)], key).sql() == out
+
+	def testBulkUpdateBind(self):
+		builder = Builder(Dialect).bulk_update('t', 'id, a, b', [(1, 'x', 2), (2, 'y', 3)])
+		assert builder.compile() == (
+			'UPDATE "t" SET "a"=CASE "id" WHEN ? THEN ? WHEN ? THEN ? ELSE "a" END,'
+			'"b"=CASE "id" WHEN ? THEN ? WHEN ? THEN ? ELSE "b" END WHERE "id" IN (?,?)',
+			(1, 'x', 2, 'y', 1, 2, 2, 3, 1, 2)
+		)
+
+	@pytest.mark.parametrize('fields,key', [
+		('a, b', 'id'),
+		('id', 'id'),
+		(None, 'id'),
+	])
+	def testBulkUpdateError(self, fields, key):
+		with pytest.raises(UpdateParseError):
+			Builder(Dialect).bulk_update('t', fields, [(1, 2)], key)
+
+class DialectArray(Dialect):
+	PARAMSTYLE = 'pyformat'
+	IN_LIMIT = 2
+	IN_STRATEGY = 'any'
+
+class TestInArray(object):
+
+	@pytest.mark.parametrize('where,sql,params', [
+		({'id': [1, 2]}, 'SELECT * FROM "t" WHERE "id" IN (%(p0)s,%(p1)s)', {'p0': 1, 'p1': 2}),
+		({'id': [1, 2, 3]}, 'SELECT * FROM "t" WHERE "id" = ANY(%(p0)s)', {'p0': [1, 2, 3]}),
+		({'id[!]': (1, 2, 3)}, 'SELECT * FROM "t" WHERE "id" <> ALL(%(p0)s)', {'p0': [1, 2, 3]}),
+	])
+	def testInArray(self, where, sql, params):
+		assert Builder(DialectArray).select('t', where = where).compile() == (sql, params)
+
+	def testInArrayUnbound(self):
+		assert Builder(DialectArray).select('t', where = {'id': [1, 2, 3]}).sql() == 'SELECT * FROM "t" WHERE "id" IN (1,2,3)'
+
+@pytest.fixture
+def dialects(monkeypatch):
+	"""Load the dialects of the databases without their drivers"""
+	for driver in ('cx_Oracle', 'pymssql'):
+		monkeypatch.setitem(sys.modules, driver, types.ModuleType(driver))
+	for mod in ('medoo.database.oracle', 'medoo.database.mssql'):
+		monkeypatch.delitem(sys.modules, mod, raising = False)
+	return (
+		importlib.import_module('medoo.database.oracle').DialectOracle,
+		importlib.import_module('medoo.database.mssql').DialectMssql,
+	)
+
+class TestLimit(object):
+
+	@pytest.mark.parametrize('where,oracle,mssql', [
+		({'id': 1, 'LIMIT': 1},
+			'SELECT 1 FROM "t" WHERE "id" = 1 FETCH FIRST 1 ROWS ONLY',
+			'SELECT TOP 1 1 FROM "t" WHERE "id" = 1'),
+		({'ORDER': {'id': 'asc'}, 'LIMIT': (2, 4)},
+			'SELECT 1 FROM "t" ORDER BY "id" ASC OFFSET 4 ROWS FETCH NEXT 2 ROWS ONLY',
+			'SELECT 1 FROM "t" ORDER BY "id" ASC OFFSET 4 ROWS FETCH NEXT 2 ROWS ONLY'),
+	])
+	def testLimit(self, dialects, where, oracle, mssql):
+		dialect_oracle, dialect_mssql = dialects
+		assert str(Builder(dialect_oracle).select('t', Raw('1'), dict(where))) == oracle
+		assert str(Builder(dialect_mssql).select('t', Raw('1'), dict(where))) == mssql
+
+	def testLimitSubquery(self, dialects):
+		_, dialect_mssql = dialects
+		builder = Builder(dialect_mssql).select('t', where = {
+			'id': Builder().select('t2', 'id', where = {'LIMIT': 1})
+		})
+		assert str(builder) == 'SELECT * FROM "t" WHERE "id" IN (SELECT TOP 1 "id" FROM "t2")'
+
+class DialectInTemptable(Dialect):
+	IN_LIMIT = 2
+	IN_STRATEGY = 'temptable'
+
+class TestTemptable(object):
+
+	def testUnsupported(self):
+		with pytest.raises(ValueError):
+			DialectInTemptable.temptable('_medoo_in')
@@ -0,0 +1,177 @@
+import pytest
+from . import moduleInstalled
+pytestmark = pytest.mark.skipif(not moduleInstalled('sqlite3'), reason = 'sqlite3 is not installed.')
+
+import threading
+from medoo import Medoo, PooledMedoo
+from medoo.cache import StatementCache
+from medoo.exception import PoolTimeoutError
+from medoo.database.sqlite import Sqlite
+
+@pytest.fixture
+def dbfile(tmp_path):
+	"""Create a database file for test"""
+	dbfile = str(tmp_path / 'test.sqlite')
+	db = Medoo('sqlite', database = dbfile)
+	db.query('CREATE TABLE t (id INTEGER PRIMARY KEY, cont TEXT)')
+	db.insert('t', ['id', 'cont'], *[(i, chr(96 + i)) for i in range(1, 11)])
+	db.close()
+	return dbfile
+
+class TestPool(object):
+
+	def testOperations(self, dbfile):
+		pooled = PooledMedoo('sqlite', database = dbfile, pool_size = 2)
+		rs = pooled.select('t', where = {'id[<]': 4, 'ORDER': {'id': 'asc'}})
+		assert [r.cont for r in rs] == ['a', 'b', 'c']
+		assert pooled.get('t', 'cont', where = {'id': 2}) == 'b'
+		assert pooled.has('t', where = {'id': 10})
+		assert pooled.count('t') == 10
+		pooled.insert('t', ['id', 'cont'], (11, 'k'))
+		pooled.update('t', {'cont': 'K'}, where = {'id': 11})
+		assert pooled.get('t', 'cont', where = {'id': 11}) == 'K'
+		pooled.delete('t', {'id': 11})
+		assert pooled.count('t') == 10
+		assert pooled.stats()['in_use'] == 0
+		assert pooled.stats()['idle'] == 1
+		assert pooled.stats()['connects'] == 1
+		with pytest.raises(AttributeError):
+			pooled.nosuchmethod
+		pooled.close()
+
+	def testDbClass(self, dbfile):
+		pooled = PooledMedoo(Sqlite, database = dbfile)
+		assert pooled.count('t') == 10
+		with pytest.raises(ValueError):
+			PooledMedoo('nosuchdb')
+
+	def testSharedStatementCache(self, dbfile):
+		pooled = PooledMedoo('sqlite', database = dbfile, bind = True)
+		with pooled.connection() as db1:
+			with pooled.connection() as db:
+				# nested blocks hold the same connection
+				assert db is db1
+			db2 = pooled.pool.acquire()
+			assert db2 is not db1
+			assert isinstance(db1.statement_cache, StatementCache)
+			assert db1.statement_cache is db2.statement_cache
+			pooled.pool.release(db2)
+
+		pooled = PooledMedoo('sqlite', database = dbfile)
+		with pooled.connection() as db:
+			assert db.statement_cache is None
+
+	def testConnectionBlock(self, dbfile):
+		pooled = PooledMedoo('sqlite', database = dbfile, pool_size = 1)
+		with pooled.connection() as db:
+			# the operations in the block run on the held connection
+			assert pooled.count('t') == 10
+			rs = pooled.select('t', stream = True)
+			assert rs.first().id == 1
+			rs.close()
+			assert pooled.stats()['in_use'] == 1
+			assert db.last().startswith('SELECT')
+		assert pooled.stats()['in_use'] == 0
+		with pytest.raises(ValueError):
+			pooled.select('t', stream = True)
+
+	def testRollbackOnCheckin(self, dbfile):
+		pooled = PooledMedoo('sqlite', database = dbfile, pool_size = 1)
+		with pooled.connection() as db:
+			db.query('BEGIN', commit = False)
+			db.delete('t', {'id': 1}, commit = False)
+			assert pooled.count('t') == 9
+		assert pooled.count('t') == 10
+
+	def testPaginateHoldsConnection(self, dbfile):
+		pooled = PooledMedoo('sqlite', database = dbfile, pool_size = 1)
+		pages = pooled.paginate('t', page_size = 4, pages = True)
+		assert len(next(pages)) == 4
+		assert pooled.stats()['in_use'] == 1
+		assert [len(page) for page in pages] == [4, 2]
+		assert pooled.stats()['in_use'] == 0
+
+		# not checked out until iterated
+		pooled.pool.timeout = .05
+		pages = pooled.paginate('t')
+		assert pooled.stats()['in_use'] == 0
+		del pages
+		assert pooled.count('t') == 10
+
+	def testTimeout(self, dbfile):
+		pooled = PooledMedoo('sqlite', database = dbfile, pool_size = 1, timeout = .05)
+		with pooled.connection():
+			with pytest.raises(PoolTimeoutError):
+				pooled.pool.acquire()
+		stats = pooled.stats()
+		assert stats['waits'] == 1
+		assert stats['wait_time'] >= .05
+		assert stats['in_use'] == 0
+		assert pooled.count('t') == 10
+
+	def testMaxAge(self, dbfile):
+		pooled = PooledMedoo('sqlite', database = dbfile, max_age = 0)
+		assert pooled.count('t') == 10
+		assert pooled.count('t') == 10
+		stats = pooled.stats()
+		assert stats['connects'] == 2
+		assert stats['recycled'] == 1
+		assert stats['idle'] == 1
+
+	def testPing(self, dbfile):
+		pooled = PooledMedoo('sqlite', database = dbfile)
+		with pooled.connection() as db:
+			assert db.ping()
+			db.connection.close()
+			assert not db.ping()
+		# broken connections are dropped on checkin
+		assert pooled.stats()['idle'] == 0
+
+		with pooled.connection() as db:
+			pass
+		db.connection.close()
+		assert pooled.count('t') == 10
+		stats = pooled.stats()
+		assert stats['invalidated'] == 1
+		assert stats['connects'] == 3
+
+	def testClose(self, dbfile):
+		pooled = PooledMedoo('sqlite', database = dbfile)
+		with pooled.connection() as db:
+			pooled.close()
+			assert pooled.stats()['idle'] == 0
+			assert db.ping()
+		assert not db.ping()
+		with pytest.raises(PoolTimeoutError):
+			pooled.count('t')
+
+	def testThreads(self, dbfile):
+		pooled = PooledMedoo('sqlite', database = dbfile, pool_size = 3)
+		errors = []
+		maxinuse = []
+
+		def work(i):
+			try:
+				for j in range(10):
+					rowid = 100 + i * 10 + j
+					pooled.insert('t', ['id', 'cont'], (rowid, str(i)))
+					assert pooled.get('t', 'cont', where = {'id': rowid}) == str(i)
+					with pooled.connection() as db:
+						assert db.count('t', where = {'cont': str(i)}) == j + 1
+						maxinuse.append(pooled.stats()['in_use'])
+			except Exception as ex: # pragma: no cover
+				errors.append(ex)
+
+		threads = [threading.Thread(target = work, args = (i, )) for i in range(8)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+
+		assert errors == []
+		assert pooled.count('t') == 90
+		stats = pooled.stats()
+		assert max(maxinuse) <= 3
+		assert stats['connects'] <= 3
+		assert stats['in_use'] == 0
+		pooled.close()
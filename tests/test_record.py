@@ -4,7 +4,7 @@ pytestmark = pytest.mark.skipif(not moduleInstalled('sqlite3'), reason = 'sqlite
 
 from collections import OrderedDict
 from medoo.record import Records, Record
-from medoo.exception import RecordKeyError, RecordAttributeError, GetFromEmptyRecordError
+from medoo.exception import RecordKeyError, RecordAttributeError, GetFromEmptyRecordError, ForwardOnlyRecordsError
 from medoo.database.sqlite import Sqlite, DialectSqlite
 
 @pytest.fixture
@@ -232,3 +232,258 @@ class TestRecords(object):
 		rs = Records(db.cursor)
 		assert rs.export('csv', lineterminator=u'|') == "id,cont,icont|1,a,0|2,b,1|3,c,2|4,d,9|5,e,3|6,,3|7,g,4|8,h,5|9,i,3|10,j,1|"
 
+
+	def testFetchBatches(self, db):
+		db.select('t')
+		rs = Records(db.cursor)
+		assert rs.first().id == 1
+		# the batches double: 1, 2, 4, 8, 16
+		assert len(rs[:2]) == 2
+		assert len(rs) == 3
+		assert [r.id for r in rs] == list(range(1, 11))
+		assert rs._batchsize == 32
+		assert not rs.pending
+
+	def testArraysize(self, db):
+		db.select('t')
+		rs = Records(db.cursor, arraysize = 4)
+		assert next(rs).id == 1
+		assert len(rs) == 1
+		assert len(rs._rows) == 3
+		ids = []
+		for r in rs:
+			ids.append(r.id)
+			# iterating interleaved with next
+			if r.id == 5:
+				assert next(rs).id == 9
+		assert ids == list(range(1, 11))
+		assert len(rs) == 10
+
+	def testSharedIndex(self, db):
+		rs = db.select('t', 'id, cont, icont(id)')
+		r0, r1 = rs[0], rs[1]
+		assert r0._index is r1._index is rs._index
+		assert r0.keys() is rs.meta
+		assert r0.cont == 'a'
+		assert r0.index('id') == 0
+		with pytest.raises(RecordKeyError):
+			r0['id']
+		assert not hasattr(r0, '__dict__')
+
+	def testPickle(self):
+		import copy, pickle
+		record = Record(['a', 'b'], (1, 2))
+		assert pickle.loads(pickle.dumps(record)) == {'a': 1, 'b': 2}
+		record2 = copy.copy(Record(['a'], [1], readonly = False))
+		record2.b = 2
+		assert record2 == {'a': 1, 'b': 2}
+
+	def testForwardOnly(self, db):
+		db.select('t')
+		rs = Records(db.cursor, arraysize = 3, cache = False)
+		assert next(rs).id == 1
+		ids = []
+		for r in rs:
+			ids.append(r.id)
+			assert len(rs._rows) < 3
+		assert ids == list(range(2, 11))
+		assert rs._allrows == []
+		assert len(rs) == 10
+		assert repr(rs) == '<Records: size=10, pending=False>'
+		with pytest.raises(ForwardOnlyRecordsError):
+			iter(rs)
+		with pytest.raises(ForwardOnlyRecordsError):
+			rs[0]
+		with pytest.raises(ForwardOnlyRecordsError):
+			rs.first()
+		with pytest.raises(StopIteration):
+			next(rs)
+
+	def testRowFactory(self, db):
+		from dataclasses import dataclass
+
+		@dataclass
+		class Row:
+			id: int
+			cont: str
+			icont: int
+
+		for factory, first in [
+			('tuple', (1, 'a', 0)),
+			('dict', {'id': 1, 'cont': 'a', 'icont': 0}),
+			('raw', (1, 'a', 0)),
+			(Row, Row(1, 'a', 0)),
+		]:
+			db.select('t')
+			rs = Records(db.cursor, row_factory = factory)
+			assert rs.first() == first
+			assert len(rs.all()) == 10
+
+		db.select('t')
+		rs = Records(db.cursor, row_factory = 'namedtuple', cache = False)
+		row = next(rs)
+		assert (row.id, row.cont, row.icont) == (1, 'a', 0)
+		assert row._fields == ('id', 'cont', 'icont')
+
+		# the fields of a dataclass in another order than the columns
+		@dataclass
+		class Reordered:
+			icont: int
+			id: int
+
+		db.select('t', 'id, icont')
+		assert Records(db.cursor, row_factory = Reordered).first() == Reordered(0, 1)
+		db.select('t', 'id, icont')
+		assert Records(db.cursor, row_factory = lambda *row: row).first() == (1, 0)
+
+		with pytest.raises(ValueError):
+			Records(db.cursor, row_factory = 'unknown')
+		db.select('t', 'cont')
+		with pytest.raises(ValueError):
+			Records(db.cursor, row_factory = Reordered)
+
+	def testToColumns(self, db):
+		db.select('t', where = {'id[<]': 6})
+		rs = Records(db.cursor, arraysize = 2)
+		assert rs.first().id == 1
+		assert rs.to_columns() == {
+			'id': [1, 2, 3, 4, 5],
+			'cont': ['a', 'b', 'c', 'd', 'e'],
+			'icont': [0, 1, 2, 9, 3],
+		}
+		# the rows fetched by to_columns are kept
+		assert len(rs) == 5
+		assert not rs.pending
+		assert [r.id for r in rs.all()] == [1, 2, 3, 4, 5]
+		assert rs[4].cont == 'e'
+
+		db.select('t', 'id, id')
+		with pytest.raises(RecordKeyError):
+			Records(db.cursor).to_columns()
+
+	@pytest.mark.skipif(not moduleInstalled('numpy'), reason = 'numpy not installed')
+	def testToNumpy(self, db):
+		import numpy
+		db.select('t', where = {'id[>]': 4})
+		columns = Records(db.cursor, arraysize = 4, cache = False).to_numpy(dtypes = {'icont': 'int8'})
+		assert columns['id'].dtype == numpy.int64
+		assert columns['id'].tolist() == [5, 6, 7, 8, 9, 10]
+		assert columns['icont'].dtype == numpy.int8
+		assert isinstance(columns['cont'], numpy.ma.MaskedArray)
+		assert columns['cont'].mask.tolist() == [False, True, False, False, False, False]
+		assert columns['cont'].tolist() == ['e', None, 'g', 'h', 'i', 'j']
+
+		db.select('t', where = {'id[<]': 3})
+		array = Records(db.cursor).to_numpy(structured = True)
+		assert array.dtype.names == ('id', 'cont', 'icont')
+		assert array['cont'].tolist() == ['a', 'b']
+
+		db.select('t', where = {'id': 100})
+		assert Records(db.cursor).to_numpy()['id'].shape == (0, )
+
+		# batches of NULLs only take the dtype of the others
+		db.query('SELECT CASE WHEN id IN (3, 4) THEN NULL ELSE icont END AS a, '
+			'CASE WHEN id IN (1, 2, 5) THEN NULL ELSE icont END AS b FROM t WHERE id < 7')
+		columns = Records(db.cursor, arraysize = 2).to_numpy()
+		assert columns['a'].dtype == numpy.int64
+		assert columns['a'].tolist() == [0, 1, None, None, 3, 3]
+		assert columns['b'].dtype == numpy.int64
+		assert columns['b'].tolist() == [None, None, 2, 9, None, 3]
+		db.query('SELECT NULL AS a FROM t WHERE id < 3')
+		assert Records(db.cursor, arraysize = 1).to_numpy()['a'].dtype == object
+
+	@pytest.mark.skipif(not moduleInstalled('pandas'), reason = 'pandas not installed')
+	def testToDataframe(self, db):
+		db.select('t', where = {'id[<]': 4})
+		rs = Records(db.cursor)
+		assert rs.first().id == 1
+		df = rs.to_dataframe()
+		assert list(df.columns) == ['id', 'cont', 'icont']
+		assert df['id'].tolist() == [1, 2, 3]
+		assert df['cont'].tolist() == ['a', 'b', 'c']
+
+		# filled by columns batch by batch
+		db.select('t', 'id, cont')
+		df = Records(db.cursor, arraysize = 3, cache = False).to_dataframe()
+		assert df['id'].tolist() == list(range(1, 11))
+		assert df['cont'].isna().tolist()[4:7] == [False, True, False]
+
+		db.select('t', 'id, icont(id)')
+		dfs = list(Records(db.cursor, cache = False).to_dataframe(chunksize = 4))
+		assert [len(df) for df in dfs] == [4, 4, 2]
+		assert list(dfs[0].columns) == ['id', 'id']
+
+		db.select('t', where = {'id': 100})
+		df = Records(db.cursor).to_dataframe()
+		assert df.empty
+		assert list(df.columns) == ['id', 'cont', 'icont']
+
+	def testWriteCsv(self, db, tmp_path):
+		import io
+		db.select('t', where = {'id[<]': 4})
+		rs = Records(db.cursor)
+		assert rs.first().id == 1
+		out = io.StringIO()
+		assert rs.write_csv(out, lineterminator = '\n') == 3
+		assert out.getvalue() == 'id,cont,icont\n1,a,0\n2,b,1\n3,c,2\n'
+		assert len(rs) == 3
+		assert rs.all()[-1].cont == 'c'
+
+		db.select('t', where = {'id[<>]': (5, 6)})
+		out = io.BytesIO()
+		assert Records(db.cursor).write_tsv(out, header = False) == 2
+		assert out.getvalue() == b'5\te\t3\r\n6\t\t3\r\n'
+
+	def testWriteJsonl(self, db, tmp_path):
+		import io, gzip, json
+		db.select('t', where = {'id[<]': 3})
+		out = io.BytesIO()
+		assert Records(db.cursor, cache = False).write_jsonl(out, compression = 'gzip') == 2
+		assert not out.closed
+		lines = gzip.decompress(out.getvalue()).decode().splitlines()
+		assert [json.loads(line) for line in lines] == [
+			{'id': 1, 'cont': 'a', 'icont': 0},
+			{'id': 2, 'cont': 'b', 'icont': 1},
+		]
+		# not to be gzipped to a text file object
+		db.select('t', where = {'id[<]': 3})
+		rs = Records(db.cursor)
+		with pytest.raises(ValueError):
+			rs.write_jsonl(io.StringIO(), compression = 'gzip')
+		with open(tmp_path / 'rows.txt', 'w') as fout, pytest.raises(ValueError):
+			rs.write_csv(fout, compression = 'gzip')
+		assert len(rs.all()) == 2
+
+		db.select('t')
+		path = tmp_path / 'rows.jsonl.gz'
+		assert Records(db.cursor).write_jsonl(path) == 10
+		with gzip.open(path, 'rt') as fin:
+			assert json.loads(fin.readlines()[-1]) == {'id': 10, 'cont': 'j', 'icont': 1}
+
+		import datetime
+		from medoo.record import _json_default
+		assert _json_default(datetime.datetime(2020, 1, 2, 3, 4, 5)) == '2020-01-02T03:04:05'
+		assert _json_default(b'ab') == 'ab'
+
+	@pytest.mark.skipif(not moduleInstalled('pyarrow'), reason = 'pyarrow not installed')
+	def testToArrow(self, db):
+		import pyarrow
+		db.select('t')
+		rs = Records(db.cursor)
+		assert rs.first().id == 1
+		batches = list(rs.to_arrow_batches(4))
+		assert [batch.num_rows for batch in batches] == [4, 4, 2]
+		assert batches[0].schema.names == ['id', 'cont', 'icont']
+		assert batches[0].schema.field('id').type == pyarrow.int64()
+		assert batches[1].column(1).to_pylist() == ['e', None, 'g', 'h']
+
+		db.select('t', where = {'id[>]': 5})
+		schema = pyarrow.schema([('id', pyarrow.int32()), ('cont', pyarrow.string()), ('icont', pyarrow.int8())])
+		table = Records(db.cursor, cache = False).to_arrow_table(schema)
+		assert table.schema == schema
+		assert table.column('cont').to_pylist() == [None, 'g', 'h', 'i', 'j']
+
+		db.select('t', where = {'id': 100})
+		table = Records(db.cursor).to_arrow_table()
+		assert table.num_rows == 0
+		assert table.column_names == ['id', 'cont', 'icont']
@@ -0,0 +1,131 @@
+import pytest
+from . import moduleInstalled
+pytestmark = pytest.mark.skipif(not moduleInstalled('sqlite3'), reason = 'sqlite3 is not installed.')
+
+import shutil
+from medoo import Medoo, PooledMedoo, ReplicatedMedoo
+
+@pytest.fixture
+def dbfiles(tmp_path):
+	"""Create a primary database file and two copies of it as the replicas"""
+	primary = str(tmp_path / 'primary.sqlite')
+	db = Medoo('sqlite', database = primary)
+	db.query('CREATE TABLE t (id INTEGER PRIMARY KEY, cont TEXT)')
+	db.insert('t', ['id', 'cont'], *[(i, chr(96 + i)) for i in range(1, 6)])
+	db.close()
+	replicas = []
+	for i in range(2):
+		replica = str(tmp_path / 'replica{}.sqlite'.format(i))
+		shutil.copy(primary, replica)
+		# tell the replicas apart
+		db = Medoo('sqlite', database = replica)
+		db.insert('t', ['id', 'cont'], (100, 'replica{}'.format(i)))
+		db.close()
+		replicas.append(replica)
+	return primary, replicas
+
+def replicated(dbfiles, **kwargs):
+	primary, replicas = dbfiles
+	return ReplicatedMedoo(
+		Medoo('sqlite', database = primary),
+		[Medoo('sqlite', database = replica) for replica in replicas],
+		**kwargs
+	)
+
+def source(db):
+	"""Tell where the reads go"""
+	record = db.select('t', 'cont', where = {'id': 100}).first()
+	return record.cont if record else 'primary'
+
+class TestReplicated(object):
+
+	def testRoundRobin(self, dbfiles):
+		db = replicated(dbfiles)
+		assert [source(db) for _ in range(4)] == ['replica0', 'replica1', 'replica0', 'replica1']
+		assert [r.id for r in db.select('t', 'id', where = {'id[<]': 3})] == [1, 2]
+		assert db.count('t') == 6
+		assert db.has('t', where = {'id': 100})
+		assert db.stats() == {
+			'writes': 0,
+			'primary_reads': 0,
+			'replica_reads': [4, 3],
+			'running': [0, 0],
+		}
+		with pytest.raises(AttributeError):
+			db.last
+
+	def testWrites(self, dbfiles):
+		db = replicated(dbfiles)
+		db.insert('t', ['id', 'cont'], (6, 'f'))
+		db.update('t', {'cont': 'F'}, where = {'id': 6})
+		assert db.primary.get('t', 'cont', where = {'id': 6}) == 'F'
+		# not replicated to the copies
+		assert not db.has('t', where = {'id': 6})
+		assert db.stats()['writes'] == 2
+
+	def testSticky(self, dbfiles):
+		db = replicated(dbfiles, sticky = 3600)
+		assert source(db) == 'replica0'
+		db.delete('t', {'id': 1})
+		# read the writes
+		assert source(db) == 'primary'
+		assert not db.has('t', where = {'id': 1})
+		assert db.stats()['primary_reads'] == 2
+
+		db = replicated(dbfiles, sticky = 0)
+		db.delete('t', {'id': 1})
+		assert source(db) == 'replica0'
+
+	def testTransaction(self, dbfiles):
+		db = replicated(dbfiles)
+		with db.transaction():
+			db.insert('t', ['id', 'cont'], (6, 'f'))
+			assert source(db) == 'primary'
+			assert db.get('t', 'cont', where = {'id': 6}) == 'f'
+		with db.batch() as batch:
+			db.insert('t', ['id', 'cont'], (7, 'g'))
+			assert db.count('t') == 7
+		assert batch.statements == 1
+		# started on the primary directly
+		with db.primary.transaction():
+			assert source(db) == 'primary'
+		assert source(db) == 'replica0'
+
+	def testLeastBusy(self, dbfiles):
+		db = replicated(dbfiles, strategy = 'least_busy')
+		pages = db.paginate('t', page_size = 2)
+		assert next(pages).id == 1
+		assert db.stats()['running'] == [1, 0]
+		# replica0 is busy paginating
+		assert source(db) == 'replica1'
+		assert source(db) == 'replica1'
+		pages.close()
+		assert db.stats()['running'] == [0, 0]
+		assert source(db) == 'replica0'
+		# not running until iterated
+		pages = db.paginate('t')
+		del pages
+		assert db.stats()['running'] == [0, 0]
+
+		with pytest.raises(ValueError):
+			replicated(dbfiles, strategy = 'random')
+
+	def testNoReplicas(self, dbfiles):
+		primary, _ = dbfiles
+		db = ReplicatedMedoo(Medoo('sqlite', database = primary), [])
+		assert source(db) == 'primary'
+
+	def testPooled(self, dbfiles):
+		primary, replicas = dbfiles
+		db = ReplicatedMedoo(
+			PooledMedoo('sqlite', database = primary),
+			[PooledMedoo('sqlite', database = replica) for replica in replicas]
+		)
+		assert source(db) == 'replica0'
+		with db.transaction():
+			db.insert('t', ['id', 'cont'], (6, 'f'))
+			assert db.get('t', 'cont', where = {'id': 6}) == 'f'
+			assert db.primary.stats()['in_use'] == 1
+		assert db.primary.stats()['in_use'] == 0
+		assert db.primary.count('t') == 6
+		db.close()
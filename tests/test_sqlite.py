@@ -8,8 +8,16 @@ import sqlite3
 from medoo.base import Base
 from medoo.builder import Builder, Field
 from medoo.dialect import Dialect
+from medoo.exception import ForwardOnlyRecordsError
 from medoo.database.sqlite import Sqlite, DialectSqlite
 
+class DialectInTemptable(DialectSqlite):
+	IN_LIMIT = 3
+
+class DialectInChunk(DialectSqlite):
+	IN_LIMIT = 3
+	IN_STRATEGY = 'chunk'
+
 @pytest.fixture
 def db():
 	"""Create a database for test"""
@@ -44,18 +52,20 @@ class TestSqlite(object):
 		assert db.history == outs.get('history', [])
 		assert db.errors == outs.get('errors', [])
 		assert db.sql == outs.get('sql')
-		assert Builder.DIALECT is outs.get('dialect', DialectSqlite)
+		assert db._dialect is outs.get('dialect', DialectSqlite)
 		assert isinstance(db.builder, Builder)
+		assert db.builder.dialect is outs.get('dialect', DialectSqlite)
 		assert db.last() == ''
 		assert db.log() == []
 
 	def test1Dialect(self):
 		db = Sqlite(database = ':memory:', dialect = DialectSqlite)
-		assert Builder.DIALECT is DialectSqlite
+		assert db._dialect is DialectSqlite
 		db.dialect()
-		assert Builder.DIALECT is Dialect
+		assert db._dialect is Dialect
 		db.dialect(DialectSqlite)
-		assert Builder.DIALECT is DialectSqlite
+		assert db._dialect is DialectSqlite
+		assert Builder.DIALECT is Dialect
 
 	def test2Insert(self, db):
 		r = db.insert('t', {'id': 1, 'cont': 'k'})
@@ -96,8 +106,23 @@ class TestSqlite(object):
 		assert r
 		r  = db.has('t', where = {'id': 20})
 		assert not r
+		assert db.last() == 'SELECT 1 FROM "t" WHERE "id" = 20 LIMIT 1'
 		r  = db.get('t', 'cont', where = {'id': 1})
 		assert r == 'a'
+		assert db.last() == 'SELECT "cont" FROM "t" WHERE "id" = 1 LIMIT 1'
+
+	def testAggregate(self, db):
+		where = {'id[<]': 6, 'ORDER': {'id': 'desc'}}
+		assert db.count('t') == 10
+		assert db.count('t', 'cont') == 9
+		assert db.count('t', where = where) == 5
+		assert db.last() == 'SELECT COUNT(*) FROM "t" WHERE "id" < 6'
+		assert 'ORDER' in where
+		assert db.sum('t', 'icont', where) == 15
+		assert db.avg('t', 'icont', where) == 3.0
+		assert db.min('t', 'icont', where) == 0
+		assert db.max('t', 'cont') == 'j'
+		assert db.sum('t', 'icont', {'id': 100}) is None
 
 	def testSubquery(self, db):
 		rs = db.select('t', where = {
@@ -112,3 +137,404 @@ class TestSqlite(object):
 		assert len(rs.all()) == 2
 		assert rs[0] == {'id1': 1, 'id2': 1}
 		assert rs[1] == {'id1': 2, 'id2': 2}
+
+	def testBind(self):
+		db = Sqlite(database = ':memory:', bind = True)
+		db.query('CREATE TABLE t (id int, cont text);')
+		db.insert('t', ['id', 'cont'], (1, "a'b"), (2, None))
+		assert db.last() == 'INSERT INTO "t" ("id","cont") VALUES (?,?),(?,?)'
+		assert db.get('t', 'cont', where = {'id': 1}) == "a'b"
+		assert db.last() == 'SELECT "cont" FROM "t" WHERE "id" = ? LIMIT 1'
+		db.update('t', {'cont': 'c'}, {'cont[is]': None})
+		assert db.select('t', 'id', where = {'cont[~]': 'c'}).all(asdict = True) == [{'id': 2}]
+		db.delete('t', {'id': [1, 2]})
+		assert not db.has('t')
+
+	def testStatementCache(self):
+		db = Sqlite(database = ':memory:', bind = True)
+		db.query('CREATE TABLE t (id int, cont text);')
+		db.insert('t', ['id', 'cont'], (1, 'a'), (2, 'b'))
+		assert db.get('t', 'cont', where = {'id': 1}) == 'a'
+		assert db.get('t', 'cont', where = {'id': 2}) == 'b'
+		assert db.statement_cache.hits == 1
+		assert Sqlite(database = ':memory:', bind = True, statement_cache = 0).statement_cache is None
+		assert Sqlite(database = ':memory:').statement_cache is None
+
+	@pytest.mark.parametrize('fields,values', [
+		(['id', 'cont', 'icont'], [(11, 'k', 1), (12, 'l', 2), (13, 'm', 3)]),
+		('id, cont, icont', [{'id': 11, 'cont': 'k', 'icont': 1}, {'id': 12, 'cont': 'l', 'icont': 2}, {'id': 13, 'cont': 'm', 'icont': 3}]),
+		({'id': 11, 'cont': 'k', 'icont': 1}, [(12, 'l', 2), {'id': 13, 'cont': 'm', 'icont': 3}]),
+		((11, 'k', 1), [(12, 'l', 2), (13, 'm', 3)]),
+	])
+	def testBulkInsert(self, db, fields, values):
+		result = db.bulk_insert('t', fields, *values, chunksize = 2)
+		assert result.rows == 3
+		assert result.chunks == 2
+		assert result.rate > 0
+		assert db.select('t', 'cont', where = {'id[>]': 10}).all(asdict = True) == [
+			{'cont': 'k'}, {'cont': 'l'}, {'cont': 'm'}
+		]
+		assert not db.connection.in_transaction
+
+	def testBulkInsertRollback(self, db):
+		db.query('CREATE TABLE t2 (id int PRIMARY KEY);')
+		with pytest.raises(sqlite3.IntegrityError):
+			db.bulk_insert('t2', 'id', *[(i, ) for i in [1, 2, 3, 4, 2]], chunksize = 2)
+		assert not db.has('t2')
+		assert db.bulk_insert('t2', 'id') == (0, 0, 0.0)
+		assert db.bulk_insert('t2', 'id', *[(i, ) for i in range(2000)]).chunks == 2
+		assert db.get('t2', 'id|count') == 2000
+
+	def testInsertStream(self, db):
+		pulled = []
+		def rows():
+			for i in range(11, 1011):
+				pulled.append(i)
+				yield i, 'x', i % 7
+
+		result = db.insert_stream('t', 'id, cont, icont', rows(), batch_size = 100)
+		assert result.rows == 1000
+		assert result.chunks == 10
+		assert db.get('t', 'id|count') == 1010
+
+		# from another Records, fetched lazily by db.cursor
+		db.query('CREATE TABLE t2 (id int, cont text, icont INTEGER);')
+		result = db.insert_stream('t2', None, db.select('t', where = {'id[<=]': 10}), batch_size = 3)
+		assert result.rows == 10
+		assert result.chunks == 4
+		assert db.select('t2', where = {'id': 6}).first() == {'id': 6, 'cont': None, 'icont': 3}
+
+		# dicts
+		result = db.insert_stream('t2', None, iter([{'id': 100, 'cont': 'y'}, {'cont': 'z', 'id': 101}]))
+		assert result.rows == 2
+		assert db.get('t2', 'cont', where = {'id': 101}) == 'z'
+		assert db.insert_stream('t2', None, []).rows == 0
+
+		with pytest.raises(ValueError):
+			db.insert_stream('t2', (1, 2), [])
+
+	def testInsertStreamRollback(self, db):
+		def rows():
+			yield 100, 'x', 1
+			raise IOError('Broken source')
+
+		with pytest.raises(IOError):
+			db.insert_stream('t', 'id, cont, icont', rows(), batch_size = 1)
+		assert not db.has('t', where = {'id': 100})
+
+		# the errors of the source are raised as they are
+		error = UnicodeDecodeError('utf-8', b'\xff', 0, 1, 'invalid start byte')
+		def badrows():
+			yield 100, 'x', 1
+			raise error
+
+		with pytest.raises(UnicodeDecodeError) as exc:
+			db.insert_stream('t', 'id, cont, icont', badrows(), batch_size = 1)
+		assert exc.value is error
+		assert not db.has('t', where = {'id': 100})
+		# kept as it is if it cannot be made from a message
+		assert db._error(error) is error
+
+	def testUpsert(self, db):
+		db.query('CREATE UNIQUE INDEX t_id ON t (id);')
+		result = db.upsert('t', [
+			{'id': 1, 'cont': 'A', 'icont': 10},
+			{'id': 11, 'cont': 'k', 'icont': 11},
+			{'id': 2, 'cont': 'B', 'icont': 20},
+		], 'id', chunksize = 2)
+		assert result.rows == 3
+		assert result.chunks == 2
+		assert db.get('t', 'id|count') == 11
+		assert db.select('t', where = {'id': [1, 2, 11]}).all(asdict = True) == [
+			{'id': 1, 'cont': 'A', 'icont': 10},
+			{'id': 2, 'cont': 'B', 'icont': 20},
+			{'id': 11, 'cont': 'k', 'icont': 11},
+		]
+		assert not db.connection.in_transaction
+
+		db.upsert('t', [(3, 'C', 30), (12, 'l', 12)], 'id', update_fields = 'icont', fields = 'id, cont, icont')
+		assert db.select('t', where = {'id': [3, 12]}).all(asdict = True) == [
+			{'id': 3, 'cont': 'c', 'icont': 30},
+			{'id': 12, 'cont': 'l', 'icont': 12},
+		]
+
+		db.upsert('t', [(4, 'D', 40)], 'id', update_fields = [], fields = 'id, cont, icont')
+		assert db.get('t', 'cont', where = {'id': 4}) == 'd'
+		assert db.upsert('t', [], 'id', fields = 'id') == (0, 0, 0.0)
+
+	def testUpsertRollback(self, db):
+		db.query('CREATE TABLE t2 (id int PRIMARY KEY, cont text NOT NULL);')
+		db.insert('t2', 'id, cont', (1, 'a'))
+		with pytest.raises(sqlite3.IntegrityError):
+			db.upsert('t2', [{'id': 1, 'cont': 'A'}, {'id': 2, 'cont': None}], 'id', chunksize = 1)
+		assert db.get('t2', 'cont', where = {'id': 1}) == 'a'
+		assert not db.has('t2', where = {'id': 2})
+
+		# the errors of the source are raised as they are
+		error = ValueError('Broken source')
+		def rows():
+			yield {'id': 3, 'cont': 'c'}
+			raise error
+
+		with pytest.raises(ValueError) as exc:
+			db.upsert('t2', rows(), 'id', chunksize = 1)
+		assert exc.value is error
+		assert not db.has('t2', where = {'id': 3})
+
+	def testBulkUpdate(self, db):
+		result = db.bulk_update('t', ({'id': i, 'icont': i * 10} for i in range(1, 11)), chunksize = 4)
+		assert result.rows == 10
+		assert result.chunks == 3
+		assert [row.icont for row in db.select('t', 'icont')] == [i * 10 for i in range(1, 11)]
+		assert not db.connection.in_transaction
+
+		db.bulk_update('t', [('x', 10), ('y', 20), ('z', 110)], key = 'icont', fields = 'cont, icont')
+		assert [row.cont for row in db.select('t', 'cont', where = {'id[<=]': 3})] == ['x', 'y', 'c']
+		assert db.bulk_update('t', [], fields = 'id, cont') == (0, 0, 0.0)
+
+	@pytest.mark.parametrize('bind', [False, True])
+	def testInTemptable(self, db, bind):
+		db.bind = bind
+		db.dialect(DialectInTemptable)
+		rs = db.select('t', 'id', where = {'id': [1, 3, 5, 7, 3], 'cont[!]': ['e', 'f', 'g', 'h'], 'icont[>]': 0})
+		assert db.last().startswith('SELECT "id" FROM "t" WHERE "id" IN (SELECT "k" FROM "_medoo_in" WHERE "n" = ')
+		assert [row.id for row in rs] == [3]
+		assert [row.id for row in db.select('t', 'id', where = {'id[!]': [1, 2, 3, 4]})] == [5, 6, 7, 8, 9, 10]
+		assert [row.id for row in db.select('t', 'id', where = {'id': [1, 2, 3]})] == [1, 2, 3]
+		assert db.last().startswith('SELECT "id" FROM "t" WHERE "id" IN (1,2,3)' if not bind else 'SELECT "id" FROM "t" WHERE "id" IN (?,?,?)')
+
+	@pytest.mark.parametrize('bind', [False, True])
+	def testInChunk(self, db, bind):
+		db.bind = bind
+		db.dialect(DialectInChunk)
+		rs = db.select('t', 'id', where = {'id': [1, 2, 3, 1, 4, 5, 6, 7], 'icont[>]': 0})
+		assert len(rs) == 0
+		assert rs.meta == ['id']
+		assert [row.id for row in rs] == [2, 3, 4, 5, 6, 7]
+		assert not rs.pending
+		# the last chunk
+		assert db.last().startswith('SELECT "id" FROM "t" WHERE "id" = {}'.format('?' if bind else 7))
+
+		# split into lists in one statement with ORDER, NOT IN and streaming
+		rs = db.select('t', 'id', where = {'id': [1, 2, 3, 4, 5], 'ORDER': {'id': 'desc'}})
+		assert [row.id for row in rs] == [5, 4, 3, 2, 1]
+		assert db.last().startswith('SELECT "id" FROM "t" WHERE "id" IN ({0}) OR "id" IN ({1}) ORDER BY'.format(
+			*(['?,?,?', '?,?'] if bind else ['1,2,3', '4,5'])))
+		rs = db.select('t', 'id', where = {'id[!]': [1, 2, 3, 4, 5]})
+		assert [row.id for row in rs] == [6, 7, 8, 9, 10]
+		assert db.last().startswith('SELECT "id" FROM "t" WHERE "id" NOT IN ({0}) AND "id" NOT IN ({1})'.format(
+			*(['?,?,?', '?,?'] if bind else ['1,2,3', '4,5'])))
+		rs = db.select('t', 'id', where = {'id': [1, 2, 3, 4, 5]}, stream = True)
+		assert [row.id for row in rs] == [1, 2, 3, 4, 5]
+		# the other lists split in the chunks
+		rs = db.select('t', 'id', where = {'id': [1, 2, 3, 4, 5], 'icont[!]': [0, 1, 2, 3]})
+		assert [row.id for row in rs] == [4]
+		assert '("icont" NOT IN ({}) AND "icont" <> {})'.format(
+			*(['?,?,?', '?'] if bind else ['0,1,2', '3'])) in db.last()
+
+	def testInMaxParams(self, db):
+		class DialectMaxParams(DialectInChunk):
+			MAX_PARAMS = 4
+		db.bind = True
+		db.statement_cache = None
+		db.dialect(DialectMaxParams)
+		assert len(db.select('t', 'id', where = {'id': [1, 2, 3, 4, 5]}).all()) == 5
+		with pytest.raises(ValueError):
+			db.select('t', 'id', where = {'id': [1, 2, 3, 4, 5], 'ORDER': {'id': 'asc'}})
+
+	def testPaginate(self, db):
+		pages = list(db.paginate('t', 'id, cont', page_size = 3, pages = True))
+		assert [[row.id for row in page] for page in pages] == [[1, 2, 3], [4, 5, 6], [7, 8, 9], [10]]
+		assert db.last() == 'SELECT "id","cont" FROM "t" WHERE "id" > 9 ORDER BY "id" ASC LIMIT 3'
+
+		rows = db.paginate('t', 'id', where = {'id[<>]': (2, 9)}, page_size = 2, desc = True)
+		assert [row.id for row in rows] == [9, 8, 7, 6, 5, 4, 3, 2]
+		assert list(db.paginate('t', where = {'id[>]': 10})) == []
+
+	def testPaginateComposite(self, db):
+		rows = db.paginate('t', 'icont, id', order_key = {'icont': 'asc', 'id': 'desc'}, page_size = 4)
+		assert [(row.icont, row.id) for row in rows] == [
+			(0, 1), (1, 10), (1, 2), (2, 3), (3, 9), (3, 6), (3, 5), (4, 7), (5, 8), (9, 4)
+		]
+		assert db.last() == (
+			'SELECT "icont","id" FROM "t" WHERE "icont" > 4 OR ("icont" = 4 AND "id" < 7) '
+			'ORDER BY "icont" ASC,"id" DESC LIMIT 4'
+		)
+
+	def testStream(self, db):
+		rs = db.select('t', 'id', where = {'id[<]': 4}, stream = True, itersize = 2)
+		assert rs.owncursor
+		assert db.get('t', 'cont', where = {'id': 5}) == 'e'
+		assert [row.id for row in rs] == [1, 2, 3]
+		assert not rs.pending
+
+	def testForwardOnly(self, db):
+		rs = db.select('t', 'id', where = {'id[<]': 4}, cache = False)
+		assert [row.id for row in rs] == [1, 2, 3]
+		assert rs._allrows == []
+		with pytest.raises(ForwardOnlyRecordsError):
+			rs.all()
+		assert len(db.select('t', cache = False).all()) == 10
+
+	def testRowFactory(self, db):
+		rs = db.select('t', 'id, cont', where = {'id[<]': 3}, row_factory = sqlite3.Row)
+		rows = rs.all()
+		assert isinstance(rows[0], sqlite3.Row)
+		assert [(row['id'], row['cont']) for row in rows] == [(1, 'a'), (2, 'b')]
+		# the cursor is back to tuples
+		assert db.select('t', 'id', where = {'id': 1}).first().id == 1
+		assert db.select('t', 'id', where = {'id[<]': 3}, row_factory = 'tuple').all() == [(1, ), (2, )]
+		assert db.select('t', 'id', where = {'id[<]': 3}, row_factory = 'dict', stream = True).all() == [{'id': 1}, {'id': 2}]
+
+@pytest.fixture
+def dbs(tmp_path):
+	"""Create a database file, with two connections to it"""
+	dbfile = str(tmp_path / 'test.sqlite')
+	db = Sqlite(database = dbfile)
+	db.query('CREATE TABLE t (id INTEGER PRIMARY KEY, cont TEXT)')
+	yield db, Sqlite(database = dbfile)
+
+class TestTransaction(object):
+
+	def testCommit(self, dbs):
+		db, other = dbs
+		with db.transaction() as trans:
+			assert trans is db
+			db.insert('t', ['id', 'cont'], (1, 'a'))
+			db.bulk_insert('t', ['id', 'cont'], (2, 'b'), (3, 'c'))
+			db.update('t', {'cont': 'C'}, where = {'id': 3})
+			assert db.count('t') == 3
+			assert other.count('t') == 0
+		assert other.count('t') == 3
+		assert other.get('t', 'cont', where = {'id': 3}) == 'C'
+
+	def testRollback(self, dbs):
+		db, other = dbs
+		with pytest.raises(ZeroDivisionError):
+			with db.transaction():
+				db.insert('t', ['id', 'cont'], (1, 'a'))
+				1/0
+		assert db.count('t') == 0
+		db.insert('t', ['id', 'cont'], (1, 'a'))
+		assert other.count('t') == 1
+
+	def testSavepoint(self, dbs):
+		db, other = dbs
+		db.logging = True
+		with db.transaction():
+			db.insert('t', ['id', 'cont'], (1, 'a'))
+			with pytest.raises(ZeroDivisionError):
+				with db.transaction():
+					db.insert('t', ['id', 'cont'], (2, 'b'))
+					1/0
+			with db.transaction():
+				db.insert('t', ['id', 'cont'], (3, 'c'))
+			assert 'SAVEPOINT medoo_savepoint_1' in db.log()
+			assert 'ROLLBACK TO SAVEPOINT medoo_savepoint_1' in db.log()
+			assert other.count('t') == 0
+		assert [row.id for row in other.select('t', 'id')] == [1, 3]
+
+	def testBatch(self, dbs):
+		db, other = dbs
+		with db.batch(commit_every = 3) as batch:
+			for i in range(1, 5):
+				db.insert('t', ['id', 'cont'], (i, str(i)))
+			assert other.count('t') == 3
+			assert batch.pending == 1
+			for i in range(5, 11):
+				db.insert('t', ['id', 'cont'], (i, str(i)))
+			assert other.count('t') == 9
+		assert other.count('t') == 10
+		assert (batch.statements, batch.commits, batch.pending) == (10, 4, 0)
+		assert repr(batch) == '<Batch: statements=10, commits=4, pending=0>'
+
+	def testBatchInterval(self, dbs):
+		db, other = dbs
+		with db.batch(commit_every = None, commit_interval = 0) as batch:
+			db.insert('t', ['id', 'cont'], (1, 'a'))
+			assert other.count('t') == 1
+		assert batch.commits == 1
+
+		with db.batch(commit_every = None, commit_interval = 3600) as batch:
+			db.insert('t', ['id', 'cont'], (2, 'b'))
+			db.insert('t', ['id', 'cont'], (3, 'c'))
+			assert other.count('t') == 1
+		assert other.count('t') == 3
+		assert batch.commits == 1
+
+	def testBatchRollback(self, dbs):
+		db, other = dbs
+		with pytest.raises(ZeroDivisionError):
+			with db.batch(commit_every = 2):
+				for i in range(1, 4):
+					db.insert('t', ['id', 'cont'], (i, str(i)))
+				1/0
+		# the statements since the last commit are rolled back
+		assert other.count('t') == 2
+		assert db._batch is None
+
+	def testTransactionInBatch(self, dbs):
+		db, other = dbs
+		with db.batch(commit_every = 2) as batch:
+			db.insert('t', ['id', 'cont'], (1, 'a'))
+			with pytest.raises(ZeroDivisionError):
+				with db.transaction():
+					db.insert('t', ['id', 'cont'], (2, 'b'))
+					1/0
+			# the transaction counts as one statement of the batch
+			with db.transaction():
+				db.insert('t', ['id', 'cont'], (3, 'c'))
+				db.insert('t', ['id', 'cont'], (4, 'd'))
+				with db.batch() as inner:
+					db.insert('t', ['id', 'cont'], (5, 'e'))
+				assert inner.commits == 0
+				assert other.count('t') == 0
+			assert other.count('t') == 4
+		assert batch.commits == 1
+		assert [row.id for row in other.select('t', 'id')] == [1, 3, 4, 5]
+
+class TestPragma(object):
+
+	def testProfile(self, tmp_path):
+		db = Sqlite(database = str(tmp_path / 'test.sqlite'), profile = 'read_heavy', cache_size = -1000)
+		pragmas = db.pragmas()
+		assert pragmas['journal_mode'] == 'wal'
+		# NORMAL
+		assert pragmas['synchronous'] == 1
+		assert pragmas['cache_size'] == -1000
+		# MEMORY
+		assert pragmas['temp_store'] == 2
+		assert set(pragmas) == {'journal_mode', 'synchronous', 'mmap_size', 'cache_size', 'temp_store'}
+
+		db = Sqlite(database = str(tmp_path / 'test.sqlite'), profile = 'bulk_load')
+		assert db.pragmas()['synchronous'] == 0
+		db = Sqlite(database = str(tmp_path / 'test.sqlite'), profile = 'durable')
+		assert db.pragmas() == {'journal_mode': 'wal', 'synchronous': 2}
+
+		with pytest.raises(ValueError):
+			Sqlite(profile = 'nosuchprofile')
+
+	def testPragmas(self):
+		db = Sqlite(busy_timeout = 1234, pragmas = {'foreign_keys': 'ON'})
+		assert db.pragmas() == {'busy_timeout': 1234, 'foreign_keys': 1}
+		# in-memory databases keep their journal mode
+		db = Sqlite(journal_mode = 'WAL')
+		assert db.pragmas() == {'journal_mode': 'memory'}
+		assert Sqlite().pragmas() == {}
+		with pytest.raises(ValueError):
+			Sqlite(pragmas = {'cache_size': '1; DROP TABLE t'})
+
+	def testOptimizeOnClose(self):
+		queries = []
+		db = Sqlite()
+		db.connection.set_trace_callback(queries.append)
+		db.close()
+		assert queries == ['PRAGMA optimize']
+		# closed already
+		db.close()
+
+		queries = []
+		db = Sqlite(optimize = False)
+		db.connection.set_trace_callback(queries.append)
+		db.close()
+		assert queries == []
@@ -0,0 +1,159 @@
+import gc
+import sys
+import types
+import importlib
+import pytest
+
+ROWS = [(1, 'a'), (2, 'b'), (3, 'c'), (4, 'd'), (5, 'e')]
+DESCRIPTION = [('id', ), ('cont', )]
+
+class FakeCursor(object):
+	"""A cursor of the fake DB-API driver, recording the fetch calls"""
+
+	def __init__(self, connection, name = None, buffered = None):
+		self.connection  = connection
+		self.name        = name
+		self.buffered    = buffered
+		self.itersize    = 2000
+		self.arraysize   = 1
+		self.description = None
+		self.closed      = False
+		self.fetches     = []
+		self._rows       = []
+		self._current    = []
+		self._iter       = None
+		connection.cursors.append(self)
+
+	def execute(self, sql, params = None):
+		self.connection.queries.append(sql)
+		self._rows = list(ROWS)
+		self._iter = self._generate()
+		# description of named cursors is not available until fetched
+		if not self.name:
+			self.description = DESCRIPTION
+
+	def fetchmany(self, size):
+		self.fetches.append(size)
+		self.description = DESCRIPTION
+		# FETCH FORWARD 0 of PostgreSQL fetches the current row again
+		if self.name and size == 0:
+			return self._current
+		rows, self._rows = self._rows[:size], self._rows[size:]
+		self._current = rows[-1:]
+		return rows
+
+	def fetchone(self):
+		rows = self.fetchmany(1)
+		return rows[0] if rows else None
+
+	def __iter__(self):
+		return self
+
+	def _generate(self):
+		while True:
+			rows = self.fetchmany(self.itersize if self.name else self.arraysize)
+			if not rows:
+				return
+			for row in rows:
+				yield row
+
+	def __next__(self):
+		return next(self._iter)
+
+	def close(self):
+		self.closed = True
+
+class FakeConnection(object):
+
+	def __init__(self, **kwargs):
+		self.kwargs  = kwargs
+		self.cursors = []
+		self.queries = []
+
+	def cursor(self, **kwargs):
+		return FakeCursor(self, **kwargs)
+
+	def commit(self):
+		pass
+
+	def rollback(self):
+		pass
+
+	def close(self):
+		pass
+
+@pytest.fixture
+def fakedb(monkeypatch):
+	"""Load the database modules with the fake drivers"""
+	psycopg2 = types.ModuleType('psycopg2')
+	psycopg2.connect = FakeConnection
+	mysql = types.ModuleType('mysql')
+	mysql.connector = types.ModuleType('mysql.connector')
+	mysql.connector.connect = FakeConnection
+	monkeypatch.setitem(sys.modules, 'psycopg2', psycopg2)
+	monkeypatch.setitem(sys.modules, 'mysql', mysql)
+	monkeypatch.setitem(sys.modules, 'mysql.connector', mysql.connector)
+	for mod in ('medoo.database.pgsql', 'medoo.database.mysql'):
+		monkeypatch.delitem(sys.modules, mod, raising = False)
+	return lambda mod: importlib.import_module('medoo.database.' + mod)
+
+class TestStream(object):
+
+	def testPgsqlStream(self, fakedb):
+		db = fakedb('pgsql').Pgsql(database = 'test')
+		rs = db.select('t', stream = True, itersize = 2)
+		cursor = db.connection.cursors[-1]
+		assert cursor is not db.cursor
+		assert cursor.name.startswith('medoo_cursor_')
+		assert cursor.itersize == 2
+		assert rs.meta == ['id', 'cont']
+		# the first row fetched for the description
+		assert cursor.fetches == [1]
+		assert [row.id for row in rs] == [1, 2, 3, 4, 5]
+		assert cursor.fetches == [1, 1, 2, 2, 2]
+		assert cursor.closed
+		assert not db.cursor.closed
+
+	def testPgsqlStreamAdaptive(self, fakedb):
+		db = fakedb('pgsql').Pgsql(database = 'test')
+		rs = db.select('t', stream = True)
+		cursor = db.connection.cursors[-1]
+		assert rs.meta == ['id', 'cont']
+		# the first row fetched for the description is not fetched again
+		assert [row.id for row in rs] == [1, 2, 3, 4, 5]
+		assert 0 not in cursor.fetches
+
+	def testPgsqlStreamClose(self, fakedb):
+		db = fakedb('pgsql').Pgsql(database = 'test')
+		with db.select('t', stream = True) as rs:
+			assert rs.first().cont == 'a'
+			cursor = db.connection.cursors[-1]
+			assert not cursor.closed
+		assert cursor.closed
+		assert rs.all() == [rs[0]]
+
+		rs = db.select('t', stream = True)
+		cursor = db.connection.cursors[-1]
+		del rs
+		gc.collect()
+		assert cursor.closed
+
+	def testPgsqlNoStream(self, fakedb):
+		db = fakedb('pgsql').Pgsql(database = 'test')
+		rs = db.select('t')
+		assert db.connection.cursors[-1] is db.cursor
+		assert rs.all()[-1].cont == 'e'
+		del rs
+		gc.collect()
+		assert not db.cursor.closed
+
+	def testMysqlStream(self, fakedb):
+		db = fakedb('mysql').Mysql(database = 'test')
+		rs = db.select('t', stream = True)
+		cursor = db.connection.cursors[-1]
+		assert cursor.buffered is False
+		assert rs.first().id == 1
+		rs.close()
+		# unread rows consumed before closing
+		assert cursor.fetches == [1, 1, 1, 1, 1, 1]
+		assert cursor.closed